@@ -1,21 +1,46 @@
 import json
+import logging
+import os
 import urllib.parse
 from dataclasses import field
 from datetime import date, datetime
 from datetime import time as dt_time
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from dotenv import load_dotenv
 from fastapi import HTTPException, status
+from tortoise.exceptions import IntegrityError
 from tortoise.expressions import Q
 
+from app.controllers.agendame.availability import (format_minutes,
+                                                   parse_minutes)
+from app.controllers.agendame.availability_cache import (DayEntry,
+                                                         availability_cache)
+from app.controllers.agendame.resource_index import ResourceDayIndex
+from app.controllers.agendame.schedule import CompiledSchedule, schedule_cache
 from app.controllers.agendame.services import Services
+from app.controllers.company.company_context import CompanyContext
 from app.controllers.company.company_data import MyCompany
+from app.controllers.company.identifier_index import company_index
+from app.database.migrations import slot_exclusion_active
 from app.models.trial import TrialAccount
-from app.models.user import (Appointment, BusinessSettings, Client, Service,
-                             User)
+from app.models.user import Appointment, Client, Service, User
 from app.schemas.agendame.upgrade_service import UpdateServices
+from app.utils.tenant_key import make_tenant_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Maior intervalo aceito por get_availability_range
+AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', '62'))
+
+# Dias por consulta de agendamentos em get_next_available
+NEXT_AVAILABLE_CHUNK_DAYS = max(
+    1, int(os.getenv('NEXT_AVAILABLE_CHUNK_DAYS', '14'))
+)
 
 
 class Appointments:
@@ -26,89 +51,88 @@ class Appointments:
         target_company_id: Optional[int] = None,
         target_company_name: Optional[str] = None,
         target_company_business_slug: Optional[str] = None,
+        target_company_is_trial: Optional[bool] = None,
+        context: Optional[CompanyContext] = None,
     ) -> None:
         self.target_company_id = target_company_id
         self.target_company_name = target_company_name
         self.target_company_business_slug = target_company_business_slug
+        self.target_company_is_trial = target_company_is_trial
+        # Empresa já resolvida pela dependência (current_company/public_company)
+        self.context = context
         self.services_domain = Services(
             target_company_id=target_company_id,
             target_company_name=target_company_name,
             target_company_business_slug=target_company_business_slug,
+            target_company_is_trial=target_company_is_trial,
+            context=context,
         )
         self._company_type = None  # 'user' ou 'trial'
+        if context is not None:
+            self._company_type = 'trial' if context.is_trial else 'user'
 
     async def _get_company_by_identifier(
         self, identifier: str, search_type: str = 'auto'
     ) -> tuple[MyCompany, bool]:
         """
         Busca empresa por identificador e retorna (company, is_trial)
+        Resolvido pelo company_index (sem banco quando já está em memória).
         """
-        user = None
-        is_trial = False
-
-        # Define os campos a buscar baseado no search_type
-        if search_type == 'slug':
-            fields = ['business_slug']
-        elif search_type == 'username':
-            fields = ['username']
-        elif search_type == 'name':
-            fields = ['business_name']
-        else:  # 'auto'
-            fields = ['business_slug', 'username', 'business_name']
-
-        # Busca na tabela User
-        for field_name in fields:
-            user = await User.filter(**{field_name: identifier}).first()
-            if user:
-                is_trial = False
-                break
-
-        # Se não encontrou em User, busca na TrialAccount
-        if not user:
-            for field_name in fields:
-                user = await TrialAccount.filter(
-                    **{field_name: identifier}
-                ).first()
-                if user:
-                    is_trial = True
-                    break
+        ref = await company_index.resolve(identifier, search_type)
 
-        if user:
-            company = await MyCompany.create(company_id=user.id)
-            self._company_type = 'trial' if is_trial else 'user'
-            return company, is_trial
+        if ref:
+            self._company_type = 'trial' if ref.is_trial else 'user'
+            return MyCompany(target_company=ref), ref.is_trial
 
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f'Empresa não encontrada: {identifier}',
         )
 
+    async def _resolve_company(
+        self, identifier: Optional[str], search_type: str
+    ) -> tuple[MyCompany, bool]:
+        """Contexto da requisição, identificador público ou ID, nesta ordem"""
+        if self.context is not None:
+            return self.context.company, self.context.is_trial
+        if identifier:
+            return await self._get_company_by_identifier(
+                identifier, search_type
+            )
+        return await self._get_company()
+
     async def _get_company(self) -> tuple[MyCompany, bool]:
         """Carrega a empresa alvo e determina se é trial."""
+        if self.context is not None:
+            return self.context.company, self.context.is_trial
         try:
+            if (
+                self.target_company_id
+                and self.target_company_is_trial is not None
+            ):
+                # Tipo conhecido (usuário logado): uma única busca
+                company = await MyCompany.create(
+                    company_id=self.target_company_id,
+                    is_trial=self.target_company_is_trial,
+                )
+                self._company_type = (
+                    'trial' if self.target_company_is_trial else 'user'
+                )
+                return company, self.target_company_is_trial
+
             if self.target_company_id:
                 # Determinar se é User ou TrialAccount
                 user = await User.filter(id=self.target_company_id).first()
                 if user:
                     self._company_type = 'user'
-                    return (
-                        await MyCompany.create(
-                            company_id=self.target_company_id
-                        ),
-                        False,
-                    )
+                    return MyCompany(target_company=user), False
 
                 trial = await TrialAccount.filter(
                     id=self.target_company_id
                 ).first()
                 if trial:
                     self._company_type = 'trial'
-                    return (
-                        await MyCompany.create(
-                            company_id=self.target_company_id
-                        ),
-                        True,
-                    )
+                    return MyCompany(target_company=trial), True
 
             raise ValueError('Identificador de empresa não fornecido')
         except ValueError:
@@ -117,135 +141,264 @@ class Appointments:
                 detail='Empresa não encontrada',
             )
 
-    async def _get_business_hours(
-        self, company_id: int, is_trial: bool
-    ) -> Dict:
-        """Obtém horários de funcionamento da empresa."""
-        if is_trial:
-            trial = await TrialAccount.get_or_none(id=company_id)
-            if trial:
-                return trial.business_hours
-        else:
-            user = await User.get_or_none(id=company_id)
-            if user:
-                return user.business_hours
+    async def _get_schedule(
+        self, company: MyCompany, is_trial: bool
+    ) -> CompiledSchedule:
+        """Agenda compilada da empresa (schedule_cache)"""
+        # Linha já carregada pelo CompanyContext: sem nova consulta
+        loaded = getattr(company.target_company, 'business_hours', None)
+        return await schedule_cache.get(
+            company.company_id(), is_trial, loaded or None
+        )
 
-        # Retorna padrão se não encontrar
-        return {
-            'monday': {'open': '09:00', 'close': '18:00'},
-            'tuesday': {'open': '09:00', 'close': '18:00'},
-            'wednesday': {'open': '09:00', 'close': '18:00'},
-            'thursday': {'open': '09:00', 'close': '18:00'},
-            'friday': {'open': '09:00', 'close': '18:00'},
-            'saturday': {'open': '09:00', 'close': '17:00'},
-            'sunday': {'open': None, 'close': None},
-        }
+    async def get_available_times(
+        self,
+        service_id: int,
+        target_date: date,
+        identifier: Optional[str] = None,
+        search_type: str = 'auto',
+    ) -> Dict[str, Any]:
+        """
+        Retorna horários disponíveis para um serviço em uma data específica.
+        """
+        company, is_trial = await self._resolve_company(
+            identifier, search_type
+        )
 
-    async def _get_business_settings(self, company_id: int) -> Dict:
-        """Obtém configurações da empresa."""
-        settings = await BusinessSettings.filter(
-            Q(user_id=company_id) | Q(trial_account_id=company_id)
-        ).first()
+        tenant_key = company.tenant_key()
+
+        schedule = await self._get_schedule(company, is_trial)
+        entries = await self._get_day_entries(
+            tenant_key, service_id, target_date, target_date, schedule
+        )
+        entry = entries[target_date]
 
-        if settings:
+        day_hours = schedule.day_hours(target_date)
+        if day_hours is None:
             return {
-                'time_slot_duration': settings.time_slot_duration or 60,
-                'max_daily_appointments': settings.max_daily_appointments
-                or 20,
-                'min_booking_hours': settings.min_booking_hours or 1,
-                'max_booking_days': settings.max_booking_days or 30,
+                'date': target_date.isoformat(),
+                'service': entry.service['name'],
+                'available_times': [],
+                'message': 'Empresa não funciona neste dia',
             }
+
+        available_times = entry.free_times(target_date)
+
         return {
-            'time_slot_duration': 60,
-            'max_daily_appointments': 20,
-            'min_booking_hours': 1,
-            'max_booking_days': 30,
+            'date': target_date.isoformat(),
+            'service': entry.service,
+            'available_times': available_times,
+            'business_hours': day_hours,
+            'total_available': len(available_times),
+            'is_today': target_date == date.today(),
+            'min_booking_hours': schedule.min_booking_hours,
         }
 
-    def _generate_time_slots(
+    async def get_availability_range(
         self,
-        open_time: str,
-        close_time: str,
-        slot_duration: int,
-        target_date: Optional[date] = None,
-        min_booking_hours: int = 1,
-    ) -> List[str]:
-        """Gera todos os slots de tempo possíveis, filtrando horários passados."""
-        if not open_time or not close_time:
-            return []
-
-        slots = []
-        try:
-            current_slot = datetime.strptime(open_time, '%H:%M')
-            end = datetime.strptime(close_time, '%H:%M')
-
-            min_time = None
-            if target_date and target_date == date.today():
-                now = datetime.now()
-                min_datetime = now + timedelta(hours=min_booking_hours)
-                min_time = min_datetime.time()
-                min_datetime_obj = datetime.combine(date.today(), min_time)
-                end_datetime_obj = datetime.combine(date.today(), end.time())
-                if min_datetime_obj >= end_datetime_obj:
-                    return []
-
-            while current_slot + timedelta(minutes=slot_duration) <= end:
-                slot_time_str = current_slot.strftime('%H:%M')
-                slot_time_obj = current_slot.time()
-
-                if target_date == date.today() and min_time:
-                    if slot_time_obj >= min_time:
-                        slots.append(slot_time_str)
-                else:
-                    slots.append(slot_time_str)
+        service_id: int,
+        start_date: date,
+        end_date: date,
+        identifier: Optional[str] = None,
+        search_type: str = 'auto',
+    ) -> Dict[str, Any]:
+        """
+        Horários disponíveis de um serviço para cada dia de um intervalo.
 
-                current_slot += timedelta(minutes=slot_duration)
+        Mesmo cálculo de get_available_times, mas com uma única carga de
+        serviço/configurações/expediente e uma única consulta de
+        agendamentos (appointment_date__range) para todo o intervalo.
+        """
+        if end_date < start_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="'to' deve ser maior ou igual a 'from'",
+            )
+        total_days = (end_date - start_date).days + 1
+        if total_days > AVAILABILITY_MAX_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f'Intervalo máximo de {AVAILABILITY_MAX_DAYS} dias',
+            )
 
-        except ValueError:
-            return []
+        company, is_trial = await self._resolve_company(
+            identifier, search_type
+        )
+        tenant_key = company.tenant_key()
 
-        return slots
+        schedule = await self._get_schedule(company, is_trial)
+        entries = await self._get_day_entries(
+            tenant_key, service_id, start_date, end_date, schedule
+        )
 
-    def _filter_available_slots(
-        self,
-        all_slots: List[str],
-        booked_slots: List[str],
-        service_duration: int,
-        max_daily: int,
-    ) -> List[str]:
-        """Filtra slots disponíveis considerando duração do serviço."""
-        if len(booked_slots) >= max_daily:
-            return []
-
-        available = []
-        for slot in all_slots:
-            if slot not in booked_slots:
-                available.append(slot)
-
-        return available
+        days = []
+        for offset in range(total_days):
+            target_date = start_date + timedelta(days=offset)
+            day_hours = schedule.day_hours(target_date)
+            available_times = entries[target_date].free_times(target_date)
+            days.append(
+                {
+                    'date': target_date.isoformat(),
+                    'is_open': day_hours is not None,
+                    'business_hours': day_hours,
+                    'available_times': available_times,
+                    'total_available': len(available_times),
+                }
+            )
 
-    async def get_available_times(
+        return {
+            'from': start_date.isoformat(),
+            'to': end_date.isoformat(),
+            'service': entries[start_date].service,
+            'days': days,
+            'total_available': sum(day['total_available'] for day in days),
+            'min_booking_hours': schedule.min_booking_hours,
+        }
+
+    async def get_next_available(
         self,
         service_id: int,
-        target_date: date,
+        count: int = 1,
         identifier: Optional[str] = None,
         search_type: str = 'auto',
     ) -> Dict[str, Any]:
         """
-        Retorna horários disponíveis para um serviço em uma data específica.
+        Primeiros `count` horários livres a partir de hoje, até
+        hoje + max_booking_days.
+
+        Percorre a agenda em blocos de NEXT_AVAILABLE_CHUNK_DAYS dias: cada
+        bloco é uma consulta de agendamentos (só dias abertos e fora do
+        cache); a busca para assim que encontra `count` horários.
         """
-        if identifier:
-            company, is_trial = await self._get_company_by_identifier(
-                identifier, search_type
+        company, is_trial = await self._resolve_company(
+            identifier, search_type
+        )
+        tenant_key = company.tenant_key()
+        schedule = await self._get_schedule(company, is_trial)
+
+        today = date.today()
+        last_day = today + timedelta(days=schedule.max_booking_days)
+
+        slots: List[Dict[str, str]] = []
+        summary: Optional[Dict[str, Any]] = None
+        searched_until = today
+        chunk_start = today
+        while chunk_start <= last_day and len(slots) < count:
+            chunk_end = min(
+                chunk_start + timedelta(days=NEXT_AVAILABLE_CHUNK_DAYS - 1),
+                last_day,
             )
-        else:
-            company, is_trial = await self._get_company()
+            entries = await self._get_day_entries(
+                tenant_key,
+                service_id,
+                chunk_start,
+                chunk_end,
+                schedule,
+                summary,
+            )
+            summary = entries[chunk_start].service
+            searched_until = chunk_end
+
+            for target_date in sorted(entries):
+                if schedule.day_hours(target_date) is None:
+                    continue
+                for start in entries[target_date].free_times(target_date):
+                    slots.append(
+                        {'date': target_date.isoformat(), 'time': start}
+                    )
+                    if len(slots) == count:
+                        break
+                if len(slots) == count:
+                    break
 
-        company_id = company.company_id()
+            chunk_start = chunk_end + timedelta(days=1)
+
+        return {
+            'service': summary,
+            'slots': slots,
+            'total_found': len(slots),
+            'requested': count,
+            'searched_until': searched_until.isoformat(),
+            'max_booking_days': schedule.max_booking_days,
+        }
+
+    async def _get_day_entries(
+        self,
+        tenant_key: int,
+        service_id: int,
+        start_date: date,
+        end_date: date,
+        schedule: CompiledSchedule,
+        service_summary: Optional[Dict[str, Any]] = None,
+    ) -> Dict[date, DayEntry]:
+        """
+        Disponibilidade de cada dia do intervalo. Dias já em cache não vão
+        ao banco; os demais custam uma consulta de serviço (dispensada se
+        `service_summary` for informado) e uma única consulta de
+        agendamentos para o intervalo que falta, sem contar dias fechados.
 
-        # Busca serviço considerando tanto user_id quanto trial_account_id
+        Serviço ligado a recursos: conta os agendamentos de qualquer
+        serviço nesses recursos; os demais seguem a regra por serviço.
+        """
+        entries: Dict[date, DayEntry] = {}
+        missing: List[date] = []
+        for offset in range((end_date - start_date).days + 1):
+            target_date = start_date + timedelta(days=offset)
+            entry = availability_cache.get(
+                tenant_key, service_id, target_date, schedule
+            )
+            if entry is None:
+                missing.append(target_date)
+            else:
+                entries[target_date] = entry
+
+        if not missing:
+            return entries
+
+        # Lida antes das consultas: invalidações no meio descartam o put
+        generation = availability_cache.generation
+
+        summary = service_summary
+        if summary is None:
+            service = await self._get_active_service(tenant_key, service_id)
+            summary = self._service_summary(service)
+
+        open_days = [d for d in missing if schedule.day_hours(d) is not None]
+        resource_ids = schedule.service_resources(service_id)
+        booked = {}
+        if open_days and resource_ids:
+            booked = await self._get_resource_indexes(
+                tenant_key, resource_ids, open_days[0], open_days[-1]
+            )
+        elif open_days:
+            booked = await self._get_booked_intervals(
+                tenant_key, service_id, open_days[0], open_days[-1]
+            )
+
+        for target_date in missing:
+            if resource_ids:
+                index = booked.get(target_date) or ResourceDayIndex()
+                day = schedule.build_pooled_day(
+                    target_date, index, resource_ids
+                )
+                booked_count = index.count
+            else:
+                bookings = booked.get(target_date, [])
+                day = schedule.build_day(target_date, bookings)
+                booked_count = len(bookings)
+            entry = DayEntry(schedule, summary, day, booked_count)
+            availability_cache.put(
+                tenant_key, service_id, target_date, entry, generation
+            )
+            entries[target_date] = entry
+        return entries
+
+    async def _get_active_service(
+        self, tenant_key: int, service_id: int
+    ) -> Service:
+        """Serviço ativo do tenant ou 404"""
         service = await Service.filter(
-            Q(user_id=company_id) | Q(trial_account_id=company_id),
+            tenant_key=tenant_key,
             id=service_id,
             is_active=True,
         ).first()
@@ -255,84 +408,224 @@ class Appointments:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Serviço não encontrado',
             )
+        return service
 
-        settings = await self._get_business_settings(company_id)
-        business_hours = await self._get_business_hours(company_id, is_trial)
-
-        # Converter nome do dia para inglês (correspondência com o JSON)
-        weekday_map = {
-            0: 'monday',
-            1: 'tuesday',
-            2: 'wednesday',
-            3: 'thursday',
-            4: 'friday',
-            5: 'saturday',
-            6: 'sunday',
+    @staticmethod
+    def _service_summary(service: Service) -> Dict[str, Any]:
+        return {
+            'id': service.id,
+            'name': service.name,
+            'duration_minutes': service.duration_minutes,
+            'price': str(service.price),
         }
-        day_name = weekday_map[target_date.weekday()]
 
-        if (
-            day_name not in business_hours
-            or not business_hours[day_name]['open']
-            or business_hours[day_name]['open'] is None
-        ):
-            return {
-                'date': target_date.isoformat(),
-                'service': service.name,
-                'available_times': [],
-                'message': 'Empresa não funciona neste dia',
-            }
+    async def _get_booked_intervals(
+        self,
+        tenant_key: int,
+        service_id: int,
+        start_date: date,
+        end_date: Optional[date] = None,
+        exclude_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> Dict[date, List[Tuple[int, int]]]:
+        """
+        Agendamentos ativos do serviço, agrupados por dia:
+        {data: [(início, duração), ...]}. Uma consulta para o intervalo.
+        """
+        query = Appointment.filter(
+            tenant_key=tenant_key,
+            service_id=service_id,
+            status__in=['scheduled', 'confirmed'],
+        )
+        if exclude_id is not None:
+            query = query.exclude(id=exclude_id)
+        if before_id is not None:
+            # Só os gravados antes (id menor)
+            query = query.filter(id__lt=before_id)
+        if end_date is None or end_date == start_date:
+            query = query.filter(appointment_date=start_date)
+        else:
+            query = query.filter(
+                appointment_date__range=(start_date, end_date)
+            )
+        appointments = await query.values(
+            'appointment_date', 'appointment_time', 'service__duration_minutes'
+        )
 
-        # Obter min_booking_hours das configurações
-        min_booking_hours = settings.get('min_booking_hours', 1)
+        intervals: Dict[date, List[Tuple[int, int]]] = {}
+        for appt in appointments:
+            start = parse_minutes(appt['appointment_time'])
+            if start is not None:
+                intervals.setdefault(appt['appointment_date'], []).append(
+                    (start, appt['service__duration_minutes'] or 60)
+                )
+        return intervals
 
-        # Gerar slots de tempo
-        all_time_slots = self._generate_time_slots(
-            business_hours[day_name]['open'],
-            business_hours[day_name]['close'],
-            settings['time_slot_duration'],
-            target_date,
-            min_booking_hours,
+    async def _get_resource_indexes(
+        self,
+        tenant_key: int,
+        resource_ids: Tuple[int, ...],
+        start_date: date,
+        end_date: Optional[date] = None,
+        exclude_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> Dict[date, ResourceDayIndex]:
+        """
+        Agendamentos ativos nos recursos (de qualquer serviço), num
+        índice de intervalos por dia. Uma consulta para o intervalo.
+        """
+        query = Appointment.filter(
+            tenant_key=tenant_key,
+            resource_id__in=resource_ids,
+            status__in=['scheduled', 'confirmed'],
         )
-
-        booked_times = await self._get_booked_times(
-            company_id, target_date, service_id
+        if exclude_id is not None:
+            query = query.exclude(id=exclude_id)
+        if before_id is not None:
+            # Só os gravados antes (id menor)
+            query = query.filter(id__lt=before_id)
+        if end_date is None or end_date == start_date:
+            query = query.filter(appointment_date=start_date)
+        else:
+            query = query.filter(
+                appointment_date__range=(start_date, end_date)
+            )
+        appointments = await query.values(
+            'appointment_date',
+            'appointment_time',
+            'resource_id',
+            'service__duration_minutes',
         )
 
-        available_times = self._filter_available_slots(
-            all_time_slots,
-            booked_times,
-            service.duration_minutes,
-            settings['max_daily_appointments'],
-        )
+        indexes: Dict[date, ResourceDayIndex] = {}
+        for appt in appointments:
+            start = parse_minutes(appt['appointment_time'])
+            if start is None:
+                continue
+            index = indexes.get(appt['appointment_date'])
+            if index is None:
+                index = indexes[appt['appointment_date']] = ResourceDayIndex()
+            duration = appt['service__duration_minutes'] or 60
+            index.add(appt['resource_id'], start, start + max(1, duration))
+        return indexes
+
+    async def _check_slot(
+        self,
+        tenant_key: int,
+        schedule: CompiledSchedule,
+        service_id: int,
+        duration: int,
+        target_date: date,
+        start: int,
+        exclude_id: Optional[int] = None,
+        resource_ids: Optional[Tuple[int, ...]] = None,
+        before_id: Optional[int] = None,
+    ) -> Tuple[bool, Optional[int]]:
+        """
+        [start, start + duration) está livre em target_date?
+        Retorna (livre, resource_id): com recursos, o primeiro recurso
+        livre (busca binária por recurso); sem recursos, resource_id é
+        None e só agendamentos do mesmo serviço conflitam.
+        `resource_ids` restringe a verificação a esses recursos;
+        `before_id` considera só agendamentos com id menor.
+        """
+        end = start + max(1, duration or 60)
+        if resource_ids is None:
+            resource_ids = schedule.service_resources(service_id)
+        if resource_ids:
+            indexes = await self._get_resource_indexes(
+                tenant_key,
+                resource_ids,
+                target_date,
+                exclude_id=exclude_id,
+                before_id=before_id,
+            )
+            index = indexes.get(target_date) or ResourceDayIndex()
+            resource_id = index.first_free(resource_ids, start, end)
+            return resource_id is not None, resource_id
 
-        return {
-            'date': target_date.isoformat(),
-            'service': {
-                'id': service.id,
-                'name': service.name,
-                'duration_minutes': service.duration_minutes,
-                'price': str(service.price),
-            },
-            'available_times': available_times,
-            'business_hours': business_hours[day_name],
-            'total_available': len(available_times),
-            'is_today': target_date == date.today(),
-            'min_booking_hours': min_booking_hours,
-        }
+        booked = await self._get_booked_intervals(
+            tenant_key,
+            service_id,
+            target_date,
+            exclude_id=exclude_id,
+            before_id=before_id,
+        )
+        free = all(
+            booked_start + booked_duration <= start or end <= booked_start
+            for booked_start, booked_duration in booked.get(target_date, [])
+        )
+        return free, None
 
-    async def _get_booked_times(
-        self, company_id: int, target_date: date, service_id: int
-    ) -> List[str]:
-        """Obtém horários já agendados."""
-        appointments = await Appointment.filter(
-            Q(user_id=company_id) | Q(trial_account_id=company_id),
-            appointment_date=target_date,
-            service_id=service_id,
-            status__in=['scheduled', 'confirmed'],
-        ).values('appointment_time')
+    async def _insert_appointment(
+        self,
+        tenant_key: int,
+        schedule: CompiledSchedule,
+        service: Service,
+        target_date: date,
+        start: int,
+        resource_id: Optional[int],
+        data: Dict[str, Any],
+    ) -> Optional[Appointment]:
+        """
+        INSERT protegido pelos índices únicos parciais de appointments
+        (migrations.upgrade_appointment_slot_unique): de várias reservas
+        simultâneas no mesmo horário/recurso só uma grava, as outras
+        recebem IntegrityError, verificam de novo e tentam o próximo
+        recurso livre. Sobreposição com início diferente (ex.: 09:00 de
+        90 min x 10:00): no PostgreSQL a exclusion constraint
+        (migrations.upgrade_appointment_slot_exclusion) também responde
+        com IntegrityError; no SQLite, depois do INSERT, quem conflita
+        com um agendamento de id menor (gravado antes) desiste e tenta
+        de novo. `resource_id`: resultado da verificação já feita. None
+        se não houver horário.
+        """
+        duration = service.duration_minutes
+        # Cada tentativa perdida ocupa um recurso: uma por recurso basta
+        attempts = len(schedule.service_resources(service.id)) + 1
+        for attempt in range(attempts):
+            if attempt:
+                is_free, resource_id = await self._check_slot(
+                    tenant_key,
+                    schedule,
+                    service.id,
+                    duration,
+                    target_date,
+                    start,
+                )
+                if not is_free:
+                    return None
 
-        return [appt['appointment_time'] for appt in appointments]
+            try:
+                appointment = await Appointment.create(
+                    resource_id=resource_id, **data
+                )
+            except IntegrityError:
+                logger.debug(
+                    'Corrida pelo horário (tentativa %d)', attempt + 1
+                )
+                continue
+
+            if slot_exclusion_active():
+                # O banco já recusou qualquer sobreposição
+                return appointment
+
+            # SQLite grava uma transação por vez: quem tem id menor
+            # foi gravado antes e fica com o horário
+            still_free, _ = await self._check_slot(
+                tenant_key,
+                schedule,
+                service.id,
+                duration,
+                target_date,
+                start,
+                resource_ids=(resource_id,) if resource_id else None,
+                before_id=appointment.id,
+            )
+            if still_free:
+                return appointment
+            await appointment.delete()
+        return None
 
     async def create_appointment(
         self,
@@ -357,19 +650,16 @@ class Appointments:
         print(f'  identifier: {identifier}')
         print(f'  search_type: {search_type}')
 
-        if identifier:
-            company, is_trial = await self._get_company_by_identifier(
-                identifier, search_type
-            )
-        else:
-            company, is_trial = await self._get_company()
+        company, is_trial = await self._resolve_company(
+            identifier, search_type
+        )
 
         company_id = company.company_id()
         print(f'DEBUG: Empresa ID: {company_id}, Is Trial: {is_trial}')
 
-        # Busca serviço considerando ambos os tipos
+        # Busca serviço pela chave do tenant
         service = await Service.filter(
-            Q(user_id=company_id) | Q(trial_account_id=company_id),
+            tenant_key=company.tenant_key(),
             id=service_id,
             is_active=True,
         ).first()
@@ -383,6 +673,51 @@ class Appointments:
 
         print(f'DEBUG: Serviço encontrado - {service.name}')
 
+        start_minute = parse_minutes(appointment_time)
+        if start_minute is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail='Horário inválido (use HH:MM)',
+            )
+        # '9:00' e '09:00' ocupam a mesma chave do índice único
+        appointment_time = format_minutes(start_minute)
+
+        # Só aceita o que /available-times ofereceria: expediente, grade,
+        # antecedência mínima, janela e limite diário (mesmo motor/cache)
+        schedule = await self._get_schedule(company, is_trial)
+        entries = await self._get_day_entries(
+            company.tenant_key(),
+            service_id,
+            appointment_date,
+            appointment_date,
+            schedule,
+            self._service_summary(service),
+        )
+        offered = entries[appointment_date].free_times(appointment_date)
+
+        # Conflito com outros agendamentos (recursos ou mesmo serviço),
+        # relido do banco: o cache pode não ter a reserva de agora há pouco
+        is_free, resource_id = False, None
+        if appointment_time in offered:
+            is_free, resource_id = await self._check_slot(
+                company.tenant_key(),
+                schedule,
+                service_id,
+                service.duration_minutes,
+                appointment_date,
+                start_minute,
+            )
+        if not is_free:
+            logger.debug(
+                'Horário indisponível - %s %s',
+                appointment_date,
+                appointment_time,
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='Horário indisponível',
+            )
+
         # Buscar ou criar cliente
         client = await self._get_or_create_client(
             company_id, is_trial, client_name, client_phone
@@ -397,6 +732,8 @@ class Appointments:
             'service_id': service_id,
             'appointment_date': appointment_date,
             'appointment_time': appointment_time,
+            'start_minute': start_minute,
+            'end_minute': start_minute + max(1, service.duration_minutes or 60),
             'client_name': client_name,
             'client_phone': client_phone,
             'price': service.price,
@@ -417,8 +754,15 @@ class Appointments:
             print(f'DEBUG: Usando user_id: {company_id}')
 
         try:
-            appointment = await Appointment.create(**appointment_data)
-            print(f'DEBUG: Agendamento criado - ID: {appointment.id}')
+            appointment = await self._insert_appointment(
+                company.tenant_key(),
+                schedule,
+                service,
+                appointment_date,
+                start_minute,
+                resource_id,
+                appointment_data,
+            )
         except Exception as e:
             print(f'DEBUG: Erro ao criar agendamento: {str(e)}')
             import traceback
@@ -429,27 +773,31 @@ class Appointments:
                 detail=f'Erro ao criar agendamento: {str(e)}',
             )
 
+        if appointment is None:
+            logger.debug('Horário tomado por outra reserva simultânea')
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='Horário indisponível',
+            )
+        logger.debug('Agendamento criado - ID: %s', appointment.id)
+
+        availability_cache.invalidate_date(
+            company.tenant_key(), appointment_date
+        )
+
         if client:
             client.total_appointments += 1
             await client.save()
 
-        # Buscar informações da empresa
-        company_info = None
-        if is_trial:
-            company_info = await TrialAccount.get_or_none(id=company_id)
-        else:
-            company_info = await User.get_or_none(id=company_id)
-
+        # Dados da empresa já carregados (sem nova consulta)
         return {
             'success': True,
             'appointment_id': appointment.id,
             'confirmation': {
                 'company': {
-                    'name': company_info.business_name
-                    if company_info
-                    else 'Salão',
-                    'phone': company_info.phone if company_info else '',
-                    'whatsapp': company_info.whatsapp if company_info else '',
+                    'name': company.company_name() or 'Salão',
+                    'phone': company.company_phone() or '',
+                    'whatsapp': company.company_whatsapp() or '',
                 },
                 'client': {'name': client_name, 'phone': client_phone},
                 'service': {
@@ -474,14 +822,10 @@ class Appointments:
         print(f'  company_id: {company_id}, is_trial: {is_trial}')
         print(f'  name: {name}, phone: {phone}')
 
-        # Buscar cliente considerando ambos os tipos
-        query = Q(phone=phone)
-        if is_trial:
-            query &= Q(trial_account_id=company_id)
-        else:
-            query &= Q(user_id=company_id)
-
-        client = await Client.filter(query).first()
+        # Buscar cliente pela chave do tenant (índice tenant_key, phone)
+        client = await Client.filter(
+            tenant_key=make_tenant_key(company_id, is_trial), phone=phone
+        ).first()
 
         if client:
             print(f'DEBUG: Cliente existente encontrado - ID: {client.id}')
@@ -531,11 +875,8 @@ class Appointments:
         company, is_trial = await self._get_company()
         company_id = company.company_id()
 
-        # Filtra por user_id OU trial_account_id baseado no tipo
-        if is_trial:
-            query = Appointment.filter(trial_account_id=company_id)
-        else:
-            query = Appointment.filter(user_id=company_id)
+        # Filtra pela chave do tenant (índice tenant_key, appointment_date)
+        query = Appointment.filter(tenant_key=company.tenant_key())
 
         if start_date:
             query = query.filter(appointment_date__gte=start_date)
@@ -585,18 +926,12 @@ class Appointments:
         """Atualizar informações de um agendamento já cadastrado."""
         company, is_trial = await self._get_company()
         company_id = company.company_id()
+        tenant_key = company.tenant_key()
 
-        # Buscar o agendamento considerando ambos os tipos
-        if is_trial:
-            search_appointment = await Appointment.filter(
-                trial_account_id=company_id,
-                id=target_appointment,
-            ).first()
-        else:
-            search_appointment = await Appointment.filter(
-                user_id=company_id,
-                id=target_appointment,
-            ).first()
+        search_appointment = await Appointment.filter(
+            tenant_key=tenant_key,
+            id=target_appointment,
+        ).first()
 
         if not search_appointment:
             raise HTTPException(
@@ -617,7 +952,7 @@ class Appointments:
             if schema.service_id is not None:
                 # Verificar se o serviço pertence à empresa
                 service = await Service.filter(
-                    Q(user_id=company_id) | Q(trial_account_id=company_id),
+                    tenant_key=tenant_key,
                     id=schema.service_id,
                     is_active=True,
                 ).first()
@@ -650,8 +985,21 @@ class Appointments:
             if schema.notes is not None:
                 update_data['notes'] = schema.notes
 
-            # Validar disponibilidade se data/hora for alterada
-            if schema.appointment_date or schema.appointment_time:
+            # Cancelado/concluído voltando a ocupar horário
+            active_statuses = ('scheduled', 'confirmed')
+            reactivated = (
+                schema.status in active_statuses
+                and search_appointment.status not in active_statuses
+            )
+
+            # Validar disponibilidade se data/hora/serviço for alterado
+            # ou se o agendamento for reativado
+            if (
+                schema.appointment_date
+                or schema.appointment_time
+                or schema.service_id
+                or reactivated
+            ):
                 appointment_date = (
                     schema.appointment_date
                     or search_appointment.appointment_date
@@ -662,27 +1010,68 @@ class Appointments:
                 )
                 service_id = schema.service_id or search_appointment.service_id
 
-                # Verificar se o novo horário está disponível
-                existing_query = Appointment.filter(
-                    Q(user_id=company_id) | Q(trial_account_id=company_id),
-                    appointment_date=appointment_date,
-                    appointment_time=appointment_time,
-                    service_id=service_id,
-                    status__in=['scheduled', 'confirmed'],
-                ).exclude(id=target_appointment)
+                start_minute = parse_minutes(appointment_time)
+                if start_minute is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail='Horário inválido (use HH:MM)',
+                    )
+                if schema.appointment_time:
+                    update_data['appointment_time'] = format_minutes(
+                        start_minute
+                    )
+                if schema.service_id is not None:
+                    duration = service.duration_minutes
+                else:
+                    duration = (
+                        await Service.filter(id=service_id)
+                        .first()
+                        .values_list('duration_minutes', flat=True)
+                    )
 
-                existing = await existing_query.first()
+                # Verificar se o novo horário está disponível
+                schedule = await self._get_schedule(company, is_trial)
+                is_free, resource_id = await self._check_slot(
+                    tenant_key,
+                    schedule,
+                    service_id,
+                    duration,
+                    appointment_date,
+                    start_minute,
+                    exclude_id=target_appointment,
+                )
 
-                if existing:
+                if not is_free:
                     raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
+                        status_code=status.HTTP_409_CONFLICT,
                         detail='Horário já ocupado por outro agendamento',
                     )
+                update_data['resource_id'] = resource_id
+                update_data['start_minute'] = start_minute
+                update_data['end_minute'] = start_minute + max(
+                    1, duration or 60
+                )
 
             # Atualizar o agendamento
             update_data['updated_at'] = datetime.utcnow()
-            await Appointment.filter(id=target_appointment).update(
-                **update_data
+            try:
+                await Appointment.filter(id=target_appointment).update(
+                    **update_data
+                )
+            except IntegrityError:
+                # Índice único ou exclusion constraint: outra reserva
+                # ativa no horário, gravada em paralelo
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail='Horário já ocupado por outro agendamento',
+                )
+            # Data antiga e nova (remarcação, status ou serviço alterados)
+            availability_cache.invalidate_dates(
+                tenant_key,
+                (
+                    search_appointment.appointment_date,
+                    update_data.get('appointment_date'),
+                ),
             )
 
             # Buscar o agendamento atualizado
@@ -702,13 +1091,9 @@ class Appointments:
                 ).first()
                 if client and client.phone != schema.client_phone:
                     # Buscar cliente existente com novo telefone
-                    client_query = Q(phone=schema.client_phone)
-                    if is_trial:
-                        client_query &= Q(trial_account_id=company_id)
-                    else:
-                        client_query &= Q(user_id=company_id)
-
-                    new_client = await Client.filter(client_query).first()
+                    new_client = await Client.filter(
+                        tenant_key=tenant_key, phone=schema.client_phone
+                    ).first()
 
                     if new_client:
                         await Appointment.filter(id=target_appointment).update(
@@ -0,0 +1,153 @@
+# app/controllers/agendame/availability.py
+"""
+Motor de disponibilidade por bitmap de minutos.
+
+Cada dia é um inteiro Python de 1440 bits: o bit m ligado significa que
+o minuto m (00:00 = 0) está livre. O expediente liga um intervalo, cada
+agendamento (início + duração) desliga o seu, e a antecedência mínima
+(min_booking_hours) desliga tudo antes do corte.
+
+"Quais horários comportam um serviço de N minutos" vira operações sobre
+o inteiro inteiro (AND/shift), sem laço por minuto: com a técnica de
+duplicação, `livre & (livre >> k)` marca os inícios com 2k minutos
+livres, então ⌈log2 N⌉ passos bastam. O resultado é cruzado com a grade
+de horários (abertura + i·time_slot_duration).
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_minutes(
+    value: Optional[str], end_of_day: bool = False
+) -> Optional[int]:
+    """
+    'HH:MM' (ou 'HH:MM:SS') → minutos desde 00:00. None se inválido.
+    `end_of_day` aceita também '24:00' (fechamento à meia-noite), que
+    nunca é um início válido: o minuto 1440 fica fora do bitmap.
+    """
+    if not value:
+        return None
+    try:
+        hours, minutes = (int(part) for part in value.split(':')[:2])
+    except ValueError:
+        return None
+    if end_of_day and hours == 24 and minutes == 0:
+        return MINUTES_PER_DAY
+    if 0 <= hours < 24 and 0 <= minutes < 60:
+        return hours * 60 + minutes
+    return None
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutos desde 00:00 → 'HH:MM'"""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def interval_mask(start: int, end: int) -> int:
+    """Bits [start, end) ligados, limitados ao dia"""
+    start = max(0, start)
+    end = min(MINUTES_PER_DAY, end)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def fits_mask(free: int, duration: int) -> int:
+    """
+    Bits s tais que os minutos [s, s + duration) estão todos livres.
+    Técnica de duplicação: cada passo dobra o comprimento verificado.
+    """
+    if duration <= 1:
+        return free
+    result = free
+    length = 1
+    while length < duration:
+        step = min(length, duration - length)
+        result &= result >> step
+        length += step
+    return result
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Posições dos bits ligados, em ordem crescente"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class DayAvailability:
+    """Minutos livres e grade de inícios de um dia"""
+
+    __slots__ = ('free', 'grid')
+
+    def __init__(self, free: int = 0, grid: int = 0) -> None:
+        self.free = free
+        self.grid = grid
+
+    @classmethod
+    def build(
+        cls,
+        open_minute: Optional[int],
+        close_minute: Optional[int],
+        slot_duration: int,
+        bookings: Iterable[Tuple[int, int]] = (),
+        not_before: Optional[int] = None,
+    ) -> 'DayAvailability':
+        """
+        open_minute/close_minute: expediente (minutos desde 00:00)
+        slot_duration: passo da grade de horários oferecidos
+        bookings: (início, duração) dos agendamentos ativos
+        not_before: primeiro minuto permitido (antecedência mínima)
+        """
+        if (
+            open_minute is None
+            or close_minute is None
+            or close_minute <= open_minute
+        ):
+            return cls()
+
+        free = interval_mask(open_minute, close_minute)
+        for start, duration in bookings:
+            free &= ~interval_mask(start, start + max(1, duration))
+        if not_before is not None and not_before > open_minute:
+            free &= ~interval_mask(0, not_before)
+
+        grid = 0
+        for start in range(open_minute, close_minute, max(1, slot_duration)):
+            grid |= 1 << start
+
+        return cls(free, grid)
+
+    def block(self, start: int, duration: int) -> None:
+        """Ocupa [start, start + duration)"""
+        self.free &= ~interval_mask(start, start + max(1, duration))
+
+    def free_start_minutes(
+        self, duration: int, not_before: Optional[int] = None
+    ) -> List[int]:
+        """
+        Inícios da grade com `duration` minutos livres seguidos.
+        not_before: descarta inícios anteriores (filtro de "agora",
+        aplicado na leitura para que o bitmap possa ficar em cache).
+        """
+        starts = fits_mask(self.free, duration) & self.grid
+        if not_before:
+            starts &= ~interval_mask(0, not_before)
+        return list(iter_bits(starts))
+
+    def free_starts(
+        self, duration: int, not_before: Optional[int] = None
+    ) -> List[str]:
+        """Mesmo que free_start_minutes, em 'HH:MM'"""
+        return [
+            format_minutes(m)
+            for m in self.free_start_minutes(duration, not_before)
+        ]
+
+    def is_free(self, start: int, duration: int) -> bool:
+        """O intervalo [start, start + duration) está todo livre?"""
+        mask = interval_mask(start, start + max(1, duration))
+        return bool(mask) and self.free & mask == mask
@@ -0,0 +1,165 @@
+# app/controllers/agendame/availability_cache.py
+"""
+Cache de disponibilidade por (tenant, serviço, data).
+
+O chat público e o dashboard pedem os mesmos horários várias vezes.
+Cada entrada guarda o bitmap do dia (expediente - agendamentos; um por
+recurso se o serviço usa recursos), o total de agendamentos ativos e o
+resumo do serviço, então uma leitura repetida não vai ao banco. O que
+depende da hora atual (antecedência mínima, janela de agendamento) é
+aplicado na leitura, nunca guardado.
+
+Invalidação:
+- agendamento criado/alterado/removido ou status alterado: todas as
+  entradas do tenant naquela data (`invalidate_date`), inclusive de
+  outros serviços que dividem os mesmos recursos;
+- serviço alterado/removido: entradas do serviço (`invalidate_service`);
+- expediente/configurações/recursos: a entrada guarda o CompiledSchedule
+  com que foi montada e é ignorada quando o schedule_cache já tem outro.
+
+Uma leitura que começou antes de uma invalidação não grava o resultado
+(contador de gerações), para não reinserir um dia desatualizado.
+
+`invalidate_date` também avisa as conexões SSE da data
+(availability_stream.py).
+"""
+
+import os
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Union
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from app.controllers.agendame.availability import DayAvailability
+from app.controllers.agendame.availability_stream import availability_stream
+from app.controllers.agendame.resource_index import PooledAvailability
+from app.controllers.agendame.schedule import CompiledSchedule
+
+load_dotenv()
+
+AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', '20000'))
+AVAILABILITY_CACHE_TTL = int(os.getenv('AVAILABILITY_CACHE_TTL', '600'))
+
+
+class DayEntry:
+    """Disponibilidade de um serviço em uma data"""
+
+    __slots__ = ('schedule', 'service', 'day', 'booked_count')
+
+    def __init__(
+        self,
+        schedule: CompiledSchedule,
+        service: Dict,
+        day: Union[DayAvailability, PooledAvailability, None],
+        booked_count: int,
+    ) -> None:
+        self.schedule = schedule
+        # Resumo do serviço (id, name, duration_minutes, price)
+        self.service = service
+        self.day = day
+        self.booked_count = booked_count
+
+    def free_times(self, target_date: date) -> List[str]:
+        """Horários livres agora (antecedência e janela na leitura)"""
+        return self.schedule.free_times(
+            target_date,
+            self.day,
+            self.booked_count,
+            self.service['duration_minutes'],
+        )
+
+
+class AvailabilityCache:
+    """
+    TTLCache (tenant_key, data) → {service_id: DayEntry}.
+    Agrupar por data deixa a invalidação de um agendamento em O(1).
+    """
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(
+        self,
+        tenant_key: int,
+        service_id: int,
+        target_date: date,
+        schedule: CompiledSchedule,
+    ) -> Optional[DayEntry]:
+        """Entrada válida ou None (conta hit/miss)"""
+        services = self._cache.get((tenant_key, target_date))
+        entry = services.get(service_id) if services else None
+        if entry is not None and entry.schedule is schedule:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        tenant_key: int,
+        service_id: int,
+        target_date: date,
+        entry: DayEntry,
+        generation: int,
+    ) -> None:
+        """
+        Grava a entrada se nada foi invalidado desde `generation`
+        (valor lido antes da consulta ao banco).
+        """
+        if generation != self.generation:
+            return
+        key = (tenant_key, target_date)
+        services = self._cache.get(key)
+        if services is None:
+            services = {}
+            self._cache[key] = services
+        services[service_id] = entry
+
+    def invalidate_date(self, tenant_key: int, target_date: date) -> None:
+        """Agendamento do tenant alterado nesta data"""
+        self.generation += 1
+        if self._cache.pop((tenant_key, target_date), None) is not None:
+            self.invalidations += 1
+        # Páginas abertas nesta data recebem os horários novos (SSE)
+        availability_stream.notify(tenant_key, target_date)
+
+    def invalidate_dates(
+        self, tenant_key: int, dates: Iterable[Optional[date]]
+    ) -> None:
+        """Mesmo que invalidate_date para várias datas (ex.: remarcação)"""
+        for target_date in set(dates):
+            if target_date is not None:
+                self.invalidate_date(tenant_key, target_date)
+
+    def invalidate_service(self, tenant_key: int, service_id: int) -> None:
+        """Serviço alterado/removido: varre as datas do tenant"""
+        self.generation += 1
+        for key, services in list(self._cache.items()):
+            if key[0] == tenant_key and services.pop(service_id, None):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self._cache.maxsize,
+            'ttl': self._cache.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+availability_cache = AvailabilityCache(
+    maxsize=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL
+)
@@ -0,0 +1,156 @@
+# app/controllers/agendame/availability_stream.py
+"""
+Avisos de mudança de disponibilidade para a página pública (SSE).
+
+Cada página do chat com uma data escolhida abre um EventSource em
+/services/<empresa>/availability/stream e fica inscrita em
+(tenant_key, data). Quando um agendamento daquela data é criado,
+remarcado, cancelado ou removido, o availability_cache invalida a data
+e chama `notify`: cada inscrito acorda, e os horários novos são
+calculados uma única vez por (tenant, data, serviço, versão) e
+repassados a todos (`snapshot`), em vez de cada cliente refazer
+/available-times.
+
+O aviso é um asyncio.Event por inscrito: várias mudanças seguidas viram
+um único recálculo e nada se acumula para clientes lentos. Os inscritos
+vivem na memória do processo: com vários workers, cada um avisa apenas
+as conexões que atende.
+"""
+
+import asyncio
+import os
+from datetime import date
+from typing import (Any, Awaitable, Callable, Dict, Hashable, Optional, Set,
+                    Tuple)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Conexões simultâneas aceitas (por processo)
+AVAILABILITY_STREAM_MAX = int(os.getenv('AVAILABILITY_STREAM_MAX', '2000'))
+# Segundos entre comentários de keep-alive (proxies fecham conexões mudas)
+AVAILABILITY_STREAM_PING = int(os.getenv('AVAILABILITY_STREAM_PING', '20'))
+
+StreamKey = Tuple[int, date]
+
+
+class Subscription:
+    """Uma conexão inscrita em (tenant_key, data)"""
+
+    __slots__ = ('key', 'changed', 'closed')
+
+    def __init__(self, key: StreamKey) -> None:
+        self.key = key
+        self.changed = asyncio.Event()
+        self.closed = False
+
+    async def wait(self, timeout: float) -> bool:
+        """True se houve mudança; False no timeout (hora do ping)"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+class AvailabilityStream:
+    """Inscritos por (tenant_key, data) e cálculo compartilhado"""
+
+    def __init__(self, max_subscribers: int) -> None:
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[StreamKey, Set[Subscription]] = {}
+        # Última mudança de cada (tenant_key, data) com inscritos.
+        # Contador global: uma chave removida e recriada nunca repete
+        # uma versão antiga (e não reaproveita um cálculo desatualizado)
+        self._sequence = 0
+        self._versions: Dict[StreamKey, int] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.total = 0
+        self.notifications = 0
+        self.wakeups = 0
+        self.snapshots = 0
+        self.shared_snapshots = 0
+        self.rejected = 0
+
+    def subscribe(
+        self, tenant_key: int, target_date: date
+    ) -> Optional[Subscription]:
+        """Nova inscrição ou None se o limite de conexões foi atingido"""
+        if self.total >= self.max_subscribers:
+            self.rejected += 1
+            return None
+        key = (tenant_key, target_date)
+        subscription = Subscription(key)
+        self._subscribers.setdefault(key, set()).add(subscription)
+        self.total += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.key)
+        if not subscribers or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        self.total -= 1
+        if not subscribers:
+            del self._subscribers[subscription.key]
+            self._versions.pop(subscription.key, None)
+
+    def version(self, tenant_key: int, target_date: date) -> int:
+        return self._versions.get((tenant_key, target_date), self._sequence)
+
+    def notify(self, tenant_key: int, target_date: date) -> None:
+        """Agendamentos do tenant mudaram nesta data (availability_cache)"""
+        key = (tenant_key, target_date)
+        subscribers = self._subscribers.get(key)
+        if not subscribers:
+            return
+        self.notifications += 1
+        self._sequence += 1
+        self._versions[key] = self._sequence
+        for subscription in subscribers:
+            subscription.changed.set()
+            self.wakeups += 1
+
+    async def snapshot(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Resultado de `loader` compartilhado entre quem pede a mesma
+        `key` ao mesmo tempo (uma consulta por mudança, não por conexão).
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            self.snapshots += 1
+            future = asyncio.ensure_future(loader())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared_snapshots += 1
+        # Um cliente que desconecta não cancela o cálculo dos outros
+        return await asyncio.shield(future)
+
+    def close(self) -> None:
+        """Encerramento do servidor: acorda e libera todas as conexões"""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.closed = True
+                subscription.changed.set()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'subscribers': self.total,
+            'keys': len(self._subscribers),
+            'max_subscribers': self.max_subscribers,
+            'notifications': self.notifications,
+            'wakeups': self.wakeups,
+            'snapshots': self.snapshots,
+            'shared_snapshots': self.shared_snapshots,
+            'rejected': self.rejected,
+        }
+
+
+availability_stream = AvailabilityStream(
+    max_subscribers=AVAILABILITY_STREAM_MAX
+)
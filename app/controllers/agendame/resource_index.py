@@ -0,0 +1,139 @@
+# app/controllers/agendame/resource_index.py
+"""
+Índice de intervalos ocupados por recurso em um dia.
+
+Um serviço ligado a recursos (profissionais, cadeiras, salas) pode ser
+agendado se algum dos seus recursos estiver livre durante toda a
+duração, qualquer que seja o serviço que o ocupa. Para cada recurso o
+índice guarda os intervalos [início, fim) ocupados, já fundidos e
+disjuntos, numa SortedList: como os intervalos não se sobrepõem, os
+fins também ficam ordenados e "o recurso está livre em [s, e)?" olha
+só o último intervalo que começa antes de `e` — uma busca binária,
+O(log n) por consulta.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from app.controllers.agendame.availability import (DayAvailability,
+                                                   fits_mask, format_minutes,
+                                                   interval_mask, iter_bits)
+
+
+class ResourceDayIndex:
+    """Intervalos ocupados de cada recurso em uma data"""
+
+    __slots__ = ('_busy', 'count')
+
+    def __init__(self) -> None:
+        self._busy: Dict[int, SortedList] = {}
+        # Agendamentos inseridos (limite diário)
+        self.count = 0
+
+    @classmethod
+    def build(
+        cls, bookings: Iterable[Tuple[int, int, int]]
+    ) -> 'ResourceDayIndex':
+        """bookings: (resource_id, início, duração)"""
+        index = cls()
+        for resource_id, start, duration in bookings:
+            index.add(resource_id, start, start + max(1, duration))
+        return index
+
+    def add(self, resource_id: int, start: int, end: int) -> None:
+        """Ocupa [start, end), fundindo com intervalos encostados"""
+        self.count += 1
+        intervals = self._busy.get(resource_id)
+        if intervals is None:
+            intervals = self._busy[resource_id] = SortedList()
+
+        # Vizinho à esquerda que encosta/sobrepõe
+        position = intervals.bisect_left((start,))
+        if position and intervals[position - 1][1] >= start:
+            position -= 1
+        while (
+            position < len(intervals) and intervals[position][0] <= end
+        ):
+            left, right = intervals.pop(position)
+            start = min(start, left)
+            end = max(end, right)
+        intervals.add((start, end))
+
+    def is_free(self, resource_id: int, start: int, end: int) -> bool:
+        """Nenhum intervalo ocupado cruza [start, end)? O(log n)"""
+        intervals = self._busy.get(resource_id)
+        if not intervals:
+            return True
+        position = intervals.bisect_left((end,))
+        return position == 0 or intervals[position - 1][1] <= start
+
+    def first_free(
+        self, resource_ids: Iterable[int], start: int, end: int
+    ) -> Optional[int]:
+        """Primeiro recurso livre em [start, end) ou None"""
+        for resource_id in resource_ids:
+            if self.is_free(resource_id, start, end):
+                return resource_id
+        return None
+
+    def busy(self, resource_id: int) -> List[Tuple[int, int]]:
+        """Intervalos ocupados do recurso, em ordem"""
+        return list(self._busy.get(resource_id, ()))
+
+
+class PooledAvailability:
+    """
+    Disponibilidade de um grupo de recursos: um início serve se ao menos
+    um recurso comporta a duração inteira. Mesma interface de leitura de
+    DayAvailability (free_start_minutes/free_starts/is_free).
+    """
+
+    __slots__ = ('days',)
+
+    def __init__(self, days: List[DayAvailability]) -> None:
+        # Um bitmap por recurso, todos com a mesma grade
+        self.days = days
+
+    @classmethod
+    def build(
+        cls,
+        open_minute: int,
+        close_minute: int,
+        slot_duration: int,
+        index: ResourceDayIndex,
+        resource_ids: Iterable[int],
+    ) -> 'PooledAvailability':
+        days = []
+        for resource_id in resource_ids:
+            day = DayAvailability.build(
+                open_minute, close_minute, slot_duration
+            )
+            for start, end in index.busy(resource_id):
+                day.block(start, end - start)
+            days.append(day)
+        return cls(days)
+
+    def free_start_minutes(
+        self, duration: int, not_before: Optional[int] = None
+    ) -> List[int]:
+        if not self.days:
+            return []
+        starts = 0
+        for day in self.days:
+            starts |= fits_mask(day.free, duration)
+        starts &= self.days[0].grid
+        if not_before:
+            starts &= ~interval_mask(0, not_before)
+        return list(iter_bits(starts))
+
+    def free_starts(
+        self, duration: int, not_before: Optional[int] = None
+    ) -> List[str]:
+        return [
+            format_minutes(m)
+            for m in self.free_start_minutes(duration, not_before)
+        ]
+
+    def is_free(self, start: int, duration: int) -> bool:
+        return any(day.is_free(start, duration) for day in self.days)
@@ -0,0 +1,152 @@
+from datetime import date
+from typing import Any, Dict, List
+
+from fastapi import HTTPException, status
+
+from app.controllers.agendame.schedule import schedule_cache
+from app.controllers.company.company_context import CompanyContext
+from app.models.user import Appointment, Resource, Service
+from app.schemas.agendame.resources import ResourceCreate, ResourceUpdate
+
+
+class Resources:
+    """
+    Recursos da empresa (profissionais, cadeiras, salas) e os serviços
+    que cada um atende. Um serviço com recursos só aceita agendamento
+    quando algum deles está livre (ver resource_index.py).
+    """
+
+    def __init__(self, context: CompanyContext) -> None:
+        self.context = context
+
+    @property
+    def tenant_key(self) -> int:
+        return self.context.tenant_key
+
+    @staticmethod
+    def _resource_data(
+        resource: Resource, service_ids: List[int]
+    ) -> Dict[str, Any]:
+        return {
+            'id': resource.id,
+            'name': resource.name,
+            'kind': resource.kind,
+            'is_active': resource.is_active,
+            'service_ids': sorted(service_ids),
+        }
+
+    async def _get_resource(self, resource_id: int) -> Resource:
+        resource = await Resource.filter(
+            tenant_key=self.tenant_key, id=resource_id
+        ).first()
+        if not resource:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Recurso não encontrado',
+            )
+        return resource
+
+    async def _get_services(self, service_ids: List[int]) -> List[Service]:
+        """Serviços da empresa; 400 se algum id não pertence a ela"""
+        ids = set(service_ids)
+        if not ids:
+            return []
+        services = await Service.filter(tenant_key=self.tenant_key, id__in=ids)
+        if len(services) != len(ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Serviço não encontrado ou não pertence à empresa',
+            )
+        return services
+
+    def _changed(self) -> None:
+        # Relações M2M não disparam post_save: recompila a agenda
+        # (entradas do availability_cache ficam obsoletas junto)
+        schedule_cache.invalidate(self.tenant_key)
+
+    async def list_resources(self) -> List[Dict[str, Any]]:
+        resources = (
+            await Resource.filter(tenant_key=self.tenant_key)
+            .order_by('id')
+            .prefetch_related('services')
+        )
+        return [
+            self._resource_data(r, [s.id for s in r.services])
+            for r in resources
+        ]
+
+    async def create_resource(self, schema: ResourceCreate) -> Dict[str, Any]:
+        services = await self._get_services(schema.service_ids)
+
+        data = {
+            'name': schema.name.strip(),
+            'kind': schema.kind,
+            'is_active': schema.is_active,
+        }
+        if self.context.is_trial:
+            data['trial_account_id'] = self.context.company_id
+        else:
+            data['user_id'] = self.context.company_id
+
+        resource = await Resource.create(**data)
+        if services:
+            await resource.services.add(*services)
+        self._changed()
+
+        return self._resource_data(resource, [s.id for s in services])
+
+    async def update_resource(
+        self, resource_id: int, schema: ResourceUpdate
+    ) -> Dict[str, Any]:
+        resource = await self._get_resource(resource_id)
+
+        if schema.name is not None:
+            resource.name = schema.name.strip()
+        if schema.kind is not None:
+            resource.kind = schema.kind
+        if schema.is_active is not None:
+            resource.is_active = schema.is_active
+        await resource.save()
+
+        if schema.service_ids is not None:
+            services = await self._get_services(schema.service_ids)
+            await resource.services.clear()
+            if services:
+                await resource.services.add(*services)
+            service_ids = [s.id for s in services]
+        else:
+            service_ids = await resource.services.all().values_list(
+                'id', flat=True
+            )
+        self._changed()
+
+        return self._resource_data(resource, service_ids)
+
+    async def remove_resource(self, resource_id: int) -> Dict[str, Any]:
+        """
+        Remove o recurso. Com agendamentos ativos a partir de hoje a
+        remoção é recusada (desative-o ou remarque antes): sem o recurso
+        esses horários deixariam de bloquear a agenda.
+        """
+        resource = await self._get_resource(resource_id)
+
+        pending = await Appointment.filter(
+            tenant_key=self.tenant_key,
+            resource_id=resource_id,
+            status__in=['scheduled', 'confirmed'],
+            appointment_date__gte=date.today(),
+        ).count()
+        if pending:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f'Recurso possui {pending} agendamento(s) futuro(s)',
+            )
+
+        # Histórico continua, sem o recurso
+        await Appointment.filter(
+            tenant_key=self.tenant_key, resource_id=resource_id
+        ).update(resource_id=None)
+        await resource.delete()
+        self._changed()
+
+        return {'status': 200}
@@ -0,0 +1,352 @@
+# app/controllers/agendame/schedule.py
+"""
+Agenda compilada de cada empresa (tenant).
+
+O cálculo de disponibilidade precisa do business_hours (JSONField de
+User/TrialAccount) e do BusinessSettings. Em vez de reler os dois e
+reconverter as strings 'HH:MM' a cada requisição, eles são compilados
+uma vez num CompiledSchedule (minutos desde 00:00 por dia da semana,
+duração do slot, antecedência mínima, janela de agendamento e limite
+diário) e guardados no `schedule_cache`, junto com os recursos ativos
+de cada serviço (profissionais, cadeiras, salas).
+
+A entrada do tenant é descartada quando o business_hours, o
+BusinessSettings ou um Resource são salvos (sinais post_save/post_delete
+do Tortoise, registrados neste módulo) e, como garantia, expira após
+SCHEDULE_CACHE_TTL. Alterações feitas com QuerySet.update() ou nas
+relações Resource ↔ Service não disparam sinais: chame
+`schedule_cache.invalidate(tenant_key)`.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from tortoise.signals import post_delete, post_save
+
+from app.controllers.agendame.availability import (MINUTES_PER_DAY,
+                                                   DayAvailability,
+                                                   parse_minutes)
+from app.controllers.agendame.resource_index import (PooledAvailability,
+                                                     ResourceDayIndex)
+from app.models.trial import TrialAccount
+from app.models.user import BusinessSettings, Resource, User
+from app.utils.tenant_key import make_tenant_key, tenant_key_from_owner
+
+load_dotenv()
+
+SCHEDULE_CACHE_SIZE = int(os.getenv('SCHEDULE_CACHE_SIZE', '4096'))
+SCHEDULE_CACHE_TTL = int(os.getenv('SCHEDULE_CACHE_TTL', '3600'))
+
+# Chaves de business_hours por date.weekday()
+WEEKDAY_NAMES = (
+    'monday',
+    'tuesday',
+    'wednesday',
+    'thursday',
+    'friday',
+    'saturday',
+    'sunday',
+)
+
+# Usado quando a empresa não tem business_hours
+DEFAULT_BUSINESS_HOURS = {
+    'monday': {'open': '09:00', 'close': '18:00'},
+    'tuesday': {'open': '09:00', 'close': '18:00'},
+    'wednesday': {'open': '09:00', 'close': '18:00'},
+    'thursday': {'open': '09:00', 'close': '18:00'},
+    'friday': {'open': '09:00', 'close': '18:00'},
+    'saturday': {'open': '09:00', 'close': '17:00'},
+    'sunday': {'open': None, 'close': None},
+}
+
+# Usado quando a empresa não tem BusinessSettings
+DEFAULT_SETTINGS = {
+    'time_slot_duration': 60,
+    'max_daily_appointments': 20,
+    'min_booking_hours': 1,
+    'max_booking_days': 30,
+}
+
+
+class CompiledSchedule:
+    """Expediente e regras de agendamento de um tenant, já convertidos"""
+
+    __slots__ = (
+        'tenant_key',
+        'opens',
+        'closes',
+        'hours',
+        'slot_duration',
+        'min_booking_hours',
+        'max_booking_days',
+        'max_daily',
+        'resources',
+    )
+
+    def __init__(
+        self,
+        tenant_key: int,
+        business_hours: Optional[Dict],
+        settings: Optional[Dict] = None,
+        resources: Optional[Dict[int, Tuple[int, ...]]] = None,
+    ) -> None:
+        settings = settings or DEFAULT_SETTINGS
+        business_hours = business_hours or DEFAULT_BUSINESS_HOURS
+
+        opens: List[Optional[int]] = []
+        closes: List[Optional[int]] = []
+        hours: List[Optional[Dict]] = []
+        for name in WEEKDAY_NAMES:
+            day = business_hours.get(name) or {}
+            open_minute = parse_minutes(day.get('open'))
+            close_minute = parse_minutes(day.get('close'), end_of_day=True)
+            if (
+                open_minute is None
+                or close_minute is None
+                or close_minute <= open_minute
+            ):
+                # Fechado (ou horário inválido)
+                opens.append(None)
+                closes.append(None)
+                hours.append(None)
+            else:
+                opens.append(open_minute)
+                closes.append(close_minute)
+                hours.append({'open': day['open'], 'close': day['close']})
+
+        self.tenant_key = tenant_key
+        self.opens: Tuple[Optional[int], ...] = tuple(opens)
+        self.closes: Tuple[Optional[int], ...] = tuple(closes)
+        # Formato original do dia, devolvido nas respostas
+        self.hours: Tuple[Optional[Dict], ...] = tuple(hours)
+        self.slot_duration = max(
+            1,
+            settings.get('time_slot_duration')
+            or DEFAULT_SETTINGS['time_slot_duration'],
+        )
+        self.min_booking_hours = (
+            settings.get('min_booking_hours')
+            or DEFAULT_SETTINGS['min_booking_hours']
+        )
+        self.max_booking_days = (
+            settings.get('max_booking_days')
+            or DEFAULT_SETTINGS['max_booking_days']
+        )
+        self.max_daily = (
+            settings.get('max_daily_appointments')
+            or DEFAULT_SETTINGS['max_daily_appointments']
+        )
+        # service_id → ids dos recursos ativos que atendem o serviço
+        self.resources: Dict[int, Tuple[int, ...]] = resources or {}
+
+    def day_hours(self, target_date: date) -> Optional[Dict]:
+        """{'open', 'close'} do dia ou None se a empresa não funciona"""
+        return self.hours[target_date.weekday()]
+
+    def booking_cutoff(self, target_date: date) -> Optional[int]:
+        """
+        Primeiro minuto do dia que ainda respeita a antecedência mínima.
+        None: o dia inteiro é permitido.
+        """
+        cutoff = datetime.now() + timedelta(hours=self.min_booking_hours)
+        if target_date > cutoff.date():
+            return None
+        if target_date < cutoff.date():
+            return MINUTES_PER_DAY
+        minute = cutoff.hour * 60 + cutoff.minute
+        # 10:00:30 já não permite 10:00
+        if cutoff.second or cutoff.microsecond:
+            minute += 1
+        return minute
+
+    def in_window(self, target_date: date) -> bool:
+        """Data dentro da janela de agendamento (max_booking_days)"""
+        return target_date <= date.today() + timedelta(
+            days=self.max_booking_days
+        )
+
+    def build_day(
+        self,
+        target_date: date,
+        bookings: Iterable[Tuple[int, int]] = (),
+    ) -> Optional[DayAvailability]:
+        """
+        Bitmap do dia (expediente - agendamentos) ou None se fechado.
+        Não depende da hora atual: pode ficar em cache.
+        """
+        weekday = target_date.weekday()
+        if self.opens[weekday] is None:
+            return None
+        return DayAvailability.build(
+            self.opens[weekday],
+            self.closes[weekday],
+            self.slot_duration,
+            bookings,
+        )
+
+    def service_resources(self, service_id: int) -> Tuple[int, ...]:
+        """Recursos do serviço; vazio = regra antiga, por serviço"""
+        return self.resources.get(service_id, ())
+
+    def build_pooled_day(
+        self,
+        target_date: date,
+        index: ResourceDayIndex,
+        resource_ids: Iterable[int],
+    ) -> Optional[PooledAvailability]:
+        """Mesmo que build_day, para um serviço ligado a recursos"""
+        weekday = target_date.weekday()
+        if self.opens[weekday] is None:
+            return None
+        return PooledAvailability.build(
+            self.opens[weekday],
+            self.closes[weekday],
+            self.slot_duration,
+            index,
+            resource_ids,
+        )
+
+    def free_times(
+        self,
+        target_date: date,
+        day: Union[DayAvailability, PooledAvailability, None],
+        booked_count: int,
+        duration: int,
+    ) -> List[str]:
+        """
+        Inícios livres para um serviço de `duration` minutos, aplicando
+        o limite diário, a janela e a antecedência mínima (agora).
+        """
+        if (
+            day is None
+            or booked_count >= self.max_daily
+            or not self.in_window(target_date)
+        ):
+            return []
+        return day.free_starts(duration, self.booking_cutoff(target_date))
+
+
+def _settings_dict(settings: Optional[BusinessSettings]) -> Optional[Dict]:
+    if settings is None:
+        return None
+    return {name: getattr(settings, name) for name in DEFAULT_SETTINGS}
+
+
+async def _load_resources(tenant_key: int) -> Dict[int, Tuple[int, ...]]:
+    """service_id → recursos ativos (uma consulta, via service_resources)"""
+    rows = (
+        await Resource.filter(tenant_key=tenant_key, is_active=True)
+        .order_by('id')
+        .values_list('id', 'services__id')
+    )
+    resources: Dict[int, List[int]] = {}
+    for resource_id, service_id in rows:
+        if service_id is not None:
+            resources.setdefault(service_id, []).append(resource_id)
+    return {
+        service_id: tuple(sorted(ids)) for service_id, ids in resources.items()
+    }
+
+
+class ScheduleCache:
+    """Cache (LRU + TTL) tenant_key → CompiledSchedule"""
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(
+        self,
+        company_id: int,
+        is_trial: bool,
+        business_hours: Optional[Dict] = None,
+    ) -> CompiledSchedule:
+        """
+        Agenda compilada da empresa. `business_hours` evita reler a
+        linha quando ela já foi carregada (CompanyContext).
+        """
+        tenant_key = make_tenant_key(company_id, is_trial)
+        schedule = self._cache.get(tenant_key)
+        if schedule is not None:
+            self.hits += 1
+            return schedule
+
+        self.misses += 1
+        if business_hours is None:
+            model = TrialAccount if is_trial else User
+            business_hours = (
+                await model.filter(id=company_id)
+                .first()
+                .values_list('business_hours', flat=True)
+            )
+        settings = await BusinessSettings.filter(tenant_key=tenant_key).first()
+        resources = await _load_resources(tenant_key)
+
+        schedule = CompiledSchedule(
+            tenant_key, business_hours, _settings_dict(settings), resources
+        )
+        self._cache[tenant_key] = schedule
+        return schedule
+
+    def invalidate(self, tenant_key: Optional[int]) -> None:
+        """Expediente ou configurações do tenant alterados"""
+        if tenant_key is not None and self._cache.pop(tenant_key, None):
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self._cache.maxsize,
+            'ttl': self._cache.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+schedule_cache = ScheduleCache(
+    maxsize=SCHEDULE_CACHE_SIZE, ttl=SCHEDULE_CACHE_TTL
+)
+
+
+@post_save(BusinessSettings)
+@post_delete(BusinessSettings)
+async def _settings_changed(sender, instance, *args) -> None:
+    schedule_cache.invalidate(
+        tenant_key_from_owner(instance.user_id, instance.trial_account_id)
+    )
+
+
+@post_save(User)
+@post_save(TrialAccount)
+async def _company_saved(sender, instance, created, using_db, update_fields):
+    # save(update_fields=[...]) sem business_hours não altera a agenda
+    if update_fields and 'business_hours' not in update_fields:
+        return
+    schedule_cache.invalidate(
+        make_tenant_key(instance.id, sender is TrialAccount)
+    )
+
+
+@post_delete(User)
+@post_delete(TrialAccount)
+async def _company_deleted(sender, instance, *args) -> None:
+    schedule_cache.invalidate(
+        make_tenant_key(instance.id, sender is TrialAccount)
+    )
+
+
+@post_save(Resource)
+@post_delete(Resource)
+async def _resource_changed(sender, instance, *args) -> None:
+    schedule_cache.invalidate(instance.tenant_key)
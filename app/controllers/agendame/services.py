@@ -9,11 +9,15 @@ from fastapi import HTTPException, status
 from tortoise.expressions import Q
 
 from app.controllers import company
+from app.controllers.agendame.availability_cache import availability_cache
+from app.controllers.company.company_context import CompanyContext
 from app.controllers.company.company_data import MyCompany
+from app.controllers.company.identifier_index import company_index
 from app.models.trial import TrialAccount
 from app.models.user import (Appointment, BusinessSettings, Client, Service,
                              User)
 from app.schemas.agendame.upgrade_service import UpdateServices
+from app.utils.tenant_key import make_tenant_key
 
 
 class Services:
@@ -24,17 +28,25 @@ class Services:
         target_company_id: Optional[int] = None,
         target_company_name: Optional[str] = None,
         target_company_business_slug: Optional[str] = None,
+        target_company_is_trial: Optional[bool] = None,
+        context: Optional[CompanyContext] = None,
     ) -> None:
         self.target_company_id = target_company_id
         self.target_company_name = target_company_name
         self.target_company_business_slug = target_company_business_slug
+        self.target_company_is_trial = target_company_is_trial
+        # Empresa já resolvida pela dependência (current_company/public_company)
+        self.context = context
 
     async def _get_company(self) -> MyCompany:
-        """Carrega a empresa alvo pelo ID ou nome."""
+        """Carrega a empresa alvo pelo contexto, ID ou nome."""
+        if self.context is not None:
+            return self.context.company
         try:
             if self.target_company_id:
                 return await MyCompany.create(
-                    company_id=self.target_company_id
+                    company_id=self.target_company_id,
+                    is_trial=self.target_company_is_trial,
                 )
             elif self.target_company_name:
                 return await self._get_company_by_name()
@@ -99,7 +111,7 @@ class Services:
 
         # 4. Se encontrou algum usuário, cria MyCompany
         if user:
-            return await MyCompany.create(company_id=user.id)
+            return MyCompany(target_company=user)
 
         # 5. Se não encontrou em nenhuma tabela, retorna None ou levanta exceção
         return None
@@ -107,17 +119,11 @@ class Services:
 
     async def _get_company_by_slug(self) -> MyCompany:
         """Busca empresa especificamente pelo business_slug."""
-        user = await User.filter(
-            business_slug=self.target_company_business_slug
-        ).first()
-
-        if not user:
-            user = await TrialAccount.filter(
-                business_slug=self.target_company_business_slug
-            ).first()
-
-        if user:
-            return await MyCompany.create(company_id=user.id)
+        ref = await company_index.resolve(
+            self.target_company_business_slug, 'slug'
+        )
+        if ref:
+            return MyCompany(target_company=ref)
         else:
             return None
 
@@ -126,34 +132,12 @@ class Services:
     ) -> MyCompany:
         """
         Método flexível para buscar empresa por diferentes identificadores.
+        Resolvido pelo company_index (sem banco quando já está em memória).
         """
-        user = None
+        ref = await company_index.resolve(identifier, search_type)
 
-        # Define os campos a buscar baseado no search_type
-        if search_type == 'slug':
-            fields = ['business_slug']
-        elif search_type == 'username':
-            fields = ['username']
-        elif search_type == 'name':
-            fields = ['business_name']
-        else:  # 'auto'
-            fields = ['business_slug', 'username', 'business_name']
-
-        # Busca na tabela User
-        for field in fields:
-            user = await User.filter(**{field: identifier}).first()
-            if user:
-                break
-
-        # Se não encontrou em User, busca na TrialAccount
-        if not user:
-            for field in fields:
-                user = await TrialAccount.filter(**{field: identifier}).first()
-                if user:
-                    break
-
-        if user:
-            return await MyCompany.create(company_id=user.id)
+        if ref:
+            return MyCompany(target_company=ref)
 
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -164,67 +148,15 @@ class Services:
         self, identifier: str, search_type: str = 'auto'
     ) -> Dict[str, Any]:
         """Retorna informações básicas da empresa para a resposta da API."""
-        user = None
-
-        # Definir a ordem de busca baseada no search_type
-        if search_type == 'slug':
-            # Busca apenas por slug
-            user = await User.filter(business_slug=identifier).first()
-            if not user:
-                user = await TrialAccount.filter(
-                    business_slug=identifier
-                ).first()
-
-        elif search_type == 'username':
-            # Busca apenas por username
-            user = await User.filter(username=identifier).first()
-            if not user:
-                user = await TrialAccount.filter(username=identifier).first()
-
-        elif search_type == 'name':
-            # Busca apenas por business_name
-            user = await User.filter(business_name=identifier).first()
-            if not user:
-                user = await TrialAccount.filter(
-                    business_name=identifier
-                ).first()
-
-        else:  # 'auto' - busca em todos os campos e tabelas
-            # Primeiro busca na tabela User
-            user = await User.filter(business_slug=identifier).first()
-            if not user:
-                user = await User.filter(username=identifier).first()
-            if not user:
-                user = await User.filter(business_name=identifier).first()
-
-            # Se não encontrou em User, busca na TrialAccount
-            if not user:
-                user = await TrialAccount.filter(
-                    business_slug=identifier
-                ).first()
-            if not user:
-                user = await TrialAccount.filter(username=identifier).first()
-            if not user:
-                user = await TrialAccount.filter(
-                    business_name=identifier
-                ).first()
+        ref = await company_index.resolve(identifier, search_type)
 
-        if not user:
+        if not ref:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Empresa não encontrada',
             )
 
-        return {
-            'id': user.id,
-            'username': user.username,
-            'business_name': user.business_name,
-            'business_slug': user.business_slug,
-            'business_type': user.business_type,
-            'email': user.email,
-            'phone': user.phone,
-            'whatsapp': user.whatsapp,
-        }
+        return ref.public_info()
 
     async def get_services_by_identifier(
         self,
@@ -242,13 +174,32 @@ class Services:
         company = await self._get_company_by_identifier(
             decoded_identifier, search_type
         )
-
-        # Filtro que considera tanto user_id quanto trial_account_id
-        query = Service.filter(
-            Q(user_id=company.company_id())
-            | Q(trial_account_id=company.company_id())
+        return await self.get_public_services(
+            query_by=query_by,
+            query_value=query_value,
+            is_active=is_active,
+            order_by=order_by,
+            company=company,
         )
 
+    async def get_public_services(
+        self,
+        query_by: Optional[str] = None,
+        query_value: Optional[Union[str, int, bool]] = None,
+        is_active: Optional[bool] = True,
+        order_by: Optional[List[str]] = None,
+        company: Optional[MyCompany] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Serviços da empresa para o chat público (filtro restrito a
+        campos permitidos).
+        """
+        if company is None:
+            company = await self._get_company()
+
+        # Chave única do tenant (índice tenant_key, is_active, order)
+        query = Service.filter(tenant_key=company.tenant_key())
+
         if is_active is not None:
             query = query.filter(is_active=is_active)
 
@@ -303,11 +254,8 @@ class Services:
     ) -> List[Service]:
         """Consulta flexível de serviços."""
         company = await self._get_company()
-        # Filtro que considera tanto user_id quanto trial_account_id
-        query = Service.filter(
-            Q(user_id=company.company_id())
-            | Q(trial_account_id=company.company_id())
-        )
+        # Chave única do tenant (índice tenant_key, is_active, order)
+        query = Service.filter(tenant_key=company.tenant_key())
 
         if is_active is not None:
             query = query.filter(is_active=is_active)
@@ -366,8 +314,7 @@ class Services:
         """Remove definitivamente um serviço da empresa."""
         company = await self._get_company()
         deleted_count = await Service.filter(
-            Q(user_id=company.company_id())
-            | Q(trial_account_id=company.company_id()),
+            tenant_key=company.tenant_key(),
             id=target_service_id,
         ).delete()
 
@@ -377,6 +324,9 @@ class Services:
                 detail='Serviço não encontrado',
             )
 
+        availability_cache.invalidate_service(
+            company.tenant_key(), target_service_id
+        )
         return {'status': 200}
 
     async def upgrade_service(
@@ -419,8 +369,7 @@ class Services:
 
         # Atualizar o serviço
         updated_rows = await Service.filter(
-            Q(user_id=company.company_id())
-            | Q(trial_account_id=company.company_id()),
+            tenant_key=company.tenant_key(),
             id=target_service_id,
         ).update(**clean_data)
 
@@ -430,6 +379,10 @@ class Services:
                 detail='Serviço não encontrado ou não pertence à empresa',
             )
 
+        # Duração, nome, preço ou is_active podem ter mudado
+        availability_cache.invalidate_service(
+            company.tenant_key(), target_service_id
+        )
         return {'status': 'success', 'updated_fields': list(clean_data.keys())}
 
     async def create_service_for_current_user(
@@ -457,16 +410,10 @@ class Services:
                 )
 
             # Verificar se já existe serviço com mesmo nome
-            if user_is_trial:
-                existing_service = await Service.filter(
-                    trial_account=company,  # Usar a relação, não o ID
-                    name=service_data['name'],
-                ).first()
-            else:
-                existing_service = await Service.filter(
-                    user=company,  # Usar a relação, não o ID
-                    name=service_data['name'],
-                ).first()
+            existing_service = await Service.filter(
+                tenant_key=make_tenant_key(current_user_id, user_is_trial),
+                name=service_data['name'],
+            ).first()
 
             if existing_service:
                 raise HTTPException(
@@ -543,12 +490,10 @@ class Services:
         """Busca todos os clientes da empresa."""
         try:
             company = await self._get_company()
-            company_id = company.company_id()
+            tenant_key = company.tenant_key()
 
-            # Construir query base considerando tanto user quanto trial_account
-            query = Client.filter(
-                Q(user_id=company_id) | Q(trial_account_id=company_id)
-            )
+            # Construir query base pela chave do tenant
+            query = Client.filter(tenant_key=tenant_key)
 
             # Aplicar filtro de busca se fornecido
             if search_query:
@@ -566,14 +511,14 @@ class Services:
             for client in clients:
                 # Contar agendamentos deste cliente
                 total_appointments = await Appointment.filter(
-                    Q(user_id=company_id) | Q(trial_account_id=company_id),
+                    tenant_key=tenant_key,
                     client=client,
                 ).count()
 
                 # Buscar último serviço agendado
                 last_appointment = (
                     await Appointment.filter(
-                        Q(user_id=company_id) | Q(trial_account_id=company_id),
+                        tenant_key=tenant_key,
                         client=client,
                     )
                     .select_related('service')
@@ -620,25 +565,25 @@ class Services:
         """Retorna estatísticas para o dashboard."""
         try:
             company = await self._get_company()
-            company_id = company.company_id()
+            tenant_key = company.tenant_key()
 
             today = date.today()
 
-            # Estatísticas básicas - considerar tanto user quanto trial_account
+            # Estatísticas básicas pela chave do tenant
             total_services = await Service.filter(
-                Q(user_id=company_id) | Q(trial_account_id=company_id),
+                tenant_key=tenant_key,
                 is_active=True,
             ).count()
 
             total_clients = await Client.filter(
-                Q(user_id=company_id) | Q(trial_account_id=company_id),
+                tenant_key=tenant_key,
                 is_active=True,
             ).count()
 
             # Agendamentos de hoje
             today_appointments = (
                 await Appointment.filter(
-                    Q(user_id=company_id) | Q(trial_account_id=company_id),
+                    tenant_key=tenant_key,
                     appointment_date=today,
                     status__in=['scheduled', 'confirmed'],
                 )
@@ -653,7 +598,7 @@ class Services:
             # Próximos agendamentos
             upcoming_appointments = (
                 await Appointment.filter(
-                    Q(user_id=company_id) | Q(trial_account_id=company_id),
+                    tenant_key=tenant_key,
                     appointment_date__gte=today,
                     status__in=['scheduled', 'confirmed'],
                 )
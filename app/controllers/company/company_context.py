@@ -0,0 +1,92 @@
+# app/controllers/company/company_context.py
+"""
+Empresa (tenant) da requisição, resolvida uma única vez.
+
+Rotas autenticadas usam `current_company`: o principal do JWT já diz o
+id e o tipo da conta, então a linha é carregada com uma consulta na
+tabela certa. Rotas públicas usam `public_company` (ou
+`resolve_company_context` quando o tipo de busca vem no corpo), que
+resolvem o identificador pelo company_index.
+
+O CompanyContext é repassado para Services/Appointments, que não voltam
+a procurar a empresa.
+"""
+
+import urllib.parse
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
+
+from app.controllers.company.company_data import MyCompany
+from app.controllers.company.identifier_index import company_index
+from app.models.trial import TrialAccount
+from app.models.user import User
+from app.service.jwt.depends import SystemUser, get_current_user
+from app.utils.tenant_key import make_tenant_key
+
+
+class CompanyContext:
+    """Empresa carregada (MyCompany) + tipo da conta"""
+
+    __slots__ = ('company', 'is_trial')
+
+    def __init__(self, company: MyCompany, is_trial: bool) -> None:
+        self.company = company
+        self.is_trial = is_trial
+
+    @property
+    def company_id(self) -> int:
+        return self.company.company_id()
+
+    @property
+    def tenant_key(self) -> int:
+        return make_tenant_key(self.company_id, self.is_trial)
+
+
+def _not_found(detail: str = 'Empresa não encontrada') -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+
+async def load_company_context(
+    company_id: int, is_trial: bool
+) -> CompanyContext:
+    """Carrega a empresa pelo id na tabela do tipo informado"""
+    model = TrialAccount if is_trial else User
+    row = await model.get_or_none(id=company_id)
+    if row is None:
+        raise _not_found()
+    return CompanyContext(MyCompany(target_company=row), is_trial)
+
+
+async def resolve_company_context(
+    identifier: str, search_type: str = 'auto'
+) -> CompanyContext:
+    """Resolve slug/username/nome pelo company_index"""
+    ref = await company_index.resolve(identifier, search_type)
+    if ref is None:
+        raise _not_found(f'Empresa não encontrada: {identifier}')
+    return CompanyContext(MyCompany(target_company=ref), ref.is_trial)
+
+
+async def current_company(
+    current_user: Optional[SystemUser] = Depends(get_current_user),
+) -> CompanyContext:
+    """Dependência: empresa do usuário logado"""
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Não autenticado',
+        )
+    return await load_company_context(current_user.id, current_user.is_trial)
+
+
+async def public_company(
+    company_identifier: str,
+    search_by: str = Query(
+        'auto', description='Tipo de busca: auto, slug, username, name'
+    ),
+) -> CompanyContext:
+    """Dependência: empresa do identificador público da URL"""
+    return await resolve_company_context(
+        urllib.parse.unquote(company_identifier), search_by
+    )
@@ -1,9 +1,12 @@
 import os
+from typing import Optional
 
 from dotenv import load_dotenv
 
+from app.models.trial import TrialAccount
 from app.models.user import User
 from app.utils.i_requests import company_exist
+from app.utils.tenant_key import make_tenant_key
 
 load_dotenv()
 
@@ -19,11 +22,19 @@ class MyCompany:
         self.target_company = target_company
 
     @classmethod
-    async def create(cls, company_id: int) -> 'MyCompany':
+    async def create(
+        cls, company_id: int, is_trial: Optional[bool] = None
+    ) -> 'MyCompany':
         """
         Factory assíncrona para criar a instância corretamente.
+        Com `is_trial` informado busca direto na tabela certa (os ids de
+        User e TrialAccount se sobrepõem); sem ele, User tem prioridade.
         """
-        company = await company_exist(companyID=company_id)
+        if is_trial is None:
+            company = await company_exist(companyID=company_id)
+        else:
+            model = TrialAccount if is_trial else User
+            company = await model.get_or_none(id=company_id)
 
         if not company:
             raise ValueError('Empresa não encontrada')
@@ -43,6 +54,9 @@ class MyCompany:
     def company_id(self) -> int:
         return self.target_company.id
 
+    def company_username(self) -> str:
+        return self.target_company.username
+
     def company_name(self) -> str:
         return self.target_company.business_name
 
@@ -62,5 +76,16 @@ class MyCompany:
         CURRENT_DOMINIO = os.getenv('CURRENT_DOMINIO')
         return f'{CURRENT_DOMINIO + self.company_slug()}'
 
+    def is_trial(self) -> bool:
+        # CompanyRef (company_index) já traz o tipo da conta
+        is_trial = getattr(self.target_company, 'is_trial', None)
+        if isinstance(is_trial, bool):
+            return is_trial
+        return isinstance(self.target_company, TrialAccount)
+
+    def tenant_key(self) -> int:
+        """Chave do tenant usada nos filtros de clients/services/appointments"""
+        return make_tenant_key(self.company_id(), self.is_trial())
+
     def is_active(self) -> bool:
         return bool(getattr(self.target_company, 'subscription_active', True))
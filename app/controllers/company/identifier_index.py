@@ -0,0 +1,240 @@
+# app/controllers/company/identifier_index.py
+"""
+Índice em memória de identificadores públicos de empresa.
+
+Mapeia (tipo de busca, identificador) → CompanyRef, que guarda o id da
+empresa, se é trial e os dados públicos usados pelas rotas do chat
+(/services/<identificador>). Identificadores fora do filtro de Bloom
+(slug_filter.known_slugs) são rejeitados sem consulta; os demais
+resultados negativos são guardados, com TTL menor, para que slugs
+inexistentes não voltem ao banco a cada requisição.
+
+Deve ser invalidado no cadastro (signup/register), em alterações de
+perfil da empresa e na expiração de trials.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from tortoise import Tortoise
+
+from app.controllers.company.slug_filter import known_slugs
+from app.utils.normalize_company_datas import normalize_company_slug
+
+load_dotenv()
+
+COMPANY_INDEX_SIZE = int(os.getenv('COMPANY_INDEX_SIZE', '4096'))
+COMPANY_INDEX_TTL = int(os.getenv('COMPANY_INDEX_TTL', '600'))
+COMPANY_INDEX_NEGATIVE_TTL = int(os.getenv('COMPANY_INDEX_NEGATIVE_TTL', '30'))
+
+# Ordem de busca de cada search_type (igual à das consultas antigas).
+# O slug é comparado pela coluna normalizada (slug_search), os demais
+# campos pelo valor exato; todos são colunas indexadas.
+SEARCH_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'slug': ('slug_search',),
+    'username': ('username',),
+    'name': ('business_name',),
+    'auto': ('slug_search', 'username', 'business_name'),
+}
+
+_COMPANY_COLUMNS = (
+    'id, username, business_name, business_slug, business_type, '
+    'email, phone, whatsapp, subscription_active'
+)
+
+
+class CompanyRef:
+    """
+    Empresa resolvida pelo índice (User ou TrialAccount).
+    Tem os mesmos atributos usados por MyCompany, então pode ser
+    passada como `target_company` sem carregar o model.
+    """
+
+    __slots__ = (
+        'id',
+        'is_trial',
+        'username',
+        'business_name',
+        'business_slug',
+        'business_type',
+        'email',
+        'phone',
+        'whatsapp',
+        'subscription_active',
+    )
+
+    def __init__(self, row: dict) -> None:
+        for name in self.__slots__:
+            setattr(self, name, row.get(name))
+        self.is_trial = row.get('kind') == 'trial'
+        # SQLite devolve 0/1
+        self.subscription_active = bool(self.subscription_active)
+
+    def public_info(self) -> Dict[str, object]:
+        """Dados retornados por Services.get_company_info"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'business_name': self.business_name,
+            'business_slug': self.business_slug,
+            'business_type': self.business_type,
+            'email': self.email,
+            'phone': self.phone,
+            'whatsapp': self.whatsapp,
+        }
+
+
+def _lookup_query(
+    fields: Tuple[str, ...], identifier: str, sqlite: bool
+) -> Tuple[str, List[str]]:
+    """
+    Uma única consulta para todos os campos e as duas tabelas.
+    Rank: User (campos na ordem) antes de TrialAccount (campos na ordem).
+    Retorna (sql, parâmetros).
+    """
+    raw = identifier
+    normalized = normalize_company_slug(identifier)
+
+    parts = []
+    values: List[str] = []
+    for table_rank, (kind, table) in enumerate(
+        (('user', 'users'), ('trial', 'trial'))
+    ):
+        for field_rank, field in enumerate(fields):
+            value = normalized if field == 'slug_search' else raw
+            if sqlite:
+                param = '?'
+                values.append(value)
+            else:
+                # $1 = valor original, $2 = slug normalizado
+                param = '$2' if field == 'slug_search' else '$1'
+            rank = table_rank * len(fields) + field_rank
+            parts.append(
+                f"SELECT '{kind}' AS kind, {rank} AS rank, {_COMPANY_COLUMNS} "
+                f'FROM {table} WHERE {field} = {param}'
+            )
+
+    if not sqlite:
+        values = [raw, normalized]
+
+    sql = (
+        'SELECT * FROM ('
+        + ' UNION ALL '.join(parts)
+        + ') AS companies ORDER BY rank LIMIT 1'
+    )
+    return sql, values
+
+
+class CompanyIdentifierIndex:
+    """Cache (LRU + TTL) identificador → CompanyRef, com cache negativo"""
+
+    def __init__(self, maxsize: int, ttl: int, negative_ttl: int) -> None:
+        self._found: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._missing: TTLCache = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    async def resolve(
+        self, identifier: str, search_type: str = 'auto'
+    ) -> Optional[CompanyRef]:
+        """Empresa do identificador ou None se não existir"""
+        if search_type not in SEARCH_FIELDS:
+            search_type = 'auto'
+        fields = SEARCH_FIELDS[search_type]
+        if search_type == 'slug':
+            # /Corte-Supremo e /corte-supremo ocupam a mesma entrada
+            identifier = normalize_company_slug(identifier)
+        key = (search_type, identifier)
+
+        ref = self._found.get(key)
+        if ref is not None:
+            self.hits += 1
+            return ref
+
+        if key in self._missing:
+            self.negative_hits += 1
+            return None
+
+        # Fora do filtro de Bloom: certamente não existe (sem banco)
+        if not known_slugs.might_exist(identifier):
+            self.negative_hits += 1
+            return None
+
+        self.misses += 1
+        ref = await self._load(identifier, fields)
+        if ref is None:
+            self._missing[key] = True
+        else:
+            self._found[key] = ref
+        return ref
+
+    @staticmethod
+    async def _load(
+        identifier: str, fields: Tuple[str, ...]
+    ) -> Optional[CompanyRef]:
+        db = Tortoise.get_connection('default')
+        sqlite = db.capabilities.dialect == 'sqlite'
+        sql, values = _lookup_query(fields, identifier, sqlite)
+
+        rows = await db.execute_query_dict(sql, values)
+        if not rows:
+            return None
+        return CompanyRef(rows[0])
+
+    def invalidate_company(self, company_id: int, is_trial: bool) -> None:
+        """Remove todas as entradas da empresa (perfil alterado/expirado)"""
+        self.invalidate_companies((company_id,), is_trial)
+
+    def invalidate_companies(
+        self, company_ids: Iterable[int], is_trial: bool
+    ) -> None:
+        """Versão em lote (uma passada pelo cache)"""
+        ids = set(company_ids)
+        for key, ref in list(self._found.items()):
+            if ref.id in ids and ref.is_trial == is_trial:
+                self._found.pop(key, None)
+
+    def invalidate_identifiers(self, identifiers: Iterable[Optional[str]]) -> None:
+        """
+        Nova empresa cadastrada: esquece entradas com os mesmos
+        identificadores (a prioridade User → Trial pode mudar) e todos
+        os negativos.
+        """
+        names = {i for i in identifiers if i}
+        names |= {normalize_company_slug(i) for i in names}
+        for key in list(self._found.keys()):
+            if key[1] in names:
+                self._found.pop(key, None)
+        self._missing.clear()
+
+    def clear(self) -> None:
+        self._found.clear()
+        self._missing.clear()
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._found),
+            'negative_size': len(self._missing),
+            'maxsize': self._found.maxsize,
+            'ttl': self._found.ttl,
+            'negative_ttl': self._missing.ttl,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': round(
+                (self.hits + self.negative_hits) / total, 4
+            )
+            if total
+            else 0.0,
+        }
+
+
+company_index = CompanyIdentifierIndex(
+    maxsize=COMPANY_INDEX_SIZE,
+    ttl=COMPANY_INDEX_TTL,
+    negative_ttl=COMPANY_INDEX_NEGATIVE_TTL,
+)
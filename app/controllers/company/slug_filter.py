@@ -0,0 +1,153 @@
+# app/controllers/company/slug_filter.py
+"""
+Filtro de Bloom dos identificadores públicos de empresa.
+
+As rotas /{company_slug} e /agendame/{company_slug} aceitam qualquer
+segmento, então robôs (/wp-login.php, /.env) chegavam até o template e
+depois até o banco. O filtro guarda a forma normalizada
+(normalize_company_slug) de slug, username e nome de todas as empresas:
+se o identificador não está no filtro, a empresa certamente não existe
+e a resposta é 404 sem consulta. Falsos positivos (~SLUG_BLOOM_ERROR_RATE)
+seguem para o company_index, que guarda o "não encontrado" no cache
+negativo.
+
+Reconstruído no startup (lifespan) e atualizado no cadastro. O filtro
+fica em memória do processo (o servidor roda com um worker).
+"""
+
+import math
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+import mmh3
+from dotenv import load_dotenv
+from tortoise import Tortoise
+
+from app.utils.normalize_company_datas import normalize_company_slug
+
+load_dotenv()
+
+SLUG_BLOOM_CAPACITY = int(os.getenv('SLUG_BLOOM_CAPACITY', '10000'))
+SLUG_BLOOM_ERROR_RATE = float(os.getenv('SLUG_BLOOM_ERROR_RATE', '0.01'))
+
+
+class BloomFilter:
+    """Filtro de Bloom em bytearray com hashes derivados do MurmurHash3"""
+
+    __slots__ = ('size', 'hashes', 'count', '_bits')
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(1, capacity)
+        # m = -n·ln(p) / ln(2)²  e  k = m/n · ln(2)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: h1 + i·h2 com as duas metades do hash de 128 bits
+        h1, h2 = mmh3.hash64(item.encode('utf-8'), signed=False)
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+
+class KnownCompanySlugs:
+    """Identificadores públicos conhecidos (User e TrialAccount)"""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter: Optional[BloomFilter] = None
+        self.rebuilt_at: Optional[datetime] = None
+        self.rejected = 0
+        self.passed = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    async def rebuild(self) -> int:
+        """Carrega todos os identificadores do banco. Retorna o total"""
+        db = Tortoise.get_connection('default')
+        keys = set()
+        for table in ('users', 'trial'):
+            rows = await db.execute_query_dict(
+                f'SELECT slug_search, username, business_name FROM "{table}"'
+            )
+            for row in rows:
+                keys.update(self._keys(row.values()))
+
+        # Folga para os cadastros até o próximo restart
+        bloom = BloomFilter(
+            max(self.capacity, 2 * len(keys)), self.error_rate
+        )
+        for key in keys:
+            bloom.add(key)
+
+        self._filter = bloom
+        self.rebuilt_at = datetime.now(timezone.utc)
+        return len(keys)
+
+    @staticmethod
+    def _keys(identifiers: Iterable[Optional[str]]) -> Iterator[str]:
+        for identifier in identifiers:
+            if identifier:
+                key = normalize_company_slug(identifier)
+                if key:
+                    yield key
+
+    def add(self, identifiers: Iterable[Optional[str]]) -> None:
+        """Nova empresa (cadastro): inclui slug, username e nome"""
+        if self._filter is None:
+            return
+        for key in self._keys(identifiers):
+            self._filter.add(key)
+
+    def might_exist(self, identifier: str) -> bool:
+        """
+        False: a empresa certamente não existe.
+        True: pode existir (confirme pelo company_index).
+        Antes do primeiro rebuild tudo pode existir.
+        """
+        if self._filter is None:
+            return True
+        key = normalize_company_slug(identifier)
+        if key and key in self._filter:
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def stats(self) -> dict:
+        bloom = self._filter
+        return {
+            'ready': bloom is not None,
+            'items': bloom.count if bloom else 0,
+            'bits': bloom.size if bloom else 0,
+            'hashes': bloom.hashes if bloom else 0,
+            'error_rate': self.error_rate,
+            'rejected': self.rejected,
+            'passed': self.passed,
+            'rebuilt_at': self.rebuilt_at.isoformat()
+            if self.rebuilt_at
+            else None,
+        }
+
+
+known_slugs = KnownCompanySlugs(
+    capacity=SLUG_BLOOM_CAPACITY, error_rate=SLUG_BLOOM_ERROR_RATE
+)
@@ -0,0 +1,237 @@
+# app/core/admission.py
+"""
+Controle de admissão das rotas de autenticação que gastam bcrypt
+(/auth/login, /auth/register e /auth/signup/free-trial).
+
+- Limita quantas requisições calculam hash ao mesmo tempo;
+- Mantém uma fila de espera curta e limitada;
+- Acima disso responde 429 com Retry-After, sem tocar no bcrypt;
+- Token buckets em memória por IP e por identificador (email/username).
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+load_dotenv()
+
+AUTH_MAX_CONCURRENT = int(
+    os.getenv('AUTH_MAX_CONCURRENT', os.getenv('BCRYPT_POOL_SIZE', '2'))
+)
+AUTH_MAX_WAITING = int(os.getenv('AUTH_MAX_WAITING', '16'))
+AUTH_WAIT_TIMEOUT = float(os.getenv('AUTH_WAIT_TIMEOUT', '2'))
+
+# Tentativas por minuto e rajada máxima
+AUTH_IP_RATE = float(os.getenv('AUTH_IP_RATE', '30'))
+AUTH_IP_BURST = int(os.getenv('AUTH_IP_BURST', '10'))
+AUTH_IDENTIFIER_RATE = float(os.getenv('AUTH_IDENTIFIER_RATE', '6'))
+AUTH_IDENTIFIER_BURST = int(os.getenv('AUTH_IDENTIFIER_BURST', '5'))
+AUTH_BUCKETS_SIZE = int(os.getenv('AUTH_BUCKETS_SIZE', '65536'))
+
+
+class TokenBucket:
+    """Balde de fichas: `rate` fichas por segundo, até `burst`"""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: int, now: float) -> None:
+        self.tokens = float(burst)
+        self.updated = now
+
+
+class RateLimiter:
+    """Token buckets por chave (IP ou identificador), em memória"""
+
+    def __init__(self, per_minute: float, burst: int, maxsize: int) -> None:
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        # Um balde parado enche em burst/rate segundos; depois disso
+        # ele equivale a um balde novo e pode sair do cache.
+        ttl = burst / self.rate if self.rate > 0 else 3600
+        self._buckets: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.rejected = 0
+
+    def take(self, key: str) -> Tuple[bool, float]:
+        """Consome uma ficha. Retorna (permitido, segundos até a próxima)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(
+                self.burst, bucket.tokens + (now - bucket.updated) * self.rate
+            )
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self._buckets[key] = bucket
+            return True, 0.0
+
+        self._buckets[key] = bucket
+        self.rejected += 1
+        if self.rate <= 0:
+            return False, 60.0
+        return False, (1 - bucket.tokens) / self.rate
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class AdmissionController:
+    """
+    Porta de entrada das rotas com bcrypt.
+
+    `max_concurrent` requisições são atendidas ao mesmo tempo e até
+    `max_waiting` aguardam por no máximo `wait_timeout` segundos.
+    O restante recebe 429 imediatamente.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_waiting: int,
+        wait_timeout: float,
+        ip_limiter: RateLimiter,
+        identifier_limiter: RateLimiter,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.ip_limiter = ip_limiter
+        self.identifier_limiter = identifier_limiter
+
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self.active = 0
+        self.admitted = 0
+        self.rejected_busy = 0
+
+    @staticmethod
+    def _reject(detail: str, retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={'Retry-After': str(max(1, math.ceil(retry_after)))},
+        )
+
+    def check_rate(self, ip: Optional[str], identifier: Optional[str]) -> None:
+        """Aplica os token buckets (IP e identificador)"""
+        if ip:
+            allowed, retry_after = self.ip_limiter.take(ip)
+            if not allowed:
+                raise self._reject(
+                    'Muitas tentativas. Aguarde e tente novamente.',
+                    retry_after,
+                )
+
+        if identifier:
+            allowed, retry_after = self.identifier_limiter.take(
+                identifier.strip().lower()
+            )
+            if not allowed:
+                raise self._reject(
+                    'Muitas tentativas para esta conta. Aguarde e tente novamente.',
+                    retry_after,
+                )
+
+    async def acquire(self) -> None:
+        """Ocupa uma vaga ou levanta 429 (fila cheia/tempo esgotado)"""
+        if self._slots.locked():
+            if self._waiting >= self.max_waiting:
+                self.rejected_busy += 1
+                raise self._reject(
+                    'Servidor ocupado. Tente novamente em instantes.',
+                    self.wait_timeout,
+                )
+
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._slots.acquire(), timeout=self.wait_timeout
+                )
+            except asyncio.TimeoutError:
+                self.rejected_busy += 1
+                raise self._reject(
+                    'Servidor ocupado. Tente novamente em instantes.',
+                    self.wait_timeout,
+                )
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'waiting': self._waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'admitted': self.admitted,
+            'rejected_busy': self.rejected_busy,
+            'rejected_ip': self.ip_limiter.rejected,
+            'rejected_identifier': self.identifier_limiter.rejected,
+        }
+
+
+auth_admission = AdmissionController(
+    max_concurrent=AUTH_MAX_CONCURRENT,
+    max_waiting=AUTH_MAX_WAITING,
+    wait_timeout=AUTH_WAIT_TIMEOUT,
+    ip_limiter=RateLimiter(AUTH_IP_RATE, AUTH_IP_BURST, AUTH_BUCKETS_SIZE),
+    identifier_limiter=RateLimiter(
+        AUTH_IDENTIFIER_RATE, AUTH_IDENTIFIER_BURST, AUTH_BUCKETS_SIZE
+    ),
+)
+
+
+async def _request_identifier(request: Request) -> Optional[str]:
+    """Email/username enviado no corpo (form do login ou JSON do cadastro)"""
+    content_type = request.headers.get('content-type', '')
+    try:
+        if content_type.startswith('application/json'):
+            body = await request.json()
+            if isinstance(body, dict):
+                return body.get('email') or body.get('username')
+            return None
+
+        # O FastAPI já leu o form; aqui ele vem do cache da Request
+        form = await request.form()
+        return form.get('username') or form.get('email')
+    except Exception:
+        return None
+
+
+async def admit_auth_request(request: Request):
+    """
+    Dependência das rotas de login/cadastro.
+
+    Rejeita por taxa antes de qualquer trabalho e segura uma vaga
+    enquanto a rota calcula/verifica o hash. O IP vem de request.client,
+    já corrigido pelo ProxyHeadersMiddleware (FORWARDED_ALLOW_IPS).
+    """
+    client = request.client
+    ip = client.host if client else None
+    identifier = await _request_identifier(request)
+
+    auth_admission.check_rate(ip, identifier)
+
+    await auth_admission.acquire()
+    try:
+        yield
+    finally:
+        auth_admission.release()
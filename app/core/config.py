@@ -39,20 +39,20 @@ from typing import List
 from urllib.parse import quote
 
 from fastapi import Request, status
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.route_classifier import RouteClassifier
 
 
 # ======================================================
 # MIDDLEWARE DE AUTENTICAÇÃO
 # ======================================================
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Middleware para verificação de autenticação"""
+class AuthMiddleware:
+    """Middleware ASGI puro para verificação de autenticação"""
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
         # Verifica se está em produção
         self.is_production = (
@@ -85,6 +85,8 @@ class AuthMiddleware(BaseHTTPMiddleware):
             '/auth/register',  # API de registro
             '/auth/signup/free-trial',  # API de trial
             '/auth/debug',  # API de debug
+            '/auth/refresh',  # Renovação de sessão (refresh token)
+            '/auth/logout',  # Logout revoga o refresh token mesmo sem sessão
         }
 
         # Prefixos de rotas públicas
@@ -95,8 +97,38 @@ class AuthMiddleware(BaseHTTPMiddleware):
             '/openapi',
             '/favicon',
             '/health',  # Para monitoramento
+            '/services/',  # APIs de agendamento para clientes
+            '/agendame/appointments/public/',  # Agendamento público
+        ]
+
+        # Exigem login mesmo casando com uma regra pública acima
+        self.private_routes = {
+            '/health/caches',  # Contadores internos (admissão, caches)
+        }
+
+        # Seções privadas do painel em /agendame/<seção>
+        self.private_sections = [
+            'dashboard',
+            'services',
+            'appointments',
+            'clients',
+            'company',
+            'settings',
+            'profile',
+            'resources',
         ]
 
+        # Classificador compilado uma única vez na inicialização
+        self.route_classifier = RouteClassifier(
+            public_routes=self.public_routes,
+            public_api_routes=self.public_api_routes,
+            public_prefixes=self.public_prefixes,
+            private_sections=self.private_sections,
+            # API de login: só é pública para POST
+            method_restricted={'/auth/login': frozenset({'POST'})},
+            private_routes=self.private_routes,
+        )
+
         # Hosts/domínios permitidos (para produção)
         self.allowed_hosts = self._get_allowed_hosts()
 
@@ -117,19 +149,28 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
         return default_hosts
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Lifespan e websockets passam direto
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        path = scope['path']
+        method = scope['method']
 
         # Verificação de host (em produção)
-        if self.is_production and request.headers.get('host'):
-            host = request.headers.get('host').split(':')[0]
-            if host not in self.allowed_hosts:
-                print(f'✗ Host não permitido: {host}')
-                return JSONResponse(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    content={'detail': 'Host não permitido'},
-                )
+        if self.is_production:
+            host_header = self._get_header(scope, b'host')
+            if host_header:
+                host = host_header.split(':')[0]
+                if host not in self.allowed_hosts:
+                    print(f'✗ Host não permitido: {host}')
+                    response = JSONResponse(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        content={'detail': 'Host não permitido'},
+                    )
+                    await response(scope, receive, send)
+                    return
 
         # Log simplificado em produção
         if self.is_production:
@@ -141,11 +182,15 @@ class AuthMiddleware(BaseHTTPMiddleware):
         if self._is_public_route(path, method):
             if not self.is_production:
                 print(f'✓ Rota pública: {path}')
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         if not self.is_production:
             print(f'✗ Rota protegida: {path}')
 
+        # Request só é montado para rotas protegidas (cookies/headers)
+        request = Request(scope, receive)
+
         # Verifica autenticação
         auth_result = await self._check_authentication(request)
 
@@ -154,66 +199,33 @@ class AuthMiddleware(BaseHTTPMiddleware):
             if not self.is_production:
                 print('✓ Usuário autenticado: [200]')
             request.state.user = auth_result.get('user')
-            return await call_next(request)
-        else:
-            # Usuário não autenticado
-            error_msg = auth_result.get('error')
-            if not self.is_production:
-                print(f'✗ Não autenticado: {error_msg}')
-            return await self._handle_unauthenticated(request, error_msg)
+            await self.app(scope, receive, send)
+            return
 
-    def _is_public_route(self, path: str, method: str = 'GET') -> bool:
-        """Verifica se a rota é pública"""
+        # Usuário não autenticado
+        error_msg = auth_result.get('error')
+        if not self.is_production:
+            print(f'✗ Não autenticado: {error_msg}')
 
-        # 1. Verifica match exato em rotas públicas
-        if path in self.public_routes:
-            return True
+        response = await self._handle_unauthenticated(request, error_msg)
+        if response is None:
+            # Página de login/trial: deixa o handler renderizar
+            await self.app(scope, receive, send)
+            return
 
-        # 2. Verifica APIs públicas (para métodos específicos)
-        if path in self.public_api_routes:
-            # API de login: só é pública para POST
-            if path == '/auth/login':
-                return method == 'POST'
-            # API de debug: sempre pública
-            if path == '/auth/debug':
-                return True
-            # Demais APIs são públicas para todos os métodos
-            return True
-
-        # 3. Verifica prefixos públicos
-        for prefix in self.public_prefixes:
-            if path.startswith(prefix):
-                return True
-
-        # 4. Páginas de agendamento público
-        if path.startswith('/agendame/') and not path.startswith(
-            '/agendame/dashboard'
-        ):
-            # Verifica se é uma página de empresa ou agendamento público
-            parts = path.split('/')
-            if len(parts) >= 3:
-                # Exemplos públicos: /agendame/nome-empresa
-                # Exemplos privados: /agendame/dashboard, /agendame/services
-                private_sections = [
-                    'dashboard',
-                    'services',
-                    'appointments',
-                    'clients',
-                    'company',
-                    'settings',
-                    'profile',
-                ]
-                if parts[2] not in private_sections:
-                    return True
-
-        # 5. Rotas curtas de empresas (ex: /nome-empresa)
-        if len(path.split('/')) == 2 and path != '/':
-            # Exemplo: /corte-supremo
-            slug = path.strip('/')
-            if slug and '/' not in slug:
-                return True
-
-        return False
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _get_header(scope: Scope, name: bytes) -> str:
+        """Busca um header diretamente no scope ASGI"""
+        for key, value in scope['headers']:
+            if key == name:
+                return value.decode('latin-1')
+        return ''
+
+    def _is_public_route(self, path: str, method: str = 'GET') -> bool:
+        """Verifica se a rota é pública"""
+        return self.route_classifier.is_public(path, method)
 
     async def _check_authentication(self, request: Request) -> dict:
         """Verifica se o usuário está autenticado"""
@@ -233,51 +245,35 @@ class AuthMiddleware(BaseHTTPMiddleware):
             print(f'Token encontrado: {access_token[:20]}...')
 
         try:
-            from app.models.trial import TrialAccount
-            from app.models.user import User
-            from app.service.jwt.jwt_decode_token import DecodeToken
-
-            # Tenta decodificar o token
-            decoded_data = DecodeToken(access_token)
-
-            if not decoded_data:
-                return {'authenticated': False, 'error': 'Token inválido.'}
-
-            # OBTÉM O USUÁRIO REAL DO BANCO DE DADOS
-            user_id = decoded_data.user_id
+            from app.service.jwt.depends import resolve_principal
 
-            # Busca primeiro na tabela de usuários normais
-            user = await User.get_or_none(id=user_id)
-            is_trial = False
+            # Decodifica o token e carrega o usuário uma única vez;
+            # get_current_user reaproveita o resultado via request.state
+            principal = await resolve_principal(access_token)
 
-            # Se não encontrou, busca na tabela trial
-            if not user:
-                user = await TrialAccount.get_or_none(id=user_id)
-                is_trial = True
-
-            if not user:
+            if not principal:
                 return {
                     'authenticated': False,
                     'error': 'Usuário não encontrado.',
                 }
 
-            # Adiciona informações adicionais ao usuário
+            request.state.principal = principal
+
+            # Dados do usuário no formato de dicionário (request.state.user)
             user_data = {
-                'id': user.id,
-                'email': user.email,
-                'username': user.username,
-                'business_name': getattr(user, 'business_name', None),
-                'business_slug': getattr(user, 'business_slug', None),
-                'phone': getattr(user, 'phone', ''),
-                'is_trial': is_trial,
-                # Adiciona o objeto original para referência
-                '_user_obj': user,
+                'id': principal.id,
+                'email': principal.email,
+                'username': principal.username,
+                'business_name': principal.name,
+                'business_slug': principal.slug,
+                'phone': principal.phone,
+                'is_trial': principal.is_trial,
             }
 
             return {
                 'authenticated': True,
-                'user': user_data,  # Agora com dados reais do usuário
-                'decoded_token': decoded_data,
+                'user': user_data,
+                'principal': principal,
             }
 
         except Exception as e:
@@ -334,10 +330,8 @@ class AuthMiddleware(BaseHTTPMiddleware):
             if not self.is_production:
                 print('Já está em rota pública de login/trial')
 
-            # Chama o próximo handler (que renderizará a página)
-            return await self.app(
-                request.scope, request.receive, request._send
-            )
+            # O próximo handler renderizará a página
+            return None
 
         # Para rotas web, redireciona para login
         next_url = quote(path, safe='')
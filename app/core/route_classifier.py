@@ -0,0 +1,71 @@
+import re
+from typing import Dict, FrozenSet, Iterable, Optional
+
+
+class RouteClassifier:
+    """
+    Classificador de rotas públicas compilado na inicialização.
+
+    Junta rotas exatas, prefixos, a página pública de agendamento
+    (/agendame/<slug>) e as rotas curtas de empresa (/<slug>) em uma
+    única expressão regular, evitando percorrer listas a cada requisição.
+    """
+
+    def __init__(
+        self,
+        public_routes: Iterable[str],
+        public_api_routes: Iterable[str],
+        public_prefixes: Iterable[str],
+        private_sections: Iterable[str],
+        method_restricted: Optional[Dict[str, FrozenSet[str]]] = None,
+        private_routes: Iterable[str] = (),
+    ) -> None:
+        # Exceções exatas às regras públicas (ex: /health/caches dentro
+        # do prefixo /health)
+        self.private_routes = frozenset(private_routes)
+        # Rotas que só são públicas para alguns métodos (ex: POST /auth/login)
+        self.method_restricted = dict(method_restricted or {})
+
+        exact = {
+            path
+            for path in (*public_routes, *public_api_routes)
+            if path not in self.method_restricted
+        }
+        # Ordena do maior para o menor para a alternância ser determinística
+        exact_alt = '|'.join(
+            re.escape(path) for path in sorted(exact, key=len, reverse=True)
+        )
+        prefix_alt = '|'.join(
+            re.escape(prefix)
+            for prefix in sorted(public_prefixes, key=len, reverse=True)
+        )
+        private_alt = '|'.join(re.escape(s) for s in private_sections)
+
+        patterns = []
+        if exact_alt:
+            patterns.append(f'(?:{exact_alt})$')
+        if prefix_alt:
+            patterns.append(f'(?:{prefix_alt})')
+
+        # /agendame/<slug> é público, exceto as seções privadas do painel.
+        # Qualquer caminho iniciado por /agendame/dashboard é privado.
+        patterns.append(
+            '/agendame/(?!dashboard)'
+            f'(?!(?:{private_alt})(?:/|$))'
+            if private_alt
+            else '/agendame/(?!dashboard)'
+        )
+
+        # Rotas curtas de empresas (ex: /corte-supremo)
+        patterns.append('/[^/]+$')
+
+        self._public = re.compile('|'.join(patterns))
+
+    def is_public(self, path: str, method: str = 'GET') -> bool:
+        """Verifica se a rota é pública"""
+        if path in self.private_routes:
+            return False
+        methods = self.method_restricted.get(path)
+        if methods is not None:
+            return method in methods
+        return self._public.match(path) is not None
@@ -69,6 +69,7 @@ def get_database_config() -> Dict[str, Any]:
                     'models': [
                         'app.models.user',
                         'app.models.trial',
+                        'app.models.refresh_token',
                         # futuros:
                         # 'app.models.client',
                         # 'app.models.service',
@@ -95,6 +96,7 @@ def get_database_config() -> Dict[str, Any]:
                 'models': [
                     'app.models.user',
                     'app.models.trial',
+                    'app.models.refresh_token',
                 ],
                 'default_connection': 'default',
             }
@@ -119,10 +121,21 @@ async def init_database() -> bool:
         await conn.execute_query('SELECT 1')
         print('[OK] Conexão verificada')
 
-        # Criação automática de tabelas
+        # Colunas novas em tabelas já existentes. Roda antes do
+        # generate_schemas, que cria os índices (IF NOT EXISTS) e
+        # falharia no PostgreSQL se a coluna indexada ainda não existisse.
+        from app.database.migrations import (run_migrations,
+                                             run_post_schema_migrations)
+
+        await run_migrations()
+
+        # Criação automática de tabelas e índices
         await Tortoise.generate_schemas()
         print('[OK] Tabelas criadas/verificadas')
 
+        # Índices parciais (unicidade de horário dos agendamentos)
+        await run_post_schema_migrations()
+
         print_database_info()
         return True
 
@@ -0,0 +1,440 @@
+# migrations.py
+"""
+Migrações idempotentes executadas na inicialização, antes do
+generate_schemas(). O generate_schemas só cria tabelas que não existem
+(e índices, com IF NOT EXISTS), então colunas novas em tabelas antigas
+são adicionadas aqui. Em banco novo as tabelas ainda não existem e as
+migrações não fazem nada: o generate_schemas cria tudo em seguida.
+
+Cada migração segue o formato `async def upgrade(db) -> str` e pode ser
+executada várias vezes sem efeito colateral.
+
+O que o generate_schemas() não sabe criar (índices parciais e a
+exclusion constraint do PostgreSQL) fica em
+POST_SCHEMA_MIGRATIONS, executadas logo depois dele, quando todas as
+tabelas já existem.
+"""
+
+from typing import Awaitable, Callable, List
+
+from tortoise import BaseDBAsyncClient, Tortoise
+
+
+def is_sqlite(db: BaseDBAsyncClient) -> bool:
+    return db.capabilities.dialect == 'sqlite'
+
+
+async def table_exists(db: BaseDBAsyncClient, table: str) -> bool:
+    """Verifica se a tabela já existe (SQLite ou PostgreSQL)"""
+    if is_sqlite(db):
+        rows = await db.execute_query_dict(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            [table],
+        )
+        return bool(rows)
+
+    rows = await db.execute_query_dict(
+        'SELECT 1 FROM information_schema.tables WHERE table_name = $1',
+        [table],
+    )
+    return bool(rows)
+
+
+async def column_exists(
+    db: BaseDBAsyncClient, table: str, column: str
+) -> bool:
+    """Verifica se a coluna já existe (SQLite ou PostgreSQL)"""
+    if is_sqlite(db):
+        rows = await db.execute_query_dict(f'PRAGMA table_info("{table}")')
+        return any(row['name'] == column for row in rows)
+
+    rows = await db.execute_query_dict(
+        'SELECT 1 FROM information_schema.columns '
+        'WHERE table_name = $1 AND column_name = $2',
+        [table, column],
+    )
+    return bool(rows)
+
+
+async def index_exists(db: BaseDBAsyncClient, index: str) -> bool:
+    """Verifica se o índice já existe (SQLite ou PostgreSQL)"""
+    if is_sqlite(db):
+        rows = await db.execute_query_dict(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+            [index],
+        )
+        return bool(rows)
+
+    rows = await db.execute_query_dict(
+        'SELECT 1 FROM pg_indexes WHERE indexname = $1', [index]
+    )
+    return bool(rows)
+
+
+async def constraint_exists(db: BaseDBAsyncClient, constraint: str) -> bool:
+    """Verifica se a constraint já existe (só PostgreSQL)"""
+    rows = await db.execute_query_dict(
+        'SELECT 1 FROM pg_constraint WHERE conname = $1', [constraint]
+    )
+    return bool(rows)
+
+
+async def add_column(
+    db: BaseDBAsyncClient, table: str, column: str, definition: str
+) -> bool:
+    """
+    Adiciona a coluna se a tabela existir e a coluna ainda não.
+    Retorna True se criou.
+    """
+    if not await table_exists(db, table):
+        return False
+    if await column_exists(db, table, column):
+        return False
+    await db.execute_script(
+        f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}'
+    )
+    return True
+
+
+# ======================================================
+# MIGRAÇÕES
+# ======================================================
+
+
+async def upgrade_claims_version(db: BaseDBAsyncClient) -> str:
+    """Versão das claims embutidas no access token (users e trial)"""
+    created = []
+    for table in ('users', 'trial'):
+        if await add_column(
+            db, table, 'claims_version', 'INT NOT NULL DEFAULT 0'
+        ):
+            created.append(table)
+    return f'claims_version: {", ".join(created) or "ok"}'
+
+
+async def upgrade_email_search(db: BaseDBAsyncClient) -> str:
+    """
+    Hash de busca do email em users/trial + backfill.
+    O índice é criado pelo generate_schemas logo depois.
+    """
+    from app.utils.hashed_email import create_email_search_hash
+
+    placeholder = '?' if is_sqlite(db) else '$1'
+    placeholder_id = '?' if is_sqlite(db) else '$2'
+    filled = 0
+
+    for table in ('users', 'trial'):
+        if not await table_exists(db, table):
+            continue
+
+        await add_column(db, table, 'email_search', 'VARCHAR(64) NULL')
+
+        rows = await db.execute_query_dict(
+            f'SELECT id, email FROM "{table}" WHERE email_search IS NULL'
+        )
+        for row in rows:
+            await db.execute_query(
+                f'UPDATE "{table}" SET email_search = {placeholder} '
+                f'WHERE id = {placeholder_id}',
+                [create_email_search_hash(row['email']), row['id']],
+            )
+        filled += len(rows)
+
+    return f'email_search: {filled} contas preenchidas'
+
+
+async def upgrade_tenant_key(db: BaseDBAsyncClient) -> str:
+    """
+    Chave única do tenant (app/utils/tenant_key.py) + backfill:
+    user_id para contas User e -trial_account_id para TrialAccount.
+    Os índices compostos são criados pelo generate_schemas logo depois.
+    """
+    filled = []
+    for table in ('clients', 'services', 'appointments', 'business_settings'):
+        if not await table_exists(db, table):
+            continue
+
+        await add_column(db, table, 'tenant_key', 'BIGINT NULL')
+        await db.execute_script(
+            f'UPDATE "{table}" SET tenant_key = CASE '
+            'WHEN user_id IS NOT NULL THEN user_id '
+            'ELSE -trial_account_id END '
+            'WHERE tenant_key IS NULL '
+            'AND (user_id IS NOT NULL OR trial_account_id IS NOT NULL)'
+        )
+        filled.append(table)
+
+    return f'tenant_key: {", ".join(filled) or "ok"}'
+
+
+async def upgrade_slug_search(db: BaseDBAsyncClient) -> str:
+    """
+    Slug normalizado (normalize_company_slug) em users/trial + backfill.
+    Em tabela nova a coluna já nasce UNIQUE; aqui o índice único é criado
+    junto com a coluna. Slugs que colidem depois de normalizados ficam
+    NULL (a empresa mais antiga mantém o slug) e são listados no log.
+    Os índices de username/business_name vêm do generate_schemas.
+    """
+    from app.utils.normalize_company_datas import company_slug_search
+
+    placeholder = '?' if is_sqlite(db) else '$1'
+    placeholder_id = '?' if is_sqlite(db) else '$2'
+    filled = 0
+
+    for table in ('users', 'trial'):
+        if not await table_exists(db, table):
+            continue
+
+        created = await add_column(
+            db, table, 'slug_search', 'VARCHAR(100) NULL'
+        )
+
+        taken = {
+            row['slug_search']
+            for row in await db.execute_query_dict(
+                f'SELECT slug_search FROM "{table}" '
+                'WHERE slug_search IS NOT NULL'
+            )
+        }
+        rows = await db.execute_query_dict(
+            f'SELECT id, business_slug FROM "{table}" '
+            'WHERE slug_search IS NULL AND business_slug IS NOT NULL '
+            'ORDER BY id'
+        )
+        for row in rows:
+            value = company_slug_search(row['business_slug'])
+            if value is None:
+                continue
+            if value in taken:
+                print(
+                    f'[AVISO] {table}.id={row["id"]}: slug '
+                    f'"{row["business_slug"]}" colide com outro depois de '
+                    'normalizado'
+                )
+                continue
+            taken.add(value)
+            await db.execute_query(
+                f'UPDATE "{table}" SET slug_search = {placeholder} '
+                f'WHERE id = {placeholder_id}',
+                [value, row['id']],
+            )
+            filled += 1
+
+        if created:
+            await db.execute_script(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS "uid_{table}_slug_search" '
+                f'ON "{table}" (slug_search)'
+            )
+
+    return f'slug_search: {filled} empresas preenchidas'
+
+
+async def upgrade_appointment_resource(db: BaseDBAsyncClient) -> str:
+    """
+    appointments.resource_id: recurso (profissional, cadeira, sala)
+    ocupado pelo agendamento. As tabelas resources e service_resources
+    são novas e ficam com o generate_schemas(). Sem REFERENCES: em banco
+    antigo a tabela resources ainda não existe neste ponto.
+    """
+    created = await add_column(db, 'appointments', 'resource_id', 'INT NULL')
+    return f'appointment_resource: {"resource_id" if created else "ok"}'
+
+
+async def upgrade_appointment_minutes(db: BaseDBAsyncClient) -> str:
+    """
+    appointments.start_minute/end_minute (minutos do dia ocupados) +
+    backfill com a duração atual do serviço (60 se não houver).
+    """
+    from app.controllers.agendame.availability import parse_minutes
+
+    if not await table_exists(db, 'appointments'):
+        return 'appointment_minutes: ok'
+
+    await add_column(db, 'appointments', 'start_minute', 'INT NULL')
+    await add_column(db, 'appointments', 'end_minute', 'INT NULL')
+
+    placeholders = ('?', '?', '?') if is_sqlite(db) else ('$1', '$2', '$3')
+    rows = await db.execute_query_dict(
+        'SELECT a.id, a.appointment_time, s.duration_minutes '
+        'FROM "appointments" a LEFT JOIN "services" s ON s.id = a.service_id '
+        'WHERE a.end_minute IS NULL'
+    )
+    filled = 0
+    for row in rows:
+        start = parse_minutes(row['appointment_time'])
+        if start is None:
+            continue
+        end = start + max(1, row['duration_minutes'] or 60)
+        await db.execute_query(
+            f'UPDATE "appointments" SET start_minute = {placeholders[0]}, '
+            f'end_minute = {placeholders[1]} WHERE id = {placeholders[2]}',
+            [start, end, row['id']],
+        )
+        filled += 1
+
+    return f'appointment_minutes: {filled} agendamentos preenchidos'
+
+
+# Status que ocupam horário (iguais a Appointments._get_booked_intervals)
+ACTIVE_APPOINTMENT_STATUSES = "('scheduled', 'confirmed')"
+
+# Um agendamento ativo por (tenant, recurso, data, hora). Serviços sem
+# recurso seguem a regra antiga: um por (tenant, serviço, data, hora).
+APPOINTMENT_SLOT_INDEXES = (
+    (
+        'uid_appointments_resource_slot',
+        'tenant_key, resource_id, appointment_date, appointment_time',
+        'resource_id IS NOT NULL',
+    ),
+    (
+        'uid_appointments_service_slot',
+        'tenant_key, service_id, appointment_date, appointment_time',
+        'resource_id IS NULL',
+    ),
+)
+
+
+async def upgrade_appointment_slot_unique(db: BaseDBAsyncClient) -> str:
+    """
+    Índices únicos parciais que impedem duas reservas ativas no mesmo
+    horário, mesmo com requisições simultâneas (o INSERT perdedor falha
+    com IntegrityError → 409). Se o banco já tiver duplicatas o índice
+    não é criado: a migração avisa e tenta de novo no próximo start.
+    """
+    if not await table_exists(db, 'appointments'):
+        return 'appointment_slot_unique: ok'
+
+    created = []
+    for name, columns, condition in APPOINTMENT_SLOT_INDEXES:
+        if await index_exists(db, name):
+            continue
+
+        where = f'{condition} AND status IN {ACTIVE_APPOINTMENT_STATUSES}'
+        rows = await db.execute_query_dict(
+            'SELECT COUNT(*) AS total FROM ('
+            f'SELECT 1 FROM "appointments" WHERE {where} '
+            f'GROUP BY {columns} HAVING COUNT(*) > 1'
+            ') AS duplicated'
+        )
+        duplicated = rows[0]['total'] if rows else 0
+        if duplicated:
+            print(
+                f'[AVISO] {name}: {duplicated} horário(s) com mais de um '
+                'agendamento ativo; cancele/remarque e reinicie'
+            )
+            continue
+
+        await db.execute_script(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS "{name}" '
+            f'ON "appointments" ({columns}) WHERE {where}'
+        )
+        created.append(name)
+
+    return f'appointment_slot_unique: {", ".join(created) or "ok"}'
+
+
+# Sem sobreposição entre agendamentos ativos do mesmo tenant no mesmo
+# recurso (ou no mesmo serviço, quando não há recurso), qualquer que seja
+# o horário de início. Só PostgreSQL (btree_gist); no SQLite a verificação
+# depois do INSERT (Appointments._insert_appointment) cobre esse caso.
+APPOINTMENT_SLOT_EXCLUSION = 'excl_appointments_slot_overlap'
+
+# Lido por Appointments._insert_appointment (False até a migração rodar)
+_slot_exclusion_active = False
+
+
+def slot_exclusion_active() -> bool:
+    """A exclusion constraint de sobreposição está ativa neste banco?"""
+    return _slot_exclusion_active
+
+
+async def upgrade_appointment_slot_exclusion(db: BaseDBAsyncClient) -> str:
+    """
+    Exclusion constraint (GiST) que recusa dois agendamentos ativos que
+    se sobrepõem (ex.: 09:00 de 90 min x 10:00), mesmo em transações
+    simultâneas: o INSERT/UPDATE perdedor falha com IntegrityError → 409.
+    Se o banco já tiver sobreposições, ou a extensão btree_gist não puder
+    ser criada, a constraint fica para o próximo start e vale só a
+    verificação depois do INSERT.
+    """
+    global _slot_exclusion_active
+
+    if is_sqlite(db) or not await table_exists(db, 'appointments'):
+        return 'appointment_slot_exclusion: ok'
+
+    if await constraint_exists(db, APPOINTMENT_SLOT_EXCLUSION):
+        _slot_exclusion_active = True
+        return 'appointment_slot_exclusion: ok'
+
+    rows = await db.execute_query_dict(
+        'SELECT COUNT(*) AS total FROM "appointments" a '
+        'JOIN "appointments" b ON a.id < b.id '
+        'AND a.tenant_key = b.tenant_key '
+        'AND COALESCE(a.resource_id, -a.service_id) '
+        '= COALESCE(b.resource_id, -b.service_id) '
+        'AND a.appointment_date = b.appointment_date '
+        'AND a.start_minute < b.end_minute '
+        'AND b.start_minute < a.end_minute '
+        f'WHERE a.status IN {ACTIVE_APPOINTMENT_STATUSES} '
+        f'AND b.status IN {ACTIVE_APPOINTMENT_STATUSES}'
+    )
+    overlapping = rows[0]['total'] if rows else 0
+    if overlapping:
+        print(
+            f'[AVISO] {APPOINTMENT_SLOT_EXCLUSION}: {overlapping} par(es) de '
+            'agendamentos ativos sobrepostos; cancele/remarque e reinicie'
+        )
+        return 'appointment_slot_exclusion: pendente'
+
+    try:
+        await db.execute_script('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        await db.execute_script(
+            f'ALTER TABLE "appointments" '
+            f'ADD CONSTRAINT "{APPOINTMENT_SLOT_EXCLUSION}" '
+            'EXCLUDE USING gist ('
+            'tenant_key WITH =, '
+            '(COALESCE(resource_id, -service_id)) WITH =, '
+            'appointment_date WITH =, '
+            'int4range(start_minute, end_minute) WITH &&'
+            f') WHERE (status IN {ACTIVE_APPOINTMENT_STATUSES} '
+            'AND start_minute IS NOT NULL AND end_minute IS NOT NULL)'
+        )
+    except Exception as e:
+        print(f'[AVISO] {APPOINTMENT_SLOT_EXCLUSION}: {e}')
+        return 'appointment_slot_exclusion: pendente'
+
+    _slot_exclusion_active = True
+    return f'appointment_slot_exclusion: {APPOINTMENT_SLOT_EXCLUSION}'
+
+
+MIGRATIONS: List[Callable[[BaseDBAsyncClient], Awaitable[str]]] = [
+    upgrade_claims_version,
+    upgrade_email_search,
+    upgrade_tenant_key,
+    upgrade_slug_search,
+    upgrade_appointment_resource,
+    upgrade_appointment_minutes,
+]
+
+
+# Executadas depois do generate_schemas() (banco novo ou antigo)
+POST_SCHEMA_MIGRATIONS: List[Callable[[BaseDBAsyncClient], Awaitable[str]]] = [
+    upgrade_appointment_slot_unique,
+    upgrade_appointment_slot_exclusion,
+]
+
+
+async def run_migrations() -> None:
+    """Executa todas as migrações em ordem"""
+    db = Tortoise.get_connection('default')
+    for migration in MIGRATIONS:
+        result = await migration(db)
+        print(f'[OK] Migração {result}')
+
+
+async def run_post_schema_migrations() -> None:
+    """Executa as migrações que dependem das tabelas já criadas"""
+    db = Tortoise.get_connection('default')
+    for migration in POST_SCHEMA_MIGRATIONS:
+        result = await migration(db)
+        print(f'[OK] Migração {result}')
@@ -0,0 +1,28 @@
+# refresh_token.py
+from tortoise import fields, models
+
+
+class RefreshToken(models.Model):
+    """
+    RefreshToken: refresh tokens de uso único.
+    Guarda apenas o hash do token. Cada renovação gera um novo token na
+    mesma família; reutilizar um token já usado revoga a família inteira.
+    """
+
+    id = fields.IntField(pk=True)
+    token_hash = fields.CharField(max_length=64, unique=True)
+    family_id = fields.CharField(max_length=32, index=True)
+
+    # Dono do token: 'user' ou 'trial' + id na tabela correspondente
+    account_kind = fields.CharField(max_length=10)
+    account_id = fields.IntField()
+
+    expires_at = fields.DatetimeField()
+    used_at = fields.DatetimeField(null=True)
+    revoked = fields.BooleanField(default=False)
+
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:   # type: ignore
+        table = 'refresh_tokens'
+        indexes = [('account_kind', 'account_id')]
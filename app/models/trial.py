@@ -11,14 +11,18 @@ class TrialAccount(models.Model):
     """
 
     id = fields.IntField(pk=True)
-    username = fields.CharField(max_length=120)
+    username = fields.CharField(max_length=120, index=True)
     email = fields.CharField(max_length=120, unique=True)
+    # SHA-256 do email normalizado (create_email_search_hash), para busca
+    email_search = fields.CharField(max_length=64, null=True, index=True)
     password = fields.CharField(max_length=100)
 
     # Informações do salão
-    business_name = fields.CharField(max_length=200)
+    business_name = fields.CharField(max_length=200, index=True)
     business_type = fields.CharField(max_length=100)
     business_slug = fields.CharField(max_length=100, unique=True, null=True)
+    # normalize_company_slug(business_slug): /Corte-Supremo == /corte-supremo
+    slug_search = fields.CharField(max_length=100, unique=True, null=True)
     phone = fields.CharField(max_length=20)
     whatsapp = fields.CharField(max_length=20, null=True)
 
@@ -39,8 +43,13 @@ class TrialAccount(models.Model):
     subscription_start = fields.DatetimeField(null=True)
     subscription_end = fields.DatetimeField(null=True)
 
+    # Incrementado quando dados presentes no access token mudam
+    claims_version = fields.IntField(default=0)
+
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
     class Meta:   # type: ignore
         table = 'trial'
+        # Varredura de trials vencidos (trial_sweeper)
+        indexes = [('subscription_active', 'subscription_end')]
@@ -8,18 +8,24 @@ from datetime import datetime
 
 from tortoise import fields, models
 
+from app.utils.tenant_key import tenant_key_from_owner
+
 
 class User(models.Model):
     """Modelo para usuários (proprietários de salões)"""
 
     id = fields.IntField(pk=True)
-    username = fields.CharField(max_length=120)
+    username = fields.CharField(max_length=120, index=True)
     email = fields.CharField(max_length=120, unique=True)
+    # SHA-256 do email normalizado (create_email_search_hash), para busca
+    email_search = fields.CharField(max_length=64, null=True, index=True)
     password = fields.CharField(max_length=100)
 
-    business_name = fields.CharField(max_length=200)
+    business_name = fields.CharField(max_length=200, index=True)
     business_type = fields.CharField(max_length=100)
     business_slug = fields.CharField(max_length=100, unique=True, null=True)
+    # normalize_company_slug(business_slug): /Corte-Supremo == /corte-supremo
+    slug_search = fields.CharField(max_length=100, unique=True, null=True)
     phone = fields.CharField(max_length=20)
     whatsapp = fields.CharField(max_length=20, null=True)
 
@@ -39,6 +45,9 @@ class User(models.Model):
     subscription_start = fields.DatetimeField(null=True)
     subscription_end = fields.DatetimeField(null=True)
 
+    # Incrementado quando dados presentes no access token mudam
+    claims_version = fields.IntField(default=0)
+
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
@@ -49,7 +58,21 @@ class User(models.Model):
         return f'User: {self.business_name} ({self.email})'
 
 
-class Client(models.Model):
+class TenantOwned:
+    """
+    Mixin dos models que pertencem a uma empresa (User ou TrialAccount).
+    Mantém `tenant_key` em sincronia com as FKs user/trial_account a
+    cada save(), inclusive no Model.create().
+    """
+
+    async def save(self, *args, **kwargs):
+        self.tenant_key = tenant_key_from_owner(
+            self.user_id, self.trial_account_id
+        )
+        await super().save(*args, **kwargs)
+
+
+class Client(TenantOwned, models.Model):
     """Modelo para clientes dos salões"""
 
     id = fields.IntField(pk=True)
@@ -63,6 +86,9 @@ class Client(models.Model):
         'models.TrialAccount', related_name='clients', null=True
     )
 
+    # Dono unificado: user_id ou -trial_account_id (app/utils/tenant_key.py)
+    tenant_key = fields.BigIntField(null=True)
+
     full_name = fields.CharField(max_length=200)
     phone = fields.CharField(max_length=20)
     total_appointments = fields.IntField(default=0)
@@ -73,13 +99,13 @@ class Client(models.Model):
 
     class Meta:
         table = 'clients'
-        indexes = [('user_id', 'phone'), ('trial_account_id', 'phone')]
+        indexes = [('tenant_key', 'phone')]
 
     def __str__(self):
         return f'Client: {self.full_name} ({self.phone})'
 
 
-class Service(models.Model):
+class Service(TenantOwned, models.Model):
     """Modelo para serviços oferecidos pelos salões"""
 
     id = fields.IntField(pk=True)
@@ -93,6 +119,9 @@ class Service(models.Model):
         'models.TrialAccount', related_name='services', null=True
     )
 
+    # Dono unificado: user_id ou -trial_account_id (app/utils/tenant_key.py)
+    tenant_key = fields.BigIntField(null=True)
+
     name = fields.CharField(max_length=200)
     description = fields.TextField(null=True)
     price = fields.DecimalField(max_digits=10, decimal_places=2)
@@ -106,13 +135,65 @@ class Service(models.Model):
 
     class Meta:
         table = 'services'
-        indexes = [('user_id', 'is_active'), ('trial_account_id', 'is_active')]
+        indexes = [('tenant_key', 'is_active', 'order')]
 
     def __str__(self):
         return f'Service: {self.name} - R${self.price}'
 
 
-class Appointment(models.Model):
+class Resource(TenantOwned, models.Model):
+    """
+    Recurso com capacidade própria (profissional, cadeira, sala).
+    Um serviço ligado a recursos só pode ser agendado se algum deles
+    estiver livre durante toda a duração, qualquer que seja o serviço
+    que o ocupa. Serviços sem recursos seguem a regra por serviço.
+    """
+
+    KIND_CHOICES = (
+        ('staff', 'Profissional'),
+        ('chair', 'Cadeira'),
+        ('room', 'Sala'),
+    )
+
+    id = fields.IntField(pk=True)
+
+    # Duas relações possíveis
+    user = fields.ForeignKeyField(
+        'models.User', related_name='resources', null=True
+    )
+
+    trial_account = fields.ForeignKeyField(
+        'models.TrialAccount', related_name='resources', null=True
+    )
+
+    # Dono unificado: user_id ou -trial_account_id (app/utils/tenant_key.py)
+    tenant_key = fields.BigIntField(null=True)
+
+    name = fields.CharField(max_length=200)
+    kind = fields.CharField(
+        max_length=20, choices=KIND_CHOICES, default='staff'
+    )
+    is_active = fields.BooleanField(default=True)
+
+    # Serviços que o recurso atende (tabela service_resources)
+    services = fields.ManyToManyField(
+        'models.Service',
+        related_name='resources',
+        through='service_resources',
+    )
+
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = 'resources'
+        indexes = [('tenant_key', 'is_active')]
+
+    def __str__(self):
+        return f'Resource: {self.name} ({self.kind})'
+
+
+class Appointment(TenantOwned, models.Model):
     """Modelo para agendamentos"""
 
     STATUS_CHOICES = (
@@ -134,6 +215,9 @@ class Appointment(models.Model):
         'models.TrialAccount', related_name='appointments', null=True
     )
 
+    # Dono unificado: user_id ou -trial_account_id (app/utils/tenant_key.py)
+    tenant_key = fields.BigIntField(null=True)
+
     # Cliente e serviço (já suportam trial via Client e Service)
     client = fields.ForeignKeyField(
         'models.Client', related_name='appointments', null=True
@@ -141,9 +225,20 @@ class Appointment(models.Model):
     service = fields.ForeignKeyField(
         'models.Service', related_name='appointments'
     )
+    # Recurso ocupado (só para serviços ligados a recursos)
+    resource = fields.ForeignKeyField(
+        'models.Resource',
+        related_name='appointments',
+        null=True,
+        on_delete=fields.SET_NULL,
+    )
 
     appointment_date = fields.DateField()
     appointment_time = fields.CharField(max_length=10)
+    # Minutos do dia ocupados, [start_minute, end_minute): base da
+    # exclusion constraint do PostgreSQL (database/migrations.py)
+    start_minute = fields.IntField(null=True)
+    end_minute = fields.IntField(null=True)
     client_name = fields.CharField(max_length=200)
     client_phone = fields.CharField(max_length=20)
 
@@ -162,18 +257,17 @@ class Appointment(models.Model):
     class Meta:
         table = 'appointments'
         indexes = [
-            ('user_id', 'appointment_date', 'status'),
-            ('trial_account_id', 'appointment_date', 'status'),
-            ('user_id', 'client_phone'),
-            ('trial_account_id', 'client_phone'),
+            ('tenant_key', 'appointment_date', 'status'),
+            ('tenant_key', 'client_phone'),
             ('status', 'appointment_date'),
+            ('resource_id', 'appointment_date'),
         ]
 
     def __str__(self):
         return f'Appointment: {self.client_name} - {self.appointment_date} {self.appointment_time}'
 
 
-class BusinessSettings(models.Model):
+class BusinessSettings(TenantOwned, models.Model):
     """Configurações específicas de cada salão"""
 
     id = fields.IntField(pk=True)
@@ -187,6 +281,9 @@ class BusinessSettings(models.Model):
         'models.TrialAccount', related_name='settings', null=True
     )
 
+    # Dono unificado: user_id ou -trial_account_id (app/utils/tenant_key.py)
+    tenant_key = fields.BigIntField(null=True)
+
     whatsapp_message_template = fields.TextField(
         default='Olá {client_name}! Seu horário no salão está chegando! '
         'Você já pode vir para o seu {service_name}. Estamos te esperando!'
@@ -212,6 +309,7 @@ class BusinessSettings(models.Model):
 
     class Meta:
         table = 'business_settings'
+        indexes = [('tenant_key',)]
 
     def __str__(self):
         owner = self.user or self.trial_account
@@ -1,9 +1,11 @@
 import os
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
+from app.controllers.company.identifier_index import company_index
+
 router = APIRouter(prefix='', tags=['agendame_chat'])
 
 # Configurar templates
@@ -12,12 +14,25 @@ template_dir = os.path.join(BASE_DIR, 'templates')
 templates = Jinja2Templates(directory=template_dir)
 
 
+async def _ensure_company_exists(company_slug: str) -> None:
+    """
+    404 barato para slugs desconhecidos (robôs: /wp-login.php, /.env):
+    filtro de Bloom + cache do company_index, sem renderizar o template.
+    """
+    if await company_index.resolve(company_slug) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Empresa não encontrada',
+        )
+
+
 @router.get('/agendame/{company_slug}', response_class=HTMLResponse)
 async def render_agendame_chat(request: Request, company_slug: str):
     """
     Rota para renderizar a página de chat de agendamento.
     Exemplo: /agendame/corte-supremo-barber-spa
     """
+    await _ensure_company_exists(company_slug)
     return templates.TemplateResponse(
         'agendame.html', {'request': request, 'company_slug': company_slug}
     )
@@ -28,6 +43,7 @@ async def render_agendame_chat_short(request: Request, company_slug: str):
     """
     Rota alternativa: /corte-supremo-barber-spa
     """
+    await _ensure_company_exists(company_slug)
     return templates.TemplateResponse(
         'agendame.html', {'request': request, 'company_slug': company_slug}
     )
@@ -6,26 +6,27 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from app.controllers.agendame.services import Services
+from app.controllers.company.company_context import (CompanyContext,
+                                                      current_company)
 from app.schemas.agendame.response_service_agendame import ServiceItem
 from app.schemas.agendame.upgrade_service import UpdateServices
-from app.service.jwt.depends import SystemUser, get_current_user
 
 router = APIRouter(tags=['Agendame-company'])
 
 
 @router.get('/agendame/services', response_model=List[ServiceItem])
 async def get_my_services(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ):
-    service_domain = Services(target_company_id=current_user.id)
+    service_domain = Services(context=company)
     return await service_domain.get_services()
 
 
 @router.delete('/agendame/remove/service/{service_id}', status_code=200)
 async def remove_service(
-    service_id: int, current_user: SystemUser = Depends(get_current_user)
+    service_id: int, company: CompanyContext = Depends(current_company)
 ):
-    target_service = Services(target_company_id=current_user.id)
+    target_service = Services(context=company)
     return await target_service.remove_one_service(
         target_service_id=service_id
     )
@@ -35,9 +36,9 @@ async def remove_service(
 async def upgrade_service(
     service_id: int,
     schemas_update: UpdateServices,
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ):
-    target_service = Services(target_company_id=current_user.id)
+    target_service = Services(context=company)
     return await target_service.upgrade_service(
         target_service_id=service_id, schemas=schemas_update
     )
@@ -45,7 +46,7 @@ async def upgrade_service(
 
 @router.get('/clients')
 async def get_clients(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
     search_query: Optional[str] = Query(
         None, description='Busca por nome do cliente'
     ),
@@ -56,7 +57,7 @@ async def get_clients(
     Busca todos os clientes da empresa do usuário logado.
     """
     try:
-        services_domain = Services(target_company_id=current_user.id)
+        services_domain = Services(context=company)
         return await services_domain.get_clients(
             search_query=search_query, limit=limit, offset=offset
         )
@@ -71,13 +72,13 @@ async def get_clients(
 
 @router.get('/dashboard/stats')
 async def get_dashboard_stats(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ):
     """
     Retorna estatísticas para o dashboard.
     """
     try:
-        services_domain = Services(target_company_id=current_user.id)
+        services_domain = Services(context=company)
         return await services_domain.get_dashboard_stats()
 
     except Exception as e:
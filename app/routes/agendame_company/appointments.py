@@ -6,6 +6,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from tortoise.expressions import Q
 
 from app.controllers.agendame.appointments import Appointments
+from app.controllers.agendame.availability_cache import availability_cache
+from app.controllers.company.company_context import (CompanyContext,
+                                                      current_company)
 from app.models.user import Appointment, Client, Service, User
 from app.schemas.agendame.appointments import (AppointmentCreatedResponse,
                                                AppointmentsFilter,
@@ -13,6 +16,7 @@ from app.schemas.agendame.appointments import (AppointmentCreatedResponse,
                                                CreateAppointmentInternal,
                                                UpdateAppointmentSchema)
 from app.service.jwt.depends import SystemUser, get_current_user
+from app.utils.tenant_key import make_tenant_key
 
 router = APIRouter(tags=['Agendame - Agendamentos'])
 
@@ -20,7 +24,7 @@ router = APIRouter(tags=['Agendame - Agendamentos'])
 @router.post('/agendame/appointments', response_model=AppointmentsListResponse)
 async def get_company_appointments(
     filter_data: AppointmentsFilter,
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Busca agendamentos da empresa do usuário logado.
@@ -28,7 +32,7 @@ async def get_company_appointments(
     """
     try:
         # Usar o controlador de Appointments
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         # Usar o método da classe Appointments
         appointments_list = await appointments_domain.get_company_appointments(
@@ -79,7 +83,7 @@ async def get_company_appointments(
     '/agendame/appointments/today', response_model=AppointmentsListResponse
 )
 async def get_today_appointments(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
     status_filter: Optional[str] = Query(
         None, description='Filtrar por status'
     ),
@@ -89,7 +93,7 @@ async def get_today_appointments(
     """
     try:
         # Usar o controlador de Appointments
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         today = date.today()
         appointments_list = await appointments_domain.get_company_appointments(
@@ -114,13 +118,13 @@ async def get_today_appointments(
 async def get_available_times(
     service_id: int,
     date: date = Query(..., description='Data para verificar disponibilidade'),
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Retorna horários disponíveis para um serviço em uma data específica.
     """
     try:
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         result = await appointments_domain.get_available_times(
             service_id=service_id, target_date=date
@@ -142,14 +146,14 @@ async def get_available_times(
 )
 async def create_appointment_internal(
     appointment_data: CreateAppointmentInternal,
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Cria um novo agendamento internamente (pelo painel da empresa).
     """
     try:
         # Usar o controlador de Appointments
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         # Criar agendamento usando o método da classe
         result = await appointments_domain.create_appointment(
@@ -264,7 +268,7 @@ async def get_public_available_times(
 async def update_appointment_status(
     appointment_id: int,
     status: str = Query(..., description='Novo status do agendamento'),
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Atualiza o status de um agendamento.
@@ -286,7 +290,7 @@ async def update_appointment_status(
             )
 
         # Usar o controlador de Appointments
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         # Buscar agendamento para verificar se existe
         appointments_list = (
@@ -335,7 +339,7 @@ async def delete_appointment(
     try:
         # Buscar agendamento
         appointment = await Appointment.filter(
-            Q(user_id=current_user.id) | Q(trial_account_id=current_user.id),
+            tenant_key=make_tenant_key(current_user.id, current_user.is_trial),
             id=appointment_id,
         ).first()
 
@@ -347,6 +351,9 @@ async def delete_appointment(
 
         # Deletar agendamento
         await appointment.delete()
+        availability_cache.invalidate_date(
+            appointment.tenant_key, appointment.appointment_date
+        )
 
         return {
             'success': True,
@@ -367,13 +374,13 @@ async def delete_appointment(
 async def update_appointment(
     appointment_id: int,
     update_data: UpdateAppointmentSchema,
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Atualiza um agendamento existente.
     """
     try:
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         result = await appointments_domain.update_one_appointments(
             target_appointment=appointment_id, schema=update_data
@@ -393,13 +400,13 @@ async def update_appointment(
 @router.get('/agendame/appointments/{appointment_id}')
 async def get_appointment_details(
     appointment_id: int,
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Busca detalhes de um agendamento específico.
     """
     try:
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         appointments_list = (
             await appointments_domain.get_company_appointments()
@@ -427,13 +434,13 @@ async def get_appointment_details(
 @router.get('/agendame/appointments/upcoming')
 async def get_upcoming_appointments(
     days: int = Query(7, description='Número de dias a frente'),
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
 ) -> Dict[str, Any]:
     """
     Busca agendamentos dos próximos dias.
     """
     try:
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         today = date.today()
         end_date = today + timedelta(days=days)
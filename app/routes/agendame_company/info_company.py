@@ -1,8 +1,8 @@
 # info_company.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends
 
-from app.controllers.company.company_data import MyCompany
-from app.service.jwt.depends import SystemUser, get_current_user
+from app.controllers.company.company_context import (CompanyContext,
+                                                      current_company)
 
 router = APIRouter(tags=['Agendame-info'])
 
@@ -10,20 +10,12 @@ router = APIRouter(tags=['Agendame-info'])
 @router.get('/agendame/{company_slug}/info')
 async def get_company_info(
     company_slug: str,
-    current_user: SystemUser = Depends(get_current_user),
+    context: CompanyContext = Depends(current_company),
 ):
     """
     Retorna informações da empresa atual
     """
-
-    # Exemplo: assumindo que o usuário tem company_id vinculado
-    company_id = current_user.id
-
-    try:
-        company = await MyCompany.create(company_id=company_id)
-
-    except ValueError:
-        raise HTTPException(status_code=404, detail='Empresa não encontrada')
+    company = context.company
 
     # Exemplo de retorno usando domínio
     return {
@@ -0,0 +1,42 @@
+# resources.py
+from fastapi import APIRouter, Depends
+
+from app.controllers.agendame.resources import Resources
+from app.controllers.company.company_context import (CompanyContext,
+                                                      current_company)
+from app.schemas.agendame.resources import ResourceCreate, ResourceUpdate
+
+router = APIRouter(tags=['Agendame-company'])
+
+
+@router.get('/agendame/resources')
+async def list_resources(company: CompanyContext = Depends(current_company)):
+    """Recursos da empresa (profissionais, cadeiras, salas)"""
+    resources = await Resources(context=company).list_resources()
+    return {'resources': resources, 'total': len(resources)}
+
+
+@router.post('/agendame/resources', status_code=201)
+async def create_resource(
+    schema: ResourceCreate,
+    company: CompanyContext = Depends(current_company),
+):
+    return await Resources(context=company).create_resource(schema)
+
+
+@router.put('/agendame/resources/{resource_id}', status_code=200)
+async def update_resource(
+    resource_id: int,
+    schema: ResourceUpdate,
+    company: CompanyContext = Depends(current_company),
+):
+    return await Resources(context=company).update_resource(
+        resource_id, schema
+    )
+
+
+@router.delete('/agendame/resources/{resource_id}', status_code=200)
+async def remove_resource(
+    resource_id: int, company: CompanyContext = Depends(current_company)
+):
+    return await Resources(context=company).remove_resource(resource_id)
@@ -3,17 +3,27 @@ from pathlib import Path
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
+from fastapi import (APIRouter, Depends, Form, HTTPException, Request,
+                     Response, status)
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.templating import Jinja2Templates
 
+from app.core.admission import admit_auth_request
 from app.core.config import templates
-from app.schemas.auth.schemas_login import LoginResponse
-from app.service.auth.auth_login import (checking_account,
-                                         checking_account_trial)
-from app.service.auth.auth_register import SignupFreeTrial
+from app.models.trial import TrialAccount
+from app.models.user import User
+from app.schemas.auth.schemas_login import (LoginResponse, RefreshRequest,
+                                            RefreshResponse)
+from app.service.auth.auth_login import checking_any_account
+from app.service.jwt.auth import (ACCESS_TOKEN_EXPIRE_MINUTES,
+                                  build_account_claims, create_access_token)
 from app.service.jwt.depends import SystemUser, get_current_user
+from app.service.jwt.refresh_tokens import (REFRESH_COOKIE_NAME,
+                                            clear_refresh_cookie,
+                                            revoke_refresh_token,
+                                            rotate_refresh_token,
+                                            set_refresh_cookie)
 
 load_dotenv()
 
@@ -56,25 +66,15 @@ async def get_login_page(
     '/login',
     response_model=LoginResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(admit_auth_request, scope='function')],
 )
 async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     """Rota responsável por autenticar um usuário se o mesmo tiver uma conta."""
 
     try:
-        # Verifica se teste de 7 dias está habilitado ou não
-        is_trial = SignupFreeTrial(data=None)
-        result = await is_trial.remove_account_after_trial(
-            target_by_email=form_data.username
-        )
-
-        if result:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail='Sua conta de teste de 7 dias expirou. Por favor, registre-se novamente.',
-            )
-
-        # Tenta autenticar como usuário regular primeiro
-        verify_auth = await checking_account(
+        # Uma consulta (User + Trial) e uma verificação de senha.
+        # Trial vencido levanta 401 dentro de checking_any_account.
+        verify_auth = await checking_any_account(
             request=None,
             target={
                 'username': form_data.username,
@@ -83,17 +83,6 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
             },
         )
 
-        # Se não encontrou usuário regular, tenta como trial
-        if verify_auth is None:
-            verify_auth = await checking_account_trial(
-                request=None,
-                target={
-                    'username': form_data.username,
-                    'email': form_data.username,
-                    'password': form_data.password,
-                },
-            )
-
         # Se ainda for None, credenciais inválidas
         if verify_auth is None:
             raise HTTPException(
@@ -109,11 +98,11 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
                 detail='Erro interno no servidor.',
             )
 
-        # Cria a resposta JSON
+        # Cria a resposta JSON. O refresh token vai só no cookie HttpOnly
         response_data = {
             'access_token': verify_auth.get('access_token'),
             'token_type': 'bearer',
-            'refresh_token': verify_auth.get('refresh_token'),
+            'expires_in': ACCESS_TOKEN_EXPIRE_MINUTES * 60,
             'user_id': verify_auth.get('user_id'),
             'username': verify_auth.get('username'),
             'email': verify_auth.get('email'),
@@ -127,6 +116,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
             response_data['days_remaining'] = verify_auth.get('days_remaining', 0)
 
         response = JSONResponse(content=response_data)
+        set_refresh_cookie(response, verify_auth.get('refresh_token'))
 
         return response
 
@@ -147,6 +137,49 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
         )
 
 
+@router_login.post('/refresh', response_model=RefreshResponse)
+async def refresh_session(
+    request: Request,
+    response: Response,
+    target: Optional[RefreshRequest] = None,
+):
+    """
+    Renova a sessão sem senha: troca o refresh token (uso único) por um
+    novo access token e um novo refresh token da mesma família, que volta
+    no cookie HttpOnly.
+    """
+    token = (target.refresh_token if target else None) or request.cookies.get(
+        REFRESH_COOKIE_NAME
+    )
+
+    kind, account_id, refresh_token = await rotate_refresh_token(token)
+
+    model = TrialAccount if kind == 'trial' else User
+    account = await model.get_or_none(id=account_id)
+
+    # Conta removida ou trial expirado: não renova
+    if account is None or (
+        kind == 'trial' and not account.subscription_active
+    ):
+        await revoke_refresh_token(refresh_token)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Sessão expirada. Faça login novamente.',
+        )
+
+    access_token = create_access_token(
+        str(account.id),
+        claims=build_account_claims(account, is_trial=kind == 'trial'),
+    )
+
+    set_refresh_cookie(response, refresh_token)
+    return {
+        'access_token': access_token,
+        'token_type': 'bearer',
+        'expires_in': ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
 # Adicione esta função no mesmo arquivo onde está login_user
 
 
@@ -157,6 +190,12 @@ async def logout_user(request: Request):
     # Verifica se há um usuário logado
     current_user = await get_current_user(request)
 
+    # Encerra a família do refresh token (se o cliente enviou)
+    await revoke_refresh_token(
+        request.headers.get('X-Refresh-Token')
+        or request.cookies.get(REFRESH_COOKIE_NAME)
+    )
+
     # Cria resposta de redirecionamento
     response = RedirectResponse(
         url='/login',
@@ -172,7 +211,7 @@ async def logout_user(request: Request):
     )
 
     # Remove outros cookies relacionados à autenticação se existirem
-    response.delete_cookie('refresh_token')
+    clear_refresh_cookie(response)
     response.delete_cookie('user_id')
 
     # Adiciona headers para evitar cache
@@ -195,6 +234,11 @@ async def logout_user_api(request: Request):
 
     current_user = await get_current_user(request)
 
+    await revoke_refresh_token(
+        request.headers.get('X-Refresh-Token')
+        or request.cookies.get(REFRESH_COOKIE_NAME)
+    )
+
     response = JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -207,5 +251,6 @@ async def logout_user_api(request: Request):
     response.delete_cookie(
         key='access_token', httponly=True, secure=True, samesite='lax'
     )
+    clear_refresh_cookie(response)
 
     return response
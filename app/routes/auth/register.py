@@ -7,6 +7,7 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
+from app.core.admission import admit_auth_request
 from app.schemas.auth.schemas_register import CrateUser
 from app.service.auth.auth_register import SignupFreeTrial, create_account
 from app.service.jwt.depends import SystemUser, get_current_user
@@ -35,7 +36,11 @@ if not static_dir.exists():
 ########################################################################
 
 
-@router.post('/register', status_code=status.HTTP_201_CREATED)
+@router.post(
+    '/register',
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit_auth_request, scope='function')],
+)
 async def register(target: CrateUser):
     """Rota para registra uma empresa/salão"""
     data = {
@@ -1,11 +1,19 @@
+import json
 from datetime import date
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi import (APIRouter, Body, Depends, HTTPException, Query, Request,
+                     status)
+from fastapi.responses import StreamingResponse
 
 from app.controllers.agendame.appointments import Appointments
+from app.controllers.agendame.availability_stream import (
+    AVAILABILITY_STREAM_PING, availability_stream)
 from app.controllers.agendame.services import Services
-from app.service.jwt.depends import SystemUser, get_current_user
+from app.controllers.company.company_context import (CompanyContext,
+                                                      current_company,
+                                                      public_company,
+                                                      resolve_company_context)
 
 router = APIRouter(tags=['Cliente - Serviços e Agendamentos'])
 
@@ -17,6 +25,7 @@ router = APIRouter(tags=['Cliente - Serviços e Agendamentos'])
 @router.get('/services/{company_identifier}')
 async def list_services_for_customers(
     company_identifier: str,
+    company: CompanyContext = Depends(public_company),
     search_by: Optional[str] = Query(
         'auto',
         description="Como buscar a empresa: 'auto' (tenta slug, username, nome), 'slug', 'username', 'name'",
@@ -61,11 +70,7 @@ async def list_services_for_customers(
     - `/services/beleza-saloon?search_by=username&filter_by=duration_minutes&filter_value=30`
     """
     try:
-        import urllib.parse
-
-        decoded_identifier = urllib.parse.unquote(company_identifier)
-
-        services_domain = Services()
+        services_domain = Services(context=company)
 
         final_is_active = None if include_inactive else is_active
 
@@ -75,23 +80,17 @@ async def list_services_for_customers(
                 field.strip() for field in order_by.split(',') if field.strip()
             ]
 
-        services = await services_domain.get_services_by_identifier(
-            identifier=decoded_identifier,
-            search_type=search_by,  # type:ignore
+        services = await services_domain.get_public_services(
             query_by=filter_by,
             query_value=filter_value,
             is_active=final_is_active,
             order_by=order_by_list,
         )
 
-        company_info = await services_domain.get_company_info(
-            decoded_identifier, search_by
-        )   # type:ignore
-
         return {
-            'company': company_info.get('business_name', decoded_identifier),
-            'company_slug': company_info.get('business_slug'),
-            'company_username': company_info.get('username'),
+            'company': company.company.company_name(),
+            'company_slug': company.company.company_slug(),
+            'company_username': company.company.company_username(),
             'services': services,
             'total_services': len(services),
             'filters_applied': {
@@ -119,9 +118,7 @@ async def get_available_times(
     date: date = Query(
         ..., description='Data para consultar disponibilidade (YYYY-MM-DD)'
     ),
-    search_by: str = Query(
-        'auto', description='Tipo de busca: auto, slug, username, name'
-    ),
+    company: CompanyContext = Depends(public_company),
 ):
     """
     Consulta horários disponíveis para um serviço específico.
@@ -130,17 +127,11 @@ async def get_available_times(
     - `/services/meu-salao/available-times?service_id=1&date=2024-01-15`
     """
     try:
-        import urllib.parse
-
-        decoded_identifier = urllib.parse.unquote(company_identifier)
-
-        appointments_domain = Appointments()
+        appointments_domain = Appointments(context=company)
 
         available = await appointments_domain.get_available_times(
             service_id=service_id,
             target_date=date,
-            identifier=decoded_identifier,
-            search_type=search_by,
         )
 
         return available
@@ -155,6 +146,167 @@ async def get_available_times(
         )
 
 
+@router.get('/services/{company_identifier}/availability')
+async def get_availability(
+    company_identifier: str,
+    service_id: int = Query(..., description='ID do serviço'),
+    date_from: date = Query(
+        ..., alias='from', description='Primeira data (YYYY-MM-DD)'
+    ),
+    date_to: date = Query(
+        ..., alias='to', description='Última data, inclusive (YYYY-MM-DD)'
+    ),
+    company: CompanyContext = Depends(public_company),
+):
+    """
+    Consulta horários disponíveis de um serviço para vários dias de uma vez.
+
+    Usa uma única consulta de agendamentos para todo o intervalo, em vez
+    de uma chamada a /available-times por data.
+
+    **Exemplo:**
+    - `/services/meu-salao/availability?service_id=1&from=2024-01-15&to=2024-01-28`
+    """
+    try:
+        appointments_domain = Appointments(context=company)
+
+        return await appointments_domain.get_availability_range(
+            service_id=service_id,
+            start_date=date_from,
+            end_date=date_to,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f'Erro ao consultar disponibilidade: {str(e)}')
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Erro interno ao processar solicitação',
+        )
+
+
+@router.get('/services/{company_identifier}/next-available')
+async def get_next_available(
+    company_identifier: str,
+    service_id: int = Query(..., description='ID do serviço'),
+    count: int = Query(
+        1, ge=1, le=50, description='Quantidade de horários desejada'
+    ),
+    company: CompanyContext = Depends(public_company),
+):
+    """
+    Próximos horários livres de um serviço, a partir de hoje, até o
+    limite de dias de antecedência da empresa (max_booking_days).
+
+    **Exemplo:**
+    - `/services/meu-salao/next-available?service_id=1&count=3`
+    """
+    try:
+        appointments_domain = Appointments(context=company)
+
+        return await appointments_domain.get_next_available(
+            service_id=service_id,
+            count=count,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f'Erro ao buscar próximos horários: {str(e)}')
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Erro interno ao processar solicitação',
+        )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Mensagem Server-Sent Events"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f'event: {event}\ndata: {payload}\n\n'
+
+
+@router.get('/services/{company_identifier}/availability/stream')
+async def stream_available_times(
+    request: Request,
+    company_identifier: str,
+    service_id: int = Query(..., description='ID do serviço'),
+    date: date = Query(..., description='Data acompanhada (YYYY-MM-DD)'),
+    company: CompanyContext = Depends(public_company),
+):
+    """
+    Server-Sent Events com os horários livres de um serviço em uma data.
+
+    Envia `event: slots` ao conectar e sempre que um agendamento da data
+    é criado, remarcado, cancelado ou removido (mesmo formato de
+    /available-times). Comentários `: ping` mantêm a conexão viva.
+
+    **Exemplo:**
+    - `new EventSource('/services/meu-salao/availability/stream?service_id=1&date=2024-01-15')`
+    """
+    appointments_domain = Appointments(context=company)
+    tenant_key = company.tenant_key
+
+    async def load() -> Dict[str, Any]:
+        return await appointments_domain.get_available_times(
+            service_id=service_id, target_date=date
+        )
+
+    def snapshot():
+        # Uma consulta por mudança, compartilhada pelas conexões
+        version = availability_stream.version(tenant_key, date)
+        return availability_stream.snapshot(
+            (tenant_key, date, service_id, version), load
+        )
+
+    # Inscreve antes do primeiro cálculo: nenhuma mudança se perde
+    subscription = availability_stream.subscribe(tenant_key, date)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Muitas conexões abertas, tente novamente',
+        )
+    try:
+        # Serviço inexistente etc. vira erro HTTP normal (antes do stream)
+        current = await snapshot()
+    except BaseException:
+        availability_stream.unsubscribe(subscription)
+        raise
+
+    async def events() -> AsyncIterator[str]:
+        nonlocal current
+        try:
+            yield _sse('slots', current)
+            while not subscription.closed:
+                changed = await subscription.wait(AVAILABILITY_STREAM_PING)
+                if subscription.closed or await request.is_disconnected():
+                    break
+                if not changed:
+                    yield ': ping\n\n'
+                    continue
+                try:
+                    latest = await snapshot()
+                except HTTPException as e:
+                    # Serviço removido/desativado: encerra o stream
+                    yield _sse('closed', {'detail': e.detail})
+                    break
+                if latest != current:
+                    current = latest
+                    yield _sse('slots', current)
+        finally:
+            availability_stream.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Nginx: não bufferizar o stream
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
 @router.post('/services/{company_identifier}/book')
 async def book_appointment(
     company_identifier: str,
@@ -192,9 +344,11 @@ async def book_appointment(
     try:
         import urllib.parse
 
-        decoded_identifier = urllib.parse.unquote(company_identifier)
-
-        appointments_domain = Appointments()
+        # search_by vem no corpo: resolve a empresa aqui mesmo
+        company = await resolve_company_context(
+            urllib.parse.unquote(company_identifier), search_by
+        )
+        appointments_domain = Appointments(context=company)
 
         result = await appointments_domain.create_appointment(
             service_id=service_id,
@@ -202,8 +356,6 @@ async def book_appointment(
             appointment_time=appointment_time,
             client_name=client_name,
             client_phone=client_phone,
-            identifier=decoded_identifier,
-            search_type=search_by,
             notes=notes,
         )
 
@@ -226,7 +378,7 @@ async def book_appointment(
 
 @router.get('/company/appointments', tags=['Empresa - Agendamentos'])
 async def list_company_appointments(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
     start_date: Optional[date] = Query(
         None, description='Data inicial (YYYY-MM-DD)'
     ),
@@ -245,7 +397,7 @@ async def list_company_appointments(
     - `/company/appointments?status=scheduled`
     """
     try:
-        appointments_domain = Appointments(target_company_id=current_user.id)
+        appointments_domain = Appointments(context=company)
 
         appointments = await appointments_domain.get_company_appointments(
             start_date=start_date, end_date=end_date, status=status
@@ -266,7 +418,7 @@ async def list_company_appointments(
 # Rotas adicionais para empresa (se precisar)
 @router.get('/company/services', tags=['Empresa - Serviços'])
 async def list_company_services(
-    current_user: SystemUser = Depends(get_current_user),
+    company: CompanyContext = Depends(current_company),
     is_active: Optional[bool] = Query(
         None, description='Filtrar por status ativo'
     ),
@@ -276,7 +428,7 @@ async def list_company_services(
     Requer autenticação.
     """
     try:
-        services_domain = Services(target_company_id=current_user.id)
+        services_domain = Services(context=company)
 
         services = await services_domain.get_services(is_active=is_active)
 
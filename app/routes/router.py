@@ -44,6 +44,8 @@ def register_routes(app: FastAPI) -> None:
     from app.routes.agendame_company.info_company import router as info_company
     from app.routes.agendame_company.register_services import \
         router as create_services_router
+    from app.routes.agendame_company.resources import \
+        router as resources_router
     # DADOS QUE SÂO FORNECIDO PARA O USUARIO CLIENTE
     from app.routes.customers.public_services import router as public_routes
 
@@ -52,6 +54,8 @@ def register_routes(app: FastAPI) -> None:
     # Agendamento no salão
     app.include_router(appointments_router)
     app.include_router(info_company)
+    # Profissionais, cadeiras, salas
+    app.include_router(resources_router)
 
     # PARA CLIENTES
     app.include_router(public_routes)
@@ -1,8 +1,11 @@
 # health.py
 import asyncio
 from datetime import datetime, timedelta
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.service.jwt.depends import SystemUser, get_current_user
 
 # Define o tempo de início da aplicação
 START_TIME = datetime.utcnow()
@@ -45,3 +48,41 @@ async def keep_alive():
         'timestamp': datetime.utcnow().isoformat(),
         'uptime': str(datetime.utcnow() - START_TIME),
     }
+
+
+@router.get('/health/caches')
+async def cache_stats(
+    current_user: Optional[SystemUser] = Depends(get_current_user),
+):
+    """
+    Contadores dos caches em memória (para ajustar tamanhos/TTL).
+    Exige login: fora do prefixo público /health no AuthMiddleware.
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Não autenticado',
+        )
+    from app.controllers.agendame.availability_cache import availability_cache
+    from app.controllers.agendame.availability_stream import \
+        availability_stream
+    from app.controllers.agendame.schedule import schedule_cache
+    from app.controllers.company.identifier_index import company_index
+    from app.controllers.company.slug_filter import known_slugs
+    from app.core.admission import auth_admission
+    from app.service.auth.trial_sweeper import trial_sweeper
+    from app.service.jwt.jwt_decode_token import verified_token_cache
+    from app.service.jwt.principal_cache import principal_cache
+
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'principal': principal_cache.stats(),
+        'verified_tokens': verified_token_cache.stats(),
+        'auth_admission': auth_admission.stats(),
+        'trial_sweeper': trial_sweeper.stats(),
+        'company_index': company_index.stats(),
+        'known_slugs': known_slugs.stats(),
+        'schedule': schedule_cache.stats(),
+        'availability': availability_cache.stats(),
+        'availability_stream': availability_stream.stats(),
+    }
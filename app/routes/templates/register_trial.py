@@ -2,9 +2,10 @@
 import os
 from pathlib import Path
 
-from fastapi import APIRouter, Request, status
+from fastapi import APIRouter, Depends, Request, status
 from fastapi.responses import HTMLResponse, JSONResponse
 
+from app.core.admission import admit_auth_request
 from app.core.config import templates
 from app.schemas.auth.schemas_register import CrateUser
 from app.service.auth.auth_register import SignupFreeTrial, create_account
@@ -25,7 +26,11 @@ async def get_login_page(request: Request):
 ##################
 # Rota responsável por criar conta de sete dias grátis
 ##################
-@router.post('/auth/signup/free-trial', status_code=status.HTTP_201_CREATED)
+@router.post(
+    '/auth/signup/free-trial',
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit_auth_request, scope='function')],
+)
 async def signup_trial(target: CrateUser):
 
     # Podemos remover isso depois
@@ -0,0 +1,21 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+ResourceKind = Literal['staff', 'chair', 'room']
+
+
+class ResourceCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    kind: ResourceKind = 'staff'
+    is_active: bool = True
+    # Serviços que o recurso atende
+    service_ids: List[int] = Field(default_factory=list)
+
+
+class ResourceUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    kind: Optional[ResourceKind] = None
+    is_active: Optional[bool] = None
+    # Substitui a lista inteira quando informado
+    service_ids: Optional[List[int]] = None
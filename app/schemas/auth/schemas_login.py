@@ -17,3 +17,15 @@ class LoginResponse(BaseModel):
         arbitrary_types_allowed = (
             True  # Pode conter cookies ou outros dados adicionais
         )
+
+
+class RefreshRequest(BaseModel):
+    # Opcional: navegadores enviam o cookie HttpOnly refresh_token
+    refresh_token: Optional[str] = None
+
+
+class RefreshResponse(BaseModel):
+    access_token: str
+    token_type: str = 'bearer'
+    # Validade do access token, em segundos
+    expires_in: int
@@ -0,0 +1,102 @@
+# app/service/auth/account_lookup.py
+"""
+Busca de conta para login em uma única consulta.
+
+Procura o identificador (email ou username) em `users` e `trial` com um
+UNION ALL e devolve a melhor correspondência, na mesma prioridade do
+fluxo antigo: User por email → User por username → TrialAccount por email.
+Email é comparado pelo hash de busca indexado (sem diferenciar maiúsculas).
+"""
+
+from datetime import timezone
+from typing import Optional
+
+from tortoise import Tortoise
+
+from app.models.trial import TrialAccount
+from app.utils.hashed_email import create_email_search_hash
+
+_ACCOUNT_COLUMNS = (
+    'id, username, email, password, business_name, business_slug, '
+    'phone, claims_version, subscription_active, subscription_end'
+)
+
+_LOOKUP_SQL = (
+    'SELECT * FROM ('
+    "SELECT 'user' AS kind, "
+    'CASE WHEN email_search = {p1} THEN 0 ELSE 1 END AS rank, '
+    f'{_ACCOUNT_COLUMNS} FROM users '
+    'WHERE email_search = {p2} OR username = {p3} '
+    'UNION ALL '
+    f"SELECT 'trial' AS kind, 2 AS rank, {_ACCOUNT_COLUMNS} FROM trial "
+    'WHERE email_search = {p4}'
+    ') AS accounts ORDER BY rank LIMIT 1'
+)
+
+
+class LoginAccount:
+    """Conta encontrada no login (User ou TrialAccount) e status do trial"""
+
+    __slots__ = (
+        'kind',
+        'id',
+        'username',
+        'email',
+        'password',
+        'business_name',
+        'business_slug',
+        'phone',
+        'claims_version',
+        'subscription_active',
+        'subscription_end',
+    )
+
+    def __init__(self, row: dict) -> None:
+        for name in self.__slots__:
+            setattr(self, name, row.get(name))
+
+        # Consultas cruas não passam pela conversão de campos do ORM
+        fields_map = TrialAccount._meta.fields_map
+        self.subscription_active = fields_map[
+            'subscription_active'
+        ].to_python_value(self.subscription_active)
+        self.subscription_end = fields_map[
+            'subscription_end'
+        ].to_python_value(self.subscription_end)
+        if (
+            self.subscription_end is not None
+            and self.subscription_end.tzinfo is None
+        ):
+            self.subscription_end = self.subscription_end.replace(
+                tzinfo=timezone.utc
+            )
+
+    @property
+    def is_trial(self) -> bool:
+        return self.kind == 'trial'
+
+    def trial_expired(self) -> bool:
+        """True se for trial já marcado como expirado pelo trial_sweeper"""
+        return self.is_trial and not self.subscription_active
+
+
+async def find_login_account(identifier: str) -> Optional[LoginAccount]:
+    """Localiza a conta por email/username nas duas tabelas (1 consulta)"""
+    if not identifier:
+        return None
+
+    db = Tortoise.get_connection('default')
+    search_hash = create_email_search_hash(identifier)
+
+    if db.capabilities.dialect == 'sqlite':
+        sql = _LOOKUP_SQL.format(p1='?', p2='?', p3='?', p4='?')
+        values = [search_hash, search_hash, identifier, search_hash]
+    else:
+        sql = _LOOKUP_SQL.format(p1='$1', p2='$1', p3='$2', p4='$1')
+        values = [search_hash, identifier]
+
+    rows = await db.execute_query_dict(sql, values)
+    if not rows:
+        return None
+
+    return LoginAccount(rows[0])
@@ -6,103 +6,66 @@ from fastapi.responses import RedirectResponse
 
 from app.models.trial import TrialAccount
 from app.models.user import User
+from app.service.auth.account_lookup import LoginAccount, find_login_account
 from app.service.auth.auth_register import SignupFreeTrial
 from app.schemas.auth.schemas_login import LoginResponse
-from app.service.jwt.auth import (create_access_token, create_refresh_token,
-                                  verify_password)
+from app.service.jwt.auth import (ACCESS_TOKEN_EXPIRE_MINUTES,
+                                  build_account_claims, create_access_token,
+                                  get_hashed_password_async,
+                                  password_needs_rehash, verify_password_async)
+from app.service.jwt.refresh_tokens import issue_refresh_token
 
 load_dotenv()
 
 
-async def checking_account(
-    request: Optional[Request] = None, target: Dict[str, Any] = None
-):
-    """Versão que funciona com ou sem Request"""
-    try:
-        if target is None:
-            return None
-
-        username_or_email = target.get('username') or target.get('email')
-        password = target.get('password')
-
-        if not username_or_email or not password:
-            return None
-
-        # Buscar usuário por email
-        user = await User.filter(email=username_or_email).first()
-
-        # Se não encontrar por email, buscar por username
-        if user is None:
-            user = await User.filter(username=username_or_email).first()
-
-        if user is None:
-            return None
-
-        # Verifica a senha
-        if not verify_password(str(password), user.password):
-            return None
-
-        # Gera tokens
-        user_id_str = str(user.id)
-        access_token = create_access_token(user_id_str)
-        refresh_token = create_refresh_token(user_id_str)
-
-        # Se tiver um Request, cria resposta com redirecionamento
-        if request:
-            next_url = request.query_params.get('next', '/agendame/dashboard')
-            response = RedirectResponse(
-                url=next_url, status_code=status.HTTP_303_SEE_OTHER
-            )
-
-            response.set_cookie(
-                key='access_token',
-                value=access_token,
-                httponly=True,
-                max_age=3600 * 24 * 7,  # 7 dias
-                secure=True,
-                samesite='none' if request.url.scheme == 'https' else 'lax'
-            )
-        else:
-            # Se não tiver Request, cria uma resposta vazia
-            response = None
-
-        # Retorna LoginResponse
-        return {
-            'access_token': access_token,
-            'refresh_token': refresh_token,
-            'token_type': 'bearer',
-            'user_id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'business_name': user.business_name,
-            'slug': user.business_slug,
-            'response': response,
-            'is_trial': False,
-        }
-
-    except HTTPException as e:
-        # Se tiver Request, retorna RedirectResponse
-        print(f'Erro no login: {e.detail}')
-        if request:
-            return RedirectResponse(
-                url=f'/login',
-                status_code=status.HTTP_303_SEE_OTHER,
-            )
-        # Se não tiver Request, levanta a exceção
-        raise
+def _login_response(
+    request: Optional[Request], access_token: str
+) -> Optional[RedirectResponse]:
+    """Resposta com redirecionamento e cookie (apenas se houver Request)"""
+    if not request:
+        return None
+
+    next_url = request.query_params.get('next', '/agendame/dashboard')
+    response = RedirectResponse(
+        url=next_url, status_code=status.HTTP_303_SEE_OTHER
+    )
+
+    response.set_cookie(
+        key='access_token',
+        value=access_token,
+        httponly=True,
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # validade do token
+        secure=True,
+        samesite='none' if request.url.scheme == 'https' else 'lax',
+    )
+    return response
+
+
+async def _upgrade_password_hash(account: LoginAccount, password: str) -> None:
+    """
+    Refaz o hash com o custo atual do bcrypt quando o salvo está
+    desatualizado. Só roda depois de uma senha verificada com sucesso.
+    """
+    if not password_needs_rehash(account.password):
+        return
 
+    try:
+        new_hash = await get_hashed_password_async(password)
+        model = TrialAccount if account.is_trial else User
+        await model.filter(id=account.id).update(password=new_hash)
+        account.password = new_hash
     except Exception as e:
-        print(f'Erro inesperado: {e}')
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail='Erro interno no servidor',
-        )
+        # Falha aqui não impede o login; tenta de novo no próximo
+        print(f'Erro ao atualizar hash da senha: {e}')
 
 
-async def checking_account_trial(
+async def checking_any_account(
     request: Optional[Request] = None, target: Dict[str, Any] = None
 ):
-    """Versão que funciona com ou sem Request para trial"""
+    """
+    Login de User ou TrialAccount.
+    Custa uma consulta (find_login_account) e uma verificação de senha.
+    """
     try:
         if target is None:
             return None
@@ -113,66 +76,67 @@ async def checking_account_trial(
         if not username_or_email or not password:
             return None
 
-        # Buscar usuário por email
-        user = await TrialAccount.filter(email=username_or_email).first()
+        # Busca nas duas tabelas, por email e username, de uma só vez
+        account: Optional[LoginAccount] = await find_login_account(
+            username_or_email
+        )
 
-        if user is None:
+        if account is None:
             return None
 
+        # Trial vencido: flag mantida pelo trial_sweeper
+        if account.trial_expired():
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Sua conta de teste de 7 dias expirou. Por favor, registre-se novamente.',
+            )
+
         # Verifica a senha
-        if not verify_password(str(password), user.password):
+        if not await verify_password_async(str(password), account.password):
             return None
 
-        # Gera tokens
-        user_id_str = str(user.id)
-        access_token = create_access_token(user_id_str)
-        refresh_token = create_refresh_token(user_id_str)
-
-        # Buscar tempo restante da conta trial
-        days_remaining = SignupFreeTrial(data=None)
-        days = await days_remaining.count_days_remaining(account_target_id=user.id)
-
-        # Se tiver um Request, cria resposta com redirecionamento
-        if request:
-            next_url = request.query_params.get('next', '/agendame/dashboard')
-            response = RedirectResponse(
-                url=next_url, status_code=status.HTTP_303_SEE_OTHER
-            )
+        # Custo do bcrypt mudou desde o cadastro → regrava o hash
+        await _upgrade_password_hash(account, str(password))
 
-            response.set_cookie(
-                key='access_token',
-                value=access_token,
-                httponly=True,
-                max_age=3600 * 24 * 7,  # 7 dias
-                secure=True,
-                samesite='none' if request.url.scheme == 'https' else 'lax',
-
-            )
-        else:
-            response = None
+        # Gera tokens
+        user_id_str = str(account.id)
+        access_token = create_access_token(
+            user_id_str,
+            claims=build_account_claims(account, is_trial=account.is_trial),
+        )
+        # Refresh token opaco e de uso único (ver /auth/refresh)
+        refresh_token = await issue_refresh_token(account.kind, account.id)
 
-        # Retorna LoginResponse
-        return {
+        result = {
             'access_token': access_token,
             'refresh_token': refresh_token,
             'token_type': 'bearer',
-            'user_id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'business_name': user.business_name,
-            'slug': user.business_slug,
-            'response': response,
-            'is_trial': True,
-            'days_remaining': days,
+            'user_id': account.id,
+            'username': account.username,
+            'email': account.email,
+            'business_name': account.business_name,
+            'slug': account.business_slug,
+            'response': _login_response(request, access_token),
+            'is_trial': account.is_trial,
         }
 
+        # Tempo restante da conta trial (sem nova consulta)
+        if account.is_trial:
+            result['days_remaining'] = SignupFreeTrial.days_until(
+                account.subscription_end
+            )
+
+        return result
+
     except HTTPException as e:
-        print(f'Erro no login trial: {e.detail}')
+        # Se tiver Request, retorna RedirectResponse
+        print(f'Erro no login: {e.detail}')
         if request:
             return RedirectResponse(
                 url=f'/login',
                 status_code=status.HTTP_303_SEE_OTHER,
             )
+        # Se não tiver Request, levanta a exceção
         raise
 
     except Exception as e:
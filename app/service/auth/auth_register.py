@@ -3,12 +3,41 @@ from re import search
 from typing import Any, Dict
 
 from fastapi import HTTPException, status
+from tortoise.exceptions import IntegrityError
 
+from app.controllers.company.identifier_index import company_index
+from app.controllers.company.slug_filter import known_slugs
 from app.models.trial import TrialAccount
 from app.models.user import User
-from app.service.jwt.auth import get_hashed_password, verify_password
+from app.service.jwt.auth import get_hashed_password_async
+from app.service.jwt.claims_version import claims_versions
+from app.service.jwt.principal_cache import principal_cache
 from app.utils.hashed_email import (create_email_search_hash, get_hashed_email,
                                     verify_email)
+from app.utils.normalize_company_datas import company_slug_search
+
+
+def _slug_taken(slug: Any) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f'The business link "{slug}" is already in use.',
+    )
+
+
+async def _ensure_slug_available(slug: Any) -> None:
+    """
+    409 se outra empresa, User ou TrialAccount, já usa o mesmo slug
+    normalizado (slug_search ignora maiúsculas, acentos e hífens:
+    'corte-supremo' e 'cortesupremo' são o mesmo endereço público).
+    As duas tabelas dividem o mesmo espaço de links públicos: o índice
+    único é por tabela e o company_index resolve User antes de Trial.
+    """
+    slug_search = company_slug_search(slug)
+    if not slug_search:
+        return
+    for model in (User, TrialAccount):
+        if await model.filter(slug_search=slug_search).exists():
+            raise _slug_taken(slug)
 
 
 async def create_account(target):
@@ -21,26 +50,44 @@ async def create_account(target):
                 detail='Fill in all the fields.',
             )
 
-        user = await User.filter(email=target.get('email')).exists()
+        email_search = create_email_search_hash(str(target.get('email')))
+        user = await User.filter(email_search=email_search).exists()
         if user:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail='This email address is already registered.',
             )
 
+        await _ensure_slug_available(target.get('business_slug'))
+
         if isinstance(target, dict):
 
-            await User.create(
+            account = await User.create(
                 username=target.get('username'),
                 email=target.get('email'),
-                password=get_hashed_password(str(target.get('password'))),
+                email_search=email_search,
+                password=await get_hashed_password_async(
+                    str(target.get('password'))
+                ),
                 business_name=target.get('business_name'),
                 business_type=target.get('business_type'),
                 phone=target.get('phone'),
                 whatsapp=target.get('whatsapp'),
                 business_slug=target.get('business_slug'),
+                slug_search=company_slug_search(target.get('business_slug')),
             )
 
+            # Um novo User tem prioridade sobre um trial de mesmo id
+            principal_cache.invalidate(account.id)
+            claims_versions.forget('user', account.id)
+            identifiers = (
+                account.business_slug,
+                account.username,
+                account.business_name,
+            )
+            company_index.invalidate_identifiers(identifiers)
+            known_slugs.add(identifiers)
+
             return {
                 'username': target.get('username'),
                 'email': target.get('email'),
@@ -48,6 +95,15 @@ async def create_account(target):
                 'is_trial': True,
             }
 
+    except HTTPException:
+        raise
+    except IntegrityError:
+        # Email ou slug gravado por outro cadastro entre a verificação
+        # e o INSERT (índices únicos)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='This email address or business link is already registered.',
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,8 +143,18 @@ class SignupFreeTrial:
         if not search_account:
             return 0
 
+        return self.days_until(search_account.subscription_end)
+
+    @staticmethod
+    def days_until(subscription_end) -> int:
+        """Dias inteiros até subscription_end (0 se já passou)"""
+        if subscription_end is None:
+            return 0
+
+        if subscription_end.tzinfo is None:
+            subscription_end = subscription_end.replace(tzinfo=timezone.utc)
+
         date_now = datetime.now(timezone.utc)
-        subscription_end = search_account.subscription_end
 
         if date_now >= subscription_end:
             return 0
@@ -96,40 +162,6 @@ class SignupFreeTrial:
         delta = subscription_end - date_now
         return delta.days
 
-    async def remove_account_after_trial(self, target_by_email: str) -> bool:
-        """
-        remove_account_after_trial: Responsável por remover conta após o período de sete dias grátis
-
-        Em modo de teste: nunca remove (porque faltam 4 dias)
-        Em modo normal: verifica data real
-        """
-
-        # MODO DE TESTE: Nunca remove porque faltam 4 dias
-        if self.test_mode:
-            return False
-
-        try:
-            account = await TrialAccount.filter(email=target_by_email).first()
-
-            date_now = datetime.now(timezone.utc)
-
-            if account and account.subscription_end:
-                # DATA DE TESTE: 4 dias no futuro
-                search_date = datetime.now(timezone.utc) + timedelta(days=4)
-
-                if date_now > search_date.replace(tzinfo=timezone.utc):
-                    await account.delete()
-                    return True
-                return False
-
-            return False
-
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f'Error: {str(e)}',
-            )
-
     # Método para ativar/desativar modo de teste
     def set_test_mode(self, enabled: bool = True, days_remaining: int = 4):
         """
@@ -150,8 +182,11 @@ class SignupFreeTrial:
                     detail='Fill in all the fields.',
                 )
 
+            email_search = create_email_search_hash(
+                str(self.data.get('email'))
+            )
             user = await TrialAccount.filter(
-                email=self.data.get('email')
+                email_search=email_search
             ).exists()
             if user:
                 raise HTTPException(
@@ -159,6 +194,8 @@ class SignupFreeTrial:
                     detail='This email address is already registered.',
                 )
 
+            await _ensure_slug_available(self.data.get('business_slug'))
+
             if isinstance(self.data, dict):
                 now_utc = datetime.now(timezone.utc)
                 subscription_start = now_utc
@@ -167,7 +204,8 @@ class SignupFreeTrial:
                 account = await TrialAccount.create(
                     username=self.data.get('username'),
                     email=self.data.get('email'),
-                    password=get_hashed_password(
+                    email_search=email_search,
+                    password=await get_hashed_password_async(
                         str(self.data.get('password'))
                     ),
                     business_name=self.data.get('business_name'),
@@ -175,9 +213,21 @@ class SignupFreeTrial:
                     phone=self.data.get('phone'),
                     whatsapp=self.data.get('whatsapp'),
                     business_slug=self.data.get('business_slug'),
+                    slug_search=company_slug_search(
+                        self.data.get('business_slug')
+                    ),
                     subscription_start=subscription_start,
                     subscription_end=subscription_end,
                 )
+                principal_cache.invalidate(account.id)
+                claims_versions.forget('trial', account.id)
+                identifiers = (
+                    account.business_slug,
+                    account.username,
+                    account.business_name,
+                )
+                company_index.invalidate_identifiers(identifiers)
+                known_slugs.add(identifiers)
 
                 # No modo de teste, retorna 4 dias mesmo para conta nova
                 days = self.test_days_remaining if self.test_mode else await self.count_days_remaining(
@@ -192,6 +242,15 @@ class SignupFreeTrial:
                     'is_trial': True,
                 }
 
+        except HTTPException:
+            raise
+        except IntegrityError:
+            # Email ou slug gravado por outro cadastro entre a verificação
+            # e o INSERT (índices únicos)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail='This email address or business link is already registered.',
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
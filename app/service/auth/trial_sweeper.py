@@ -0,0 +1,139 @@
+# app/service/auth/trial_sweeper.py
+"""
+Expiração das contas trial em segundo plano.
+
+Em vez de verificar/remover trials vencidos a cada login, uma tarefa
+iniciada no lifespan (main.py) percorre periodicamente as contas com
+`subscription_end` vencido (índice subscription_active + subscription_end)
+e as marca como expiradas em lotes. O login só lê `subscription_active`.
+
+A mesma tarefa apaga refresh tokens expirados ou revogados
+(`purge_refresh_tokens`), para a tabela não crescer sem limite.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from tortoise.expressions import F
+
+from app.controllers.company.identifier_index import company_index
+from app.models.trial import TrialAccount
+from app.service.jwt.claims_version import claims_versions
+from app.service.jwt.principal_cache import principal_cache
+from app.service.jwt.refresh_tokens import purge_refresh_tokens
+
+load_dotenv()
+
+TRIAL_SWEEP_INTERVAL = int(os.getenv('TRIAL_SWEEP_INTERVAL', '300'))
+TRIAL_SWEEP_BATCH = int(os.getenv('TRIAL_SWEEP_BATCH', '500'))
+
+
+class TrialExpirySweeper:
+    """Tarefa periódica que expira trials vencidos em lotes"""
+
+    def __init__(self, interval: int, batch_size: int) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.expired_total = 0
+        self.purged_refresh_tokens = 0
+        self.last_run: Optional[datetime] = None
+
+    async def _expire_batch(self, now: datetime) -> List[int]:
+        """Expira até batch_size contas vencidas. Retorna os ids"""
+        ids = await (
+            TrialAccount.filter(
+                subscription_active=True, subscription_end__lte=now
+            )
+            .order_by('subscription_end')
+            .limit(self.batch_size)
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return []
+
+        # claims_version + 1: tokens emitidos antes deixam de valer
+        await TrialAccount.filter(
+            id__in=ids, subscription_active=True
+        ).update(
+            subscription_active=False,
+            claims_version=F('claims_version') + 1,
+        )
+
+        for account_id in ids:
+            principal_cache.invalidate(account_id)
+            claims_versions.forget('trial', account_id)
+        company_index.invalidate_companies(ids, is_trial=True)
+
+        return ids
+
+    async def sweep_once(self) -> int:
+        """Expira todos os trials vencidos até agora. Retorna o total"""
+        now = datetime.now(timezone.utc)
+        total = 0
+
+        while True:
+            ids = await self._expire_batch(now)
+            total += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            # Cede o event loop entre lotes
+            await asyncio.sleep(0)
+
+        self.expired_total += total
+        self.last_run = now
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                expired = await self.sweep_once()
+                if expired:
+                    print(f'[OK] Trials expirados: {expired}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'[ERRO] Falha ao expirar trials: {e}')
+
+            try:
+                purged = await purge_refresh_tokens()
+                self.purged_refresh_tokens += purged
+                if purged:
+                    print(f'[OK] Refresh tokens removidos: {purged}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'[ERRO] Falha ao remover refresh tokens: {e}')
+
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'batch_size': self.batch_size,
+            'expired_total': self.expired_total,
+            'purged_refresh_tokens': self.purged_refresh_tokens,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+trial_sweeper = TrialExpirySweeper(
+    interval=TRIAL_SWEEP_INTERVAL, batch_size=TRIAL_SWEEP_BATCH
+)
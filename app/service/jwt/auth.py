@@ -1,9 +1,12 @@
 # auth_jwt.py
 
+import asyncio
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, Optional, Union
 from zoneinfo import ZoneInfo
 
 import bcrypt
@@ -19,6 +22,11 @@ JWT_ALGORITHM = os.getenv('ALGORITHM')
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 JWT_REFRESH_SECRET_KEY = os.getenv('JWT_REFRESH_SECRET_KEY')
 
+# Access token com claims da conta (dispensa consulta ao banco por requisição)
+ACCESS_TOKEN_EMBED_CLAIMS = (
+    os.getenv('ACCESS_TOKEN_EMBED_CLAIMS', 'true').lower() == 'true'
+)
+
 
 PASSWORD_CONTEXT = CryptContext(
     schemes=[str(os.getenv('schemes_PASSWORD'))],
@@ -29,6 +37,74 @@ PASSWORD_CONTEXT = CryptContext(
 # Instanciação do logger
 logger = logging.getLogger(__name__)
 
+# Pool dedicado ao bcrypt: hash/verify não bloqueiam o event loop
+BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', '2'))
+_password_executor = ThreadPoolExecutor(
+    max_workers=BCRYPT_POOL_SIZE, thread_name_prefix='bcrypt'
+)
+
+# Custo do bcrypt: calibrado na inicialização para o tempo alvo por hash.
+# BCRYPT_ROUNDS fixa o custo e dispensa a calibração.
+BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', '250'))
+BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', '10'))
+BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', '15'))
+_bcrypt_rounds = int(os.getenv('BCRYPT_ROUNDS', '12'))
+
+
+def get_bcrypt_rounds() -> int:
+    return _bcrypt_rounds
+
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS) -> int:
+    """
+    Escolhe o maior custo cujo hash cabe em `target_ms` neste hardware.
+    Cada round a mais dobra o tempo, então basta medir o custo mínimo
+    e confirmar a estimativa com uma medição no custo escolhido.
+    """
+    global _bcrypt_rounds
+
+    if os.getenv('BCRYPT_ROUNDS'):
+        return _bcrypt_rounds
+
+    def measure(rounds: int) -> float:
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds=rounds))
+        return (time.perf_counter() - start) * 1000
+
+    rounds = BCRYPT_MIN_ROUNDS
+    elapsed = measure(rounds)
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed * 2 <= target_ms:
+        rounds += 1
+        elapsed *= 2
+
+    # Confirma a estimativa (o tempo real pode fugir do dobro exato)
+    if rounds > BCRYPT_MIN_ROUNDS and measure(rounds) > target_ms * 1.5:
+        rounds -= 1
+
+    _bcrypt_rounds = rounds
+    return rounds
+
+
+def bcrypt_cost(hashed_password: str) -> Optional[int]:
+    """Custo gravado no hash ($2b$<custo>$...) ou None se não for bcrypt"""
+    parts = str(hashed_password).split('$')
+    if len(parts) < 4 or not parts[1].startswith('2'):
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True se o hash é mais fraco que o custo atual (ou não é bcrypt).
+    Custo maior nunca é rebaixado: uma calibração menor num host mais
+    lento não regrava hashes, e hosts diferentes não alternam o custo.
+    """
+    cost = bcrypt_cost(hashed_password)
+    return cost is None or cost < _bcrypt_rounds
+
 
 def get_hashed_password(password: str) -> str:
     try:
@@ -38,7 +114,9 @@ def get_hashed_password(password: str) -> str:
             password_bytes = password_bytes[:72]
 
         # Usar bcrypt diretamente
-        hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
+        hashed = bcrypt.hashpw(
+            password_bytes, bcrypt.gensalt(rounds=_bcrypt_rounds)
+        )
         return hashed.decode('utf-8')
     except Exception as e:
         raise Exception(f'Error hashing password: {str(e)}')
@@ -74,11 +152,47 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             raise Exception(f'Error verifying password: {str(e)}')
 
 
+async def get_hashed_password_async(password: str) -> str:
+    """get_hashed_password executado no pool do bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, get_hashed_password, password
+    )
+
+
+async def verify_password_async(
+    plain_password: str, hashed_password: str
+) -> bool:
+    """verify_password executado no pool do bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def calibrate_bcrypt_rounds_async() -> int:
+    """calibrate_bcrypt_rounds executado no pool do bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, calibrate_bcrypt_rounds
+    )
+
+
+def shutdown_password_executor() -> None:
+    """Encerra o pool do bcrypt (shutdown da aplicação)"""
+    _password_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(
     subject: Union[str, Any],
     expires_delta: Optional[int] = ACCESS_TOKEN_EXPIRE_MINUTES,
+    claims: Optional[Dict[str, Any]] = None,
 ) -> str:
-    """Cria um Access Token JWT assinado."""
+    """
+    Cria um Access Token JWT assinado.
+    Se `claims` for informado (ver build_account_claims), o token carrega
+    os dados da conta e pode ser validado sem consultar o banco.
+    """
     expire = (
         datetime.now(ZoneInfo('America/Sao_Paulo'))
         + timedelta(minutes=expires_delta)
@@ -88,9 +202,33 @@ def create_access_token(
     )
 
     to_encode = {'exp': expire, 'sub': str(subject)}
+    if claims and ACCESS_TOKEN_EMBED_CLAIMS:
+        to_encode.update(claims)
     return jwt.encode(to_encode, str(JWT_SECRET_KEY), str(JWT_ALGORITHM))
 
 
+def build_account_claims(account: Any, is_trial: bool) -> Dict[str, Any]:
+    """
+    Claims da conta para o access token autocontido.
+    'ver' é a claims_version da conta no momento da emissão.
+    """
+    business_slug = account.business_slug or account.username
+    if is_trial:
+        name = account.username
+    else:
+        name = account.business_name or account.username
+
+    return {
+        'kind': 'trial' if is_trial else 'user',
+        'username': account.username,
+        'email': account.email,
+        'phone': account.phone or '',
+        'name': name,
+        'slug': business_slug,
+        'ver': account.claims_version,
+    }
+
+
 def create_refresh_token(
     subject: Union[str, Any], expires_delta: Optional[int] = None
 ) -> str:
@@ -0,0 +1,70 @@
+# app/service/jwt/claims_version.py
+
+import os
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from app.models.trial import TrialAccount
+from app.models.user import User
+
+load_dotenv()
+
+CLAIMS_VERSION_CACHE_SIZE = int(
+    os.getenv('CLAIMS_VERSION_CACHE_SIZE', '65536')
+)
+# Segundos até reler a versão do banco: limite para outro worker perceber
+# uma revogação (ex.: trial expirado pelo trial_sweeper de outro processo)
+CLAIMS_VERSION_CACHE_TTL = int(os.getenv('CLAIMS_VERSION_CACHE_TTL', '30'))
+
+# Marca contas removidas (nenhum token delas deve ser aceito)
+DELETED = -1
+
+
+class ClaimsVersionRegistry:
+    """
+    Versão atual das claims de cada conta, mantida em memória.
+
+    Um access token com claims embutidas só é aceito sem consulta ao banco
+    se o seu 'ver' for igual à versão registrada aqui. Quem altera uma
+    conta incrementa claims_version no banco (ex.: trial_sweeper); cada
+    processo relê a versão a cada CLAIMS_VERSION_CACHE_TTL segundos, e o
+    próprio processo que alterou descarta a sua na hora
+    (forget/mark_deleted).
+    """
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._versions: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _model(kind: str):
+        return TrialAccount if kind == 'trial' else User
+
+    async def get(self, kind: str, account_id: int) -> Optional[int]:
+        """Versão atual da conta ou None se ela não existir mais"""
+        key: Tuple[str, int] = (kind, account_id)
+        version = self._versions.get(key)
+
+        if version is None:
+            version = (
+                await self._model(kind)
+                .filter(id=account_id)
+                .first()
+                .values_list('claims_version', flat=True)
+            )
+            version = DELETED if version is None else version
+            self._versions[key] = version
+
+        return None if version == DELETED else version
+
+    def mark_deleted(self, kind: str, account_id: int) -> None:
+        self._versions[(kind, account_id)] = DELETED
+
+    def forget(self, kind: str, account_id: int) -> None:
+        self._versions.pop((kind, account_id), None)
+
+
+claims_versions = ClaimsVersionRegistry(
+    maxsize=CLAIMS_VERSION_CACHE_SIZE, ttl=CLAIMS_VERSION_CACHE_TTL
+)
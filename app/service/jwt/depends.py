@@ -1,5 +1,6 @@
 # app/service/jwt/depends.py
 
+import logging
 from typing import Optional
 
 from fastapi import Depends, HTTPException, Request, status
@@ -9,6 +10,10 @@ from pydantic import BaseModel, EmailStr
 from app.models.trial import TrialAccount
 from app.models.user import User
 from app.service.jwt.jwt_decode_token import DecodeToken, TokenPayload
+from app.service.jwt.claims_version import claims_versions
+from app.service.jwt.principal_cache import principal_cache
+
+logger = logging.getLogger(__name__)
 
 # Criamos um schema que pode aceitar token de header OU cookie
 oauth2_scheme = OAuth2PasswordBearer(
@@ -32,81 +37,153 @@ class SystemUser(BaseModel):
     model_config = {'from_attributes': True}
 
 
+def build_system_user(user, is_trial: bool) -> SystemUser:
+    """Monta o SystemUser a partir da linha de User ou TrialAccount"""
+
+    # Para trial, alguns campos podem ser diferentes
+    if is_trial:
+        phone = getattr(user, 'phone', '') or ''
+        business_name = getattr(user, 'business_name', user.username)
+        business_slug = getattr(user, 'business_slug', user.username)
+        name = getattr(user, 'name', user.username)
+        username = getattr(user, 'username', user.email.split('@')[0])
+    else:
+        phone = user.phone or ''
+        business_name = user.business_name or user.username
+        business_slug = user.business_slug or user.username
+        name = business_name
+        username = user.username
+
+    return SystemUser(
+        id=user.id,
+        username=username,
+        email=user.email,
+        phone=phone,
+        name=name,
+        slug=business_slug,
+        is_trial=is_trial,
+    )
+
+
+async def _principal_from_claims(
+    user_id: int, claims: TokenPayload
+) -> Optional[SystemUser]:
+    """
+    Valida um token autocontido comparando apenas a versão das claims.
+    Sem consulta ao banco quando a versão já está em memória.
+    """
+    version = await claims_versions.get(claims.kind, user_id)
+
+    # Conta removida
+    if version is None:
+        return None
+
+    if version == claims.ver:
+        # Claims assinadas por nós: dispensa nova validação do pydantic
+        return SystemUser.model_construct(
+            id=user_id,
+            username=claims.username,
+            email=claims.email,
+            phone=claims.phone or '',
+            name=claims.name,
+            slug=claims.slug,
+            is_trial=claims.kind == 'trial',
+        )
+
+    # Conta alterada depois da emissão: recarrega da tabela certa
+    is_trial = claims.kind == 'trial'
+    model = TrialAccount if is_trial else User
+    user = await model.get_or_none(id=user_id)
+    if not user:
+        return None
+    # Trial expirado pelo trial_sweeper (que também incrementa a versão)
+    if is_trial and not user.subscription_active:
+        return None
+    return build_system_user(user, is_trial)
+
+
+async def resolve_principal(token: str) -> Optional[SystemUser]:
+    """
+    Decodifica o token e carrega a conta (User ou TrialAccount) uma única vez.
+    Levanta HTTPException se o token for inválido ou estiver expirado.
+    """
+    token_data = DecodeToken(token)
+
+    # O subject do token deve ser o user_id
+    user_id = token_data.user_id
+
+    # Token autocontido: tipo e dados da conta vêm nas claims
+    if token_data.data.has_account_claims:
+        return await _principal_from_claims(user_id, token_data.data)
+
+    # Usuário já resolvido recentemente
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    # Primeiro tenta buscar usuário regular
+    user = await User.get_or_none(id=user_id)
+    is_trial = False
+
+    # Se não encontrou usuário regular, tenta trial
+    if not user:
+        user = await TrialAccount.get_or_none(id=user_id)
+        is_trial = True if user else False
+
+    if not user:
+        logger.debug('Conta %s não encontrada em nenhuma tabela', user_id)
+        return None
+
+    if is_trial and not user.subscription_active:
+        logger.debug('Trial %s expirado', user_id)
+        return None
+
+    principal = build_system_user(user, is_trial)
+    principal_cache.set(user_id, principal)
+
+    return principal
+
+
 async def get_current_user(
     request: Request, token: Optional[str] = Depends(oauth2_scheme)
 ) -> Optional[SystemUser]:
     """
     Obtém o usuário atual verificando token em:
-    1. Header Authorization (Bearer)
-    2. Cookie access_token
+    1. request.state.principal (já resolvido pelo AuthMiddleware)
+    2. Header Authorization (Bearer)
+    3. Cookie access_token
     Aceita tanto usuários regulares quanto trial.
     """
 
+    # O middleware já resolveu o usuário nesta requisição
+    principal = getattr(request.state, 'principal', None)
+    if principal is not None:
+        return principal
+
+    # Chamada direta (fora do Depends) recebe o objeto Depends como token
+    if not isinstance(token, str):
+        token = None
+
     # Se não tem token no header, tenta do cookie
     if not token:
         token = request.cookies.get('access_token')
 
     if not token:
-        print('DEBUG get_current_user: Nenhum token encontrado')
+        logger.debug('Nenhum token encontrado')
         return None
 
-    # print(f'DEBUG get_current_user: Token encontrado ({len(token)} chars)')
-
     try:
-        # Decodifica o token
-        token_data = DecodeToken(token)
-
-        # O subject do token deve ser o user_id
-        user_id = token_data.user_id
-        print(f'DEBUG get_current_user: user_id do token = {user_id}')
-
-        # Primeiro tenta buscar usuário regular
-        user = await User.get_or_none(id=user_id)
-        is_trial = False
-
-        # Se não encontrou usuário regular, tenta trial
-        if not user:
-            user = await TrialAccount.get_or_none(id=user_id)
-            is_trial = True if user else False
-
-        if not user:
-            print(
-                f'DEBUG get_current_user: Usuário {user_id} não encontrado em nenhuma tabela'
-            )
-            return None
-
-        print(
-            f'DEBUG get_current_user: Usuário encontrado: {user.email} (trial: {is_trial})'
-        )
-
-        # Para trial, alguns campos podem ser diferentes
-        if is_trial:
-            phone = getattr(user, 'phone', '') or ''
-            business_name = getattr(user, 'business_name', user.username)
-            business_slug = getattr(user, 'business_slug', user.username)
-            name = getattr(user, 'name', user.username)
-            username = getattr(user, 'username', user.email.split('@')[0])
-        else:
-            phone = user.phone or ''
-            business_name = user.business_name or user.username
-            business_slug = user.business_slug or user.username
-            name = business_name
-            username = user.username
-
-        # Cria o SystemUser
-        return SystemUser(
-            id=user.id,
-            username=username,
-            email=user.email,
-            phone=phone,
-            name=name,
-            slug=business_slug,
-            is_trial=is_trial,
-        )
+        principal = await resolve_principal(token)
 
     except HTTPException as e:
-        print(f'DEBUG get_current_user: HTTPException: {e.detail}')
+        logger.debug('Token recusado: %s', e.detail)
         return None
     except Exception as e:
-        print(f'DEBUG get_current_user: Exception: {str(e)}')
+        logger.debug('Falha ao resolver o usuário: %s', e)
         return None
+
+    # Compartilha com o restante da requisição
+    if principal is not None:
+        request.state.principal = principal
+
+    return principal
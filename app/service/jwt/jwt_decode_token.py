@@ -1,9 +1,12 @@
 # app/service/jwt/jwt_decode_token.py
 
+import hashlib
 import os
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 
+from cachetools import TLRUCache
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
@@ -15,11 +18,82 @@ load_dotenv()
 JWT_ALGORITHM = os.getenv('ALGORITHM')
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '2048'))
+# Teto de permanência para tokens sem 'exp'
+TOKEN_CACHE_MAX_TTL = int(os.getenv('TOKEN_CACHE_MAX_TTL', '600'))
+
 
 class TokenPayload(BaseModel):
     sub: str  # Agora obrigatório, pois será o user_id
     exp: Optional[int] = None
 
+    # Claims da conta (tokens autocontidos, ver build_account_claims)
+    kind: Optional[str] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    ver: Optional[int] = None
+
+    @property
+    def has_account_claims(self) -> bool:
+        return self.kind in ('user', 'trial') and self.ver is not None
+
+
+def _token_expires_at(key: bytes, payload: TokenPayload, now: float) -> float:
+    """Momento em que a entrada deve sair do cache (nunca depois do exp)"""
+    limit = now + TOKEN_CACHE_MAX_TTL
+    if payload.exp is not None:
+        return min(payload.exp, limit)
+    return limit
+
+
+class VerifiedTokenCache:
+    """
+    Cache LRU de payloads já verificados, indexado pelo digest do token.
+    Cada entrada expira no 'exp' do próprio token, então tokens vencidos
+    voltam a passar pelo jwt.decode e são rejeitados normalmente.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._cache: TLRUCache = TLRUCache(
+            maxsize=maxsize, ttu=_token_expires_at, timer=time.time
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, key: bytes) -> Optional[TokenPayload]:
+        payload = self._cache.get(key)
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def set(self, key: bytes, payload: TokenPayload) -> None:
+        self._cache[key] = payload
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self._cache.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+verified_token_cache = VerifiedTokenCache(maxsize=TOKEN_CACHE_SIZE)
+
 
 class DecodeToken:
     def __init__(self, token: str):
@@ -34,6 +108,13 @@ class DecodeToken:
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
+        # Token já verificado e ainda dentro do 'exp'
+        cache_key = verified_token_cache.digest(token)
+        cached = verified_token_cache.get(cache_key)
+        if cached is not None:
+            self.data = cached
+            return
+
         try:
             payload = jwt.decode(
                 token, str(JWT_SECRET_KEY), algorithms=[str(JWT_ALGORITHM)]
@@ -58,6 +139,8 @@ class DecodeToken:
                 headers={'WWW-Authenticate': 'Bearer'},
             )
 
+        verified_token_cache.set(cache_key, self.data)
+
     @property
     def user_id(self) -> int:
         """Retorna o ID do usuário como inteiro"""
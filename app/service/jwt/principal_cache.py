@@ -0,0 +1,60 @@
+# app/service/jwt/principal_cache.py
+
+import os
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', '1024'))
+PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', '300'))
+
+
+class PrincipalCache:
+    """
+    Cache em memória (LRU + TTL) dos SystemUser já resolvidos, por user_id.
+    Deve ser invalidado sempre que uma conta for criada, alterada ou removida.
+    """
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Any]:
+        """Retorna o principal em cache ou None"""
+        principal = self._cache.get(user_id)
+        if principal is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return principal
+
+    def set(self, user_id: int, principal: Any) -> None:
+        self._cache[user_id] = principal
+
+    def invalidate(self, user_id: int) -> None:
+        """Remove um usuário do cache (conta alterada ou removida)"""
+        self._cache.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para ajustar o tamanho do cache"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'maxsize': self._cache.maxsize,
+            'ttl': self._cache.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(
+    maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL
+)
@@ -0,0 +1,202 @@
+# app/service/jwt/refresh_tokens.py
+"""
+Refresh tokens rotativos de uso único.
+
+O token entregue ao cliente é um valor aleatório opaco, num cookie
+HttpOnly restrito a /auth (fora do alcance de JavaScript); o banco guarda
+apenas o SHA-256 dele. Cada /auth/refresh consome o token atual e emite
+outro na mesma família. Se um token já usado (ou revogado) voltar a ser
+apresentado, a família inteira é revogada: quem roubou e quem tinha o
+token precisam fazer login de novo.
+
+Duas abas renovando ao mesmo tempo não são roubo: o sucessor é derivado
+do token consumido (HMAC), então quem reapresenta o token dentro de
+REFRESH_TOKEN_REUSE_GRACE segundos recebe o mesmo sucessor, em qualquer
+worker. Fora dessa janela, reuso revoga a família.
+
+Linhas expiradas ou revogadas são apagadas pelo trial_sweeper
+(`purge_refresh_tokens`).
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Response, status
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+
+from app.models.refresh_token import RefreshToken
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv('REFRESH_TOKEN_EXPIRE_DAYS', '30'))
+# Segundos em que reapresentar um token recém-usado devolve o mesmo sucessor
+REFRESH_TOKEN_REUSE_GRACE = int(os.getenv('REFRESH_TOKEN_REUSE_GRACE', '10'))
+
+REFRESH_COOKIE_NAME = 'refresh_token'
+# Só /auth/refresh e /auth/logout recebem o cookie
+REFRESH_COOKIE_PATH = '/auth'
+
+_successor_key = os.getenv('JWT_REFRESH_SECRET_KEY', '').encode('utf-8')
+if not _successor_key:
+    # Sem chave compartilhada a janela de reuso só vale no próprio worker
+    logger.warning('JWT_REFRESH_SECRET_KEY ausente: chave local de refresh')
+    _successor_key = secrets.token_bytes(32)
+
+
+def _hash_token(token: str) -> str:
+    # Token aleatório de 256 bits: SHA-256 basta (não precisa de bcrypt)
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _successor(token: str) -> str:
+    """Próximo token da família: o mesmo para quem consome `token`"""
+    digest = hmac.new(
+        _successor_key, token.encode('utf-8'), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def _invalid(detail: str = 'Refresh token expirado ou inválido') -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, detail=detail
+    )
+
+
+def set_refresh_cookie(response: Response, token: str) -> None:
+    """Cookie HttpOnly com a mesma validade do token"""
+    response.set_cookie(
+        key=REFRESH_COOKIE_NAME,
+        value=token,
+        max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+        path=REFRESH_COOKIE_PATH,
+        httponly=True,
+        secure=True,
+        samesite='lax',
+    )
+
+
+def clear_refresh_cookie(response: Response) -> None:
+    response.delete_cookie(
+        key=REFRESH_COOKIE_NAME,
+        path=REFRESH_COOKIE_PATH,
+        httponly=True,
+        secure=True,
+        samesite='lax',
+    )
+
+
+async def issue_refresh_token(
+    kind: str,
+    account_id: int,
+    family_id: Optional[str] = None,
+    token: Optional[str] = None,
+) -> str:
+    """
+    Cria um refresh token (nova família se family_id não for informado).
+    `token` já definido (sucessor): se outra renovação simultânea gravou
+    antes, a linha existente vale para as duas.
+    """
+    predefined = token is not None
+    token = token or secrets.token_urlsafe(32)
+    try:
+        await RefreshToken.create(
+            token_hash=_hash_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            account_kind=kind,
+            account_id=account_id,
+            expires_at=datetime.now(timezone.utc)
+            + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    except IntegrityError:
+        if not predefined:
+            raise
+    return token
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite devolve datetimes sem fuso
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+async def revoke_family(family_id: str) -> None:
+    await RefreshToken.filter(family_id=family_id).update(revoked=True)
+
+
+async def rotate_refresh_token(token: str) -> Tuple[str, int, str]:
+    """
+    Consome o refresh token e emite o próximo da família.
+    Retorna (kind, account_id, novo_refresh_token).
+    """
+    if not token:
+        raise _invalid()
+
+    stored = await RefreshToken.get_or_none(token_hash=_hash_token(token))
+    if stored is None:
+        raise _invalid()
+
+    if stored.revoked:
+        # Família encerrada (logout ou reuso detectado antes)
+        raise _invalid()
+
+    now = datetime.now(timezone.utc)
+    if stored.used_at is None:
+        if _as_utc(stored.expires_at) <= now:
+            raise _invalid()
+        # Marca como usado só se ninguém usou antes
+        consumed = await RefreshToken.filter(
+            id=stored.id, used_at=None, revoked=False
+        ).update(used_at=now)
+        if not consumed:
+            # Outra renovação consumiu entre a leitura e o UPDATE
+            stored = await RefreshToken.get(id=stored.id)
+
+    if stored.used_at is not None:
+        # Consumido antes desta chamada: renovação simultânea (mesmo
+        # sucessor) ou reuso de um token antigo (roubo)
+        grace = timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE)
+        if stored.revoked or now - _as_utc(stored.used_at) > grace:
+            logger.warning(
+                'Reuso de refresh token detectado (família %s)',
+                stored.family_id,
+            )
+            await revoke_family(stored.family_id)
+            raise _invalid()
+
+    new_token = await issue_refresh_token(
+        stored.account_kind,
+        stored.account_id,
+        stored.family_id,
+        token=_successor(token),
+    )
+    return stored.account_kind, stored.account_id, new_token
+
+
+async def revoke_refresh_token(token: Optional[str]) -> None:
+    """Encerra a sessão (logout): revoga a família do token"""
+    if not token:
+        return
+    stored = await RefreshToken.get_or_none(token_hash=_hash_token(token))
+    if stored is not None:
+        await revoke_family(stored.family_id)
+
+
+async def purge_refresh_tokens() -> int:
+    """
+    Apaga tokens expirados ou revogados. Usados e ainda válidos ficam até
+    expirar: são eles que denunciam o reuso. Retorna o total apagado.
+    """
+    return await RefreshToken.filter(
+        Q(expires_at__lte=datetime.now(timezone.utc)) | Q(revoked=True)
+    ).delete()
@@ -93,10 +93,13 @@ window.loginUser = async function(email, password) {
         // Salvar token (se vier na resposta)
         if (data.access_token) {
             authToken = data.access_token;
-            saveToken(data.access_token);
+            saveToken(data.access_token, data.expires_in);
             console.log('💾 Token salvo com sucesso');
         }
 
+        // Refresh token: cookie HttpOnly definido pelo servidor (não fica
+        // acessível ao JavaScript); renovação em logout.js
+
         if (data.is_trial) {
             localStorage.setItem('is_trial', '1');
             console.log('🎯 Conta trial detectada');
@@ -424,19 +427,33 @@ window.getToken = function() {
 
 /**
  * Salva token no cookie e localStorage
+ * maxAge: validade do token em segundos (expires_in do login)
  */
-function saveToken(token) {
+function saveToken(token, maxAge) {
     console.log('💾 Salvando token...');
 
-    // Salvar no cookie (para o middleware)
+    // Salvar no cookie (para o middleware), com a validade do próprio token
     const secure = IS_PRODUCTION;
-    document.cookie = `access_token=${token}; path=/; max-age=3600; ${secure ? 'Secure; ' : ''}SameSite=Lax`;
+    const seconds = Math.floor(maxAge || tokenSecondsLeft(token));
+    document.cookie = `access_token=${token}; path=/; max-age=${seconds}; ${secure ? 'Secure; ' : ''}SameSite=Lax`;
 
     // Salvar no localStorage (para o frontend)
     localStorage.setItem('agendame_token', token);
     authToken = token;
 }
 
+/**
+ * Segundos até o exp do JWT (0 se ilegível)
+ */
+function tokenSecondsLeft(token) {
+    try {
+        const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+        return Math.max(0, payload.exp - Date.now() / 1000);
+    } catch (e) {
+        return 0;
+    }
+}
+
 /**
  * Obtém cookie por nome
  */
@@ -43,8 +43,9 @@ const chatState = {
     clientId: null,
     companyInfo: null,
     services: [],
-    availableDates: [],
+    availableDates: {}, // data → horários livres (/availability)
     availableTimes: [],
+    availabilityStream: null, // EventSource da data escolhida
     isLoading: false
 };
 
@@ -199,6 +200,85 @@ async function getAvailableTimes(serviceId, date) {
     }
 }
 
+// Buscar horários disponíveis de várias datas em uma única requisição
+async function getAvailability(serviceId, dates) {
+    if (dates.length === 0) {
+        return {};
+    }
+
+    showLoading(true);
+    try {
+        const from = dates[0];
+        const to = dates[dates.length - 1];
+        console.log(`Buscando disponibilidade do serviço ${serviceId} de ${from} a ${to}`);
+
+        const response = await fetch(`/services/${companySlug}/availability?service_id=${serviceId}&from=${from}&to=${to}&search_by=auto`, {
+            headers: {
+                'Accept': 'application/json'
+            }
+        });
+
+        if (!response.ok) {
+            throw new Error('Erro ao carregar disponibilidade');
+        }
+
+        const data = await response.json();
+        const availability = {};
+        (data.days || []).forEach(day => {
+            availability[day.date] = day.available_times || [];
+        });
+        return availability;
+
+    } catch (error) {
+        // Sem o mapa, cada data é consultada em /available-times
+        console.error('Erro ao carregar disponibilidade:', error);
+        return {};
+    } finally {
+        showLoading(false);
+    }
+}
+
+// Acompanhar os horários da data escolhida em tempo real (SSE):
+// reservas de outros clientes atualizam a grade sem nova consulta
+function watchAvailableTimes(serviceId, date) {
+    stopWatchingAvailableTimes();
+    if (!window.EventSource) {
+        return; // Sem suporte: a grade fica como foi carregada
+    }
+
+    const source = new EventSource(`/services/${companySlug}/availability/stream?service_id=${serviceId}&date=${date}&search_by=auto`);
+
+    source.addEventListener('slots', event => {
+        const data = JSON.parse(event.data);
+        const times = data.available_times || [];
+        chatState.availableDates[date] = times;
+
+        if (chatState.selectedDate !== date) {
+            return;
+        }
+        updateTimeOptions(times);
+
+        // Horário escolhido foi reservado por outra pessoa
+        if (chatState.selectedTime && chatState.step < 5 && !times.includes(chatState.selectedTime)) {
+            showWarningMessage(`O horário ${chatState.selectedTime} acabou de ser reservado. Escolha outro horário.`);
+        }
+    });
+
+    // Serviço removido/desativado: o servidor encerra o stream
+    source.addEventListener('closed', () => {
+        stopWatchingAvailableTimes();
+    });
+
+    chatState.availabilityStream = source;
+}
+
+function stopWatchingAvailableTimes() {
+    if (chatState.availabilityStream) {
+        chatState.availabilityStream.close();
+        chatState.availabilityStream = null;
+    }
+}
+
 // Gerar próximas datas (próximos 7 dias)
 function generateNextDates() {
     const dates = [];
@@ -333,9 +413,17 @@ async function askForDate() {
         hideTypingIndicator();
 
         const selectedService = chatState.services.find(s => s.id === chatState.selectedService);
+        stopWatchingAvailableTimes();
 
-        // Gerar próximas datas
-        const dates = generateNextDates();
+        // Gerar próximas datas e buscar os horários de todas de uma vez
+        const nextDates = generateNextDates();
+        chatState.availableDates = await getAvailability(chatState.selectedService, nextDates);
+
+        // Datas sem nenhum horário livre não são oferecidas
+        const dates = nextDates.filter(date => {
+            const times = chatState.availableDates[date];
+            return times === undefined || times.length > 0;
+        });
 
         if (dates.length === 0) {
             addMessageToChat("Infelizmente não há datas disponíveis para agendamento nos próximos dias.", "bot");
@@ -405,8 +493,11 @@ async function askForTime() {
         const selectedService = chatState.services.find(s => s.id === chatState.selectedService);
         const formattedDate = formatDateForDisplay(chatState.selectedDate);
 
-        // Buscar horários disponíveis
-        const times = await getAvailableTimes(chatState.selectedService, chatState.selectedDate);
+        // Horários já carregados em askForDate (ou busca só desta data)
+        const cachedTimes = chatState.availableDates[chatState.selectedDate];
+        const times = cachedTimes !== undefined
+            ? cachedTimes
+            : await getAvailableTimes(chatState.selectedService, chatState.selectedDate);
 
         if (times.length === 0) {
             addMessageToChat(`Infelizmente não há horários disponíveis para ${selectedService.name} na data ${formattedDate}.`, "bot");
@@ -432,41 +523,61 @@ async function askForTime() {
         addMessageToChat(`Excelente! Agora escolha um horário para ${formattedDate}:`, "bot");
 
         // Criar opções de horários
-        let timesHtml = '';
-
-        times.forEach(time => {
-            // Verificar se é um horário recomendado (primeiros horários do dia)
-            const hour = parseInt(time.split(':')[0]);
-            const isRecommended = hour >= 9 && hour <= 11;
-
-            timesHtml += `
-                <button class="time-btn ${isRecommended ? 'recommended' : ''}" data-time="${time}">
-                    ${time}
-                </button>
-            `;
-        });
-
         addMessageToChat(`
             <div class="time-selector" id="timeOptions">
-                ${timesHtml}
+                ${timeButtonsHtml(times)}
             </div>
         `, "bot");
 
         // Adicionar event listeners aos botões de horário
-        setTimeout(() => {
-            document.querySelectorAll('#timeOptions .time-btn').forEach(btn => {
-                btn.addEventListener('click', function() {
-                    const time = this.getAttribute('data-time');
-                    selectTime(time);
-                });
-            });
-        }, 100);
+        setTimeout(bindTimeButtons, 100);
 
         chatState.step = 4;
 
+        // Mudanças nesta data chegam pelo stream
+        watchAvailableTimes(chatState.selectedService, chatState.selectedDate);
+
     }, 800);
 }
 
+// Botões de horário da grade
+function timeButtonsHtml(times) {
+    let timesHtml = '';
+
+    times.forEach(time => {
+        // Verificar se é um horário recomendado (primeiros horários do dia)
+        const hour = parseInt(time.split(':')[0]);
+        const isRecommended = hour >= 9 && hour <= 11;
+
+        timesHtml += `
+            <button class="time-btn ${isRecommended ? 'recommended' : ''}" data-time="${time}">
+                ${time}
+            </button>
+        `;
+    });
+
+    return timesHtml;
+}
+
+function bindTimeButtons() {
+    document.querySelectorAll('#timeOptions .time-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            const time = this.getAttribute('data-time');
+            selectTime(time);
+        });
+    });
+}
+
+// Redesenha a grade exibida com os horários recebidos pelo stream
+function updateTimeOptions(times) {
+    const container = document.getElementById('timeOptions');
+    if (!container) {
+        return;
+    }
+    container.innerHTML = timeButtonsHtml(times);
+    bindTimeButtons();
+}
+
 // Criar agendamento
 async function createAppointment() {
     showLoading(true);
@@ -534,6 +645,7 @@ async function createAppointment() {
 
 // Finalizar agendamento
 function completeBooking(data) {
+    stopWatchingAvailableTimes();
     addMessageToChat(`✅ Agendamento confirmado! Seus dados foram salvos com sucesso.`, "bot");
 
     // Mostrar sucesso após um breve delay
@@ -919,6 +1031,8 @@ function showHelpOptions() {
 
 // Reiniciar chat
 function resetChat() {
+    stopWatchingAvailableTimes();
+
     // Resetar estado
     chatState.step = -1;
     chatState.userName = "";
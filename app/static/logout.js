@@ -13,7 +13,8 @@ export async function logoutUser() {
         // Chamar API de logout
         const response = await fetch(`${API_BASE_URL}auth/logout`, {
             method: 'GET',
-            credentials: 'include', // Importante para enviar cookies
+            // Envia os cookies (o refresh token HttpOnly é revogado no servidor)
+            credentials: 'include',
             headers: {
                 'Accept': 'application/json',
                 'X-Requested-With': 'XMLHttpRequest'
@@ -66,7 +67,8 @@ function clearLocalStorage() {
         'auth_token',
         'is_trial',
         'trial_days',
-        'user_session'
+        'user_session',
+        'refresh_token'
     ];
 
     itemsToRemove.forEach(item => {
@@ -229,6 +231,54 @@ export function initInactivityLogout() {
     console.log('⏰ Monitor de inatividade iniciado');
 }
 
+/**
+ * Segundos até o access token expirar (lidos do próprio JWT)
+ */
+function tokenSecondsLeft(token) {
+    try {
+        const payload = JSON.parse(atob(token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/')));
+        return payload.exp - Date.now() / 1000;
+    } catch (e) {
+        return 0;
+    }
+}
+
+/**
+ * Renova a sessão com o refresh token (sem senha/bcrypt)
+ */
+export async function refreshSession() {
+    // Token antigo guardado no localStorage (versões anteriores)
+    localStorage.removeItem('refresh_token');
+
+    try {
+        // O refresh token vai no cookie HttpOnly (path /auth)
+        const response = await fetch(`${API_BASE_URL}auth/refresh`, {
+            method: 'POST',
+            headers: {
+                'Accept': 'application/json'
+            },
+            credentials: 'include'
+        });
+
+        if (!response.ok) {
+            // Refresh token usado, revogado ou expirado
+            return false;
+        }
+
+        const data = await response.json();
+        const secure = window.location.protocol === 'https:';
+        const maxAge = Math.floor(data.expires_in || tokenSecondsLeft(data.access_token));
+        document.cookie = `access_token=${data.access_token}; path=/; max-age=${maxAge}; ${secure ? 'Secure; ' : ''}SameSite=Lax`;
+        localStorage.setItem('agendame_token', data.access_token);
+
+        console.log('🔄 Sessão renovada');
+        return true;
+    } catch (error) {
+        console.error('Erro ao renovar sessão:', error);
+        return false;
+    }
+}
+
 /**
  * Verifica se o token expirou
  */
@@ -236,18 +286,27 @@ export async function checkTokenExpiration() {
     const token = localStorage.getItem('agendame_token');
     if (!token) return false;
 
+    // Renova antes de expirar (faltando menos de 30 minutos)
+    if (tokenSecondsLeft(token) < 30 * 60) {
+        await refreshSession();
+    }
+
     try {
         // Verificar token no backend
         const response = await fetch(`${API_BASE_URL}auth/me`, {
             headers: {
-                'Authorization': `Bearer ${token}`,
+                'Authorization': `Bearer ${localStorage.getItem('agendame_token')}`,
                 'Accept': 'application/json'
             },
             credentials: 'include'
         });
 
         if (!response.ok) {
-            // Token inválido ou expirado
+            // Token inválido ou expirado: tenta renovar antes de deslogar
+            if (await refreshSession()) {
+                return true;
+            }
+
             console.warn('Token expirado ou inválido, fazendo logout...');
             clearLocalStorage();
             window.location.href = '/login';
@@ -290,5 +349,6 @@ document.addEventListener('DOMContentLoaded', function() {
 window.LogoutManager = {
     logout: logoutUser,
     init: initLogoutSystem,
-    checkToken: checkTokenExpiration
+    checkToken: checkTokenExpiration,
+    refresh: refreshSession
 };
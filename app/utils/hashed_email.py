@@ -26,5 +26,6 @@ def create_email_search_hash(email: str) -> str:
     """
     Hash determinístico para busca/indexação (SHA-256).
     Não é para autenticação, apenas lookup.
+    O email é normalizado (sem espaços nas pontas, minúsculo).
     """
-    return hashlib.sha256(email.lower().encode('utf-8')).hexdigest()
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
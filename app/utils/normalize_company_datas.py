@@ -1,4 +1,6 @@
 import re
+import unicodedata
+from typing import Optional
 
 
 def normalize_company_slug(slug: str) -> str:
@@ -11,8 +13,22 @@ def normalize_company_slug(slug: str) -> str:
     Returns:
         str: Slug normalizado (ex: 'barbeariadopaulo')
     """
+    # Remove acentos (São → Sao) antes de filtrar
+    slug = unicodedata.normalize('NFKD', slug)
+    slug = ''.join(c for c in slug if not unicodedata.combining(c))
+
     # Remove caracteres especiais e espaços
     slug = re.sub(r'[^\w]', '', slug)
 
     # Converte para minúsculas
     return slug.lower()
+
+
+def company_slug_search(slug: Optional[str]) -> Optional[str]:
+    """
+    Valor da coluna `slug_search` (busca pública por slug).
+    None quando o slug não existe ou fica vazio depois de normalizado.
+    """
+    if not slug:
+        return None
+    return normalize_company_slug(slug) or None
@@ -0,0 +1,31 @@
+# app/utils/tenant_key.py
+"""
+Chave única do dono (tenant) dos registros de clients, services,
+appointments e business_settings.
+
+User e TrialAccount têm ids que se sobrepõem (as duas tabelas começam
+em 1), então o filtro `Q(user_id=X) | Q(trial_account_id=X)` podia
+misturar empresas e impedia o uso dos índices compostos. A chave
+unificada resolve os dois problemas numa única coluna:
+
+- User        → id
+- TrialAccount → -id
+"""
+
+from typing import Optional
+
+
+def make_tenant_key(company_id: int, is_trial: bool) -> int:
+    """Chave do tenant a partir do id da empresa e do tipo da conta"""
+    return -company_id if is_trial else company_id
+
+
+def tenant_key_from_owner(
+    user_id: Optional[int], trial_account_id: Optional[int]
+) -> Optional[int]:
+    """Chave do tenant a partir das duas FKs de um registro"""
+    if user_id is not None:
+        return make_tenant_key(user_id, False)
+    if trial_account_id is not None:
+        return make_tenant_key(trial_account_id, True)
+    return None
@@ -9,12 +9,18 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
+from app.controllers.agendame.availability_stream import availability_stream
+from app.controllers.company.slug_filter import known_slugs
 from app.core.config import AuthMiddleware
 from app.database.init_database import (close_database, init_database,
                                         print_database_info)
 from app.routes import router
 from app.routes.router import register_routes
+from app.service.auth.trial_sweeper import trial_sweeper
+from app.service.jwt.auth import (calibrate_bcrypt_rounds_async,
+                                  shutdown_password_executor)
 
 # ======================================================
 # BASE PATHS
@@ -24,6 +30,12 @@ BASE_DIR = Path(__file__).resolve().parent
 static_dir = BASE_DIR / 'app' / 'static'
 
 
+# Proxies (IPs ou redes CIDR) cujo X-Forwarded-For é aceito como o IP
+# real do cliente. Sem isso, atrás do proxy do Render todo cliente tem o
+# IP do proxy e o limite por IP do login vira um só balde para o site.
+FORWARDED_ALLOW_IPS = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
 # ======================================================
 # LIFESPAN (STARTUP / SHUTDOWN)
 # ======================================================
@@ -40,11 +52,30 @@ async def lifespan(app: FastAPI):
 
     print_database_info()
 
+    # Filtro de Bloom dos slugs conhecidos (404 barato para os demais)
+    total = await known_slugs.rebuild()
+    print(f'[OK] Filtro de slugs carregado: {total} identificadores')
+
+    # Custo do bcrypt para o tempo alvo neste hardware
+    rounds = await calibrate_bcrypt_rounds_async()
+    print(f'[OK] bcrypt calibrado: custo {rounds}')
+
+    # Expiração dos trials em segundo plano (fora do login)
+    trial_sweeper.start()
+
     yield
 
+    await trial_sweeper.stop()
+
+    # Conexões SSE abertas não seguram o desligamento
+    availability_stream.close()
+
     # Database shutdown
     await close_database()
 
+    # Pool de threads do bcrypt
+    shutdown_password_executor()
+
 
 # ======================================================
 # SERVER CLASS
@@ -143,6 +174,13 @@ class Server:
         # Middleware de autenticação
         self.app.add_middleware(AuthMiddleware)
 
+        # IP/esquema reais do cliente (X-Forwarded-For/-Proto) quando a
+        # conexão vem de um proxy confiável. Adicionado por último: roda
+        # antes dos demais, e o request.client já chega correto.
+        self.app.add_middleware(
+            ProxyHeadersMiddleware, trusted_hosts=FORWARDED_ALLOW_IPS
+        )
+
     # --------------------------------------------------
 
     def setup_routes(self) -> None:
@@ -182,6 +220,12 @@ class Server:
                     '404.html', {'request': request}, status_code=404
                 )
 
+            # Demais rotas (ex: /services/<slug> inexistente): JSON 404
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={'detail': getattr(exc, 'detail', 'Not Found')},
+            )
+
     # --------------------------------------------------
 
     def run(self, host: str = '0.0.0.0', port: int = 8000) -> None:
@@ -202,6 +246,8 @@ class Server:
             port=port,
             reload=os.getenv('ENVIRONMENT', 'DEVELOPMENT') == 'DEVELOPMENT',
             workers=1,
+            proxy_headers=True,
+            forwarded_allow_ips=FORWARDED_ALLOW_IPS,
         )
 
 
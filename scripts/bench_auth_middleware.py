@@ -0,0 +1,264 @@
+# scripts/bench_auth_middleware.py
+"""
+Micro-benchmark do AuthMiddleware nas rotas públicas de agendamento.
+
+Compara o middleware atual (ASGI puro + RouteClassifier, app/core) com
+uma cópia do anterior (BaseHTTPMiddleware + listas percorridas a cada
+requisição). Os dois envolvem o mesmo app ASGI mínimo (200 com um JSON
+pequeno, sem banco), então a diferença medida é só a do middleware.
+
+A cópia antiga recebe os prefixos /services/ e
+/agendame/appointments/public/ — sem eles ela redirecionava essas rotas
+para /login e não chegaria ao app.
+
+Uso (na raiz do projeto):
+
+    python scripts/bench_auth_middleware.py
+    python scripts/bench_auth_middleware.py --requests 20000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from fastapi import Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+with contextlib.redirect_stdout(open(os.devnull, 'w')):
+    from app.core.config import AuthMiddleware  # noqa: E402
+
+# (método, caminho, query) das rotas públicas usadas pelo chat de agendamento
+BOOKING_ROUTES: List[Tuple[str, str, bytes]] = [
+    ('GET', '/corte-supremo', b''),
+    ('GET', '/agendame/corte-supremo', b''),
+    ('GET', '/services/corte-supremo', b''),
+    (
+        'GET',
+        '/services/corte-supremo/available-times',
+        b'service_id=1&date=2026-10-20',
+    ),
+    ('GET', '/services/corte-supremo/next-available', b'service_id=1'),
+    ('POST', '/services/corte-supremo/book', b''),
+    ('GET', '/static/chat_app.js', b''),
+]
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """
+    Cópia do AuthMiddleware anterior (BaseHTTPMiddleware), apenas o
+    caminho das rotas públicas. Mantida aqui só para comparação.
+    """
+
+    def __init__(self, app) -> None:
+        super().__init__(app)
+        self.is_production = True
+        self.allowed_hosts = ['localhost', '127.0.0.1']
+        self.public_routes = {
+            '/', '/login', '/auth/agendame/trial', '/404', '/health',
+            '/ping', '/keepalive', '/docs', '/redoc', '/openapi.json',
+            '/favicon.ico', '/robots.txt', '/sitemap.xml',
+        }  # fmt: skip
+        self.public_api_routes = {
+            '/auth/login', '/auth/register', '/auth/signup/free-trial',
+            '/auth/debug',
+        }  # fmt: skip
+        self.public_prefixes = [
+            '/static/', '/docs/', '/redoc/', '/openapi', '/favicon',
+            '/health',
+            # Ausentes na versão antiga (ver docstring do módulo)
+            '/services/', '/agendame/appointments/public/',
+        ]  # fmt: skip
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        method = request.method
+
+        if self.is_production and request.headers.get('host'):
+            host = request.headers.get('host').split(':')[0]
+            if host not in self.allowed_hosts:
+                raise RuntimeError(f'Host não permitido: {host}')
+
+        print(f'{method} {path}')
+
+        if self._is_public_route(path, method):
+            return await call_next(request)
+        raise RuntimeError(f'Rota protegida no benchmark: {path}')
+
+    def _is_public_route(self, path: str, method: str = 'GET') -> bool:
+        if path in self.public_routes:
+            return True
+        if path in self.public_api_routes:
+            if path == '/auth/login':
+                return method == 'POST'
+            return True
+        for prefix in self.public_prefixes:
+            if path.startswith(prefix):
+                return True
+        if path.startswith('/agendame/') and not path.startswith(
+            '/agendame/dashboard'
+        ):
+            parts = path.split('/')
+            if len(parts) >= 3:
+                private_sections = [
+                    'dashboard', 'services', 'appointments', 'clients',
+                    'company', 'settings', 'profile',
+                ]  # fmt: skip
+                if parts[2] not in private_sections:
+                    return True
+        if len(path.split('/')) == 2 and path != '/':
+            slug = path.strip('/')
+            if slug and '/' not in slug:
+                return True
+        return False
+
+
+async def endpoint(scope, receive, send) -> None:
+    """App ASGI mínimo: consome o corpo e responde 200"""
+    while (await receive()).get('more_body'):
+        pass
+    body = b'{"ok":true}'
+    await send(
+        {
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def make_scope(method: str, path: str, query: bytes) -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query,
+        'headers': [
+            (b'host', b'localhost:8000'),
+            (b'accept', b'application/json'),
+            (b'user-agent', b'bench'),
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 8000),
+    }
+
+
+async def drive(app, scopes: List[dict], total: int) -> float:
+    """`total` requisições em sequência; devolve segundos"""
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    started = time.perf_counter()
+    for i in range(total):
+        await app(scopes[i % len(scopes)], receive, send)
+    elapsed = time.perf_counter() - started
+
+    if set(statuses) != {200} or len(statuses) != total:
+        raise RuntimeError(f'Respostas inesperadas: {set(statuses)}')
+    return elapsed
+
+
+def best_of(repeat: int, run: Callable[[], float]) -> float:
+    return min(run() for _ in range(repeat))
+
+
+def classify_ns(is_public, total: int) -> float:
+    """ns por classificação de rota (sem o resto do middleware)"""
+    routes = [(path, method) for method, path, _ in BOOKING_ROUTES]
+    started = time.perf_counter()
+    for i in range(total):
+        path, method = routes[i % len(routes)]
+        if not is_public(path, method):
+            raise RuntimeError(f'Rota não pública: {path}')
+    return (time.perf_counter() - started) / total * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    legacy = LegacyAuthMiddleware(endpoint)
+    current = AuthMiddleware(endpoint)
+    # Mesmo caminho nos dois: verificação de host e log de uma linha
+    current.is_production = True
+    current.allowed_hosts = legacy.allowed_hosts
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    # Os dois imprimem uma linha por requisição (log de produção)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        for label, app in (('anterior', legacy), ('atual', current)):
+            per_route = []
+            for method, path, query in BOOKING_ROUTES:
+                scopes = [make_scope(method, path, query)]
+                total = max(1, args.requests // len(BOOKING_ROUTES))
+                seconds = best_of(
+                    args.repeat,
+                    lambda: loop.run_until_complete(
+                        drive(app, scopes, total)
+                    ),
+                )
+                per_route.append(seconds / total * 1e6)
+            mixed = [make_scope(*route) for route in BOOKING_ROUTES]
+            seconds = best_of(
+                args.repeat,
+                lambda: loop.run_until_complete(
+                    drive(app, mixed, args.requests)
+                ),
+            )
+            results[label] = (per_route, seconds / args.requests * 1e6)
+    loop.close()
+
+    print(
+        f'Python {sys.version.split()[0]}, {args.requests} requisições, '
+        f'melhor de {args.repeat}\n'
+    )
+    print(f"{'rota':<48}{'anterior':>11}{'atual':>11}{'ganho':>8}")
+    for index, (method, path, _) in enumerate(BOOKING_ROUTES):
+        old = results['anterior'][0][index]
+        new = results['atual'][0][index]
+        print(
+            f'{method + " " + path:<48}{old:>8.1f} us{new:>8.1f} us'
+            f'{old / new:>7.1f}x'
+        )
+    old, new = results['anterior'][1], results['atual'][1]
+    print(
+        f"{'todas (misturadas)':<48}{old:>8.1f} us{new:>8.1f} us"
+        f'{old / new:>7.1f}x'
+    )
+
+    total = args.requests * 10
+    old = classify_ns(legacy._is_public_route, total)
+    new = classify_ns(current._is_public_route, total)
+    print(
+        f"\n{'classificação da rota':<48}{old:>8.0f} ns{new:>8.0f} ns"
+        f'{old / new:>7.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
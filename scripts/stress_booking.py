@@ -0,0 +1,341 @@
+# scripts/stress_booking.py
+"""
+Teste de estresse do agendamento público (POST /services/<empresa>/book).
+
+Dispara centenas de reservas simultâneas contra a aplicação (ASGI, sem
+servidor) num SQLite temporário e confere que o banco aceita só o que
+cabe na agenda:
+
+- mesmo horário, serviço sem recursos: exatamente 1 x 200, N-1 x 409;
+- inícios diferentes que se sobrepõem (serviço de 90 min, 09:00 x
+  10:00): exatamente 1 x 200, N-1 x 409;
+- reativar um agendamento cancelado cujo horário foi ocupado depois
+  (mesmo início ou sobreposição 09:00 x 10:00): 409;
+- mesmo horário, serviço com 3 recursos: exatamente 3 x 200, um por
+  recurso.
+
+Uso (na raiz do projeto):
+
+    python scripts/stress_booking.py            # N = 300
+    python scripts/stress_booking.py --count 500
+
+Sai com código 1 se alguma verificação falhar.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import List, Tuple, Union
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Banco descartável; o .env do projeto não é tocado
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='agendame-stress-'), 'db')
+os.environ['ENVIRONMENT'] = 'DEVELOPMENT'
+os.environ['DB_NAME_DEV_LOCAL'] = DB_PATH
+# Só para rodar sem .env (valores locais, nunca usados fora daqui)
+for name, value in {
+    'schemes_PASSWORD': 'bcrypt',
+    'DEPRECATED_PASSWORD': 'auto',
+    'ALGORITHM': 'HS256',
+    'JWT_SECRET_KEY': 'stress-test',
+    'JWT_REFRESH_SECRET_KEY': 'stress-test-refresh',
+    'ORIGIN': 'http://localhost',
+    'CURRENT_DOMINIO': 'http://localhost/',
+}.items():
+    os.environ.setdefault(name, value)
+
+import httpx  # noqa: E402
+from tortoise import Tortoise  # noqa: E402
+
+import main  # noqa: E402
+from app.database.init_database import init_database  # noqa: E402
+from app.models.user import Appointment  # noqa: E402
+
+COMPANY = 'corte-supremo'
+BOOK_URL = f'/services/{COMPANY}/book'
+
+
+def next_open_day(day: date) -> date:
+    """Próximo dia útil (a agenda padrão não abre aos domingos)"""
+    day += timedelta(days=1)
+    while day.weekday() == 6:
+        day += timedelta(days=1)
+    return day
+
+
+async def storm(
+    client: httpx.AsyncClient,
+    service_id: int,
+    day: date,
+    times: Union[str, List[str]],
+    count: int,
+    tag: str,
+) -> Tuple[Counter, float]:
+    """`count` reservas ao mesmo tempo; devolve (status → total, segundos)"""
+    if isinstance(times, str):
+        times = [times]
+
+    async def book(i: int) -> int:
+        response = await client.post(
+            BOOK_URL,
+            json={
+                'service_id': service_id,
+                'appointment_date': day.isoformat(),
+                'appointment_time': times[i % len(times)],
+                'client_name': f'Cliente {tag}{i}',
+                'client_phone': f'55{tag}{i:05d}',
+            },
+        )
+        return response.status_code
+
+    started = time.perf_counter()
+    # A aplicação imprime logs de depuração por requisição
+    with contextlib.redirect_stdout(io.StringIO()):
+        codes = await asyncio.gather(*(book(i) for i in range(count)))
+    return Counter(codes), time.perf_counter() - started
+
+
+async def setup(client: httpx.AsyncClient) -> Tuple[dict, int]:
+    """Empresa trial, login e um serviço de 90 minutos"""
+    body = {
+        'username': 'stress',
+        'email': 'stress@example.com',
+        'password': 'stress123456',
+        'business_name': 'Corte Supremo',
+        'business_type': 'barbearia',
+        'phone': '11999990000',
+        'whatsapp': '11999990000',
+        'business_slug': COMPANY,
+    }
+    response = await client.post('/auth/signup/free-trial', json=body)
+    response.raise_for_status()
+    response = await client.post(
+        '/auth/login',
+        data={'username': body['email'], 'password': body['password']},
+    )
+    response.raise_for_status()
+    headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    response = await client.post(
+        '/agendame/register/service',
+        headers=headers,
+        json={'name': 'Corte', 'price': 30, 'duration_minutes': 90},
+    )
+    response.raise_for_status()
+    return headers, response.json()['service']['id']
+
+
+def check(label: str, codes: Counter, ok: int, total: int, rows: int) -> bool:
+    expected = Counter({200: ok, 409: total - ok})
+    passed = codes == expected and rows == ok
+    print(
+        f"[{'OK' if passed else 'FALHOU'}] {label}: {dict(codes)} "
+        f'(esperado {dict(expected)}), {rows} agendamento(s) gravado(s)'
+    )
+    return passed
+
+
+async def check_rejected(
+    client: httpx.AsyncClient, service_id: int, open_day: date
+) -> bool:
+    """Horários que o motor não oferece: 409 (ou 422 se malformado)"""
+    sunday = open_day + timedelta(days=6 - open_day.weekday())
+    cases = [
+        ('madrugada', open_day, '03:00', 409),
+        ('domingo (fechado)', sunday, '10:00', 409),
+        ('data passada', date.today() - timedelta(days=2), '10:00', 409),
+        ('fora da grade', open_day, '10:15', 409),
+        ('além da janela', open_day + timedelta(days=400), '10:00', 409),
+        ('24:00', open_day, '24:00', 422),
+        ('10:75', open_day, '10:75', 422),
+    ]
+    passed = True
+    for label, day, start, expected in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = await client.post(
+                BOOK_URL,
+                json={
+                    'service_id': service_id,
+                    'appointment_date': day.isoformat(),
+                    'appointment_time': start,
+                    'client_name': 'Cliente fora',
+                    'client_phone': '5500000',
+                },
+            )
+        ok = response.status_code == expected
+        passed = passed and ok
+        print(
+            f"[{'OK' if ok else 'FALHOU'}] {label}: "
+            f'{response.status_code} (esperado {expected})'
+        )
+    return passed
+
+
+async def check_reactivation(
+    client: httpx.AsyncClient, headers: dict, service_id: int, day: date
+) -> bool:
+    """
+    Cancela a reserva das 09:00 (90 min), ocupa o horário com outra e
+    tenta reativar a primeira pelo painel: 409 nos dois casos.
+    """
+
+    async def book(start: str, phone: str) -> int:
+        response = await client.post(
+            BOOK_URL,
+            json={
+                'service_id': service_id,
+                'appointment_date': day.isoformat(),
+                'appointment_time': start,
+                'client_name': f'Cliente {phone}',
+                'client_phone': phone,
+            },
+        )
+        response.raise_for_status()
+        return response.json()['appointment_id']
+
+    async def set_status(appointment_id: int, new_status: str) -> int:
+        response = await client.put(
+            f'/agendame/appointments/{appointment_id}',
+            headers=headers,
+            json={'status': new_status},
+        )
+        return response.status_code
+
+    passed = True
+    for label, taken_by in (
+        ('reativar, mesmo início', '09:00'),
+        ('reativar, sobreposição 09:00/10:00', '10:00'),
+    ):
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = await book('09:00', '5591000')
+            cancelled = await set_status(first, 'cancelled')
+            second = await book(taken_by, '5592000')
+            code = await set_status(first, 'scheduled')
+            # Libera o dia para o próximo caso
+            await set_status(second, 'cancelled')
+        rows = await Appointment.filter(
+            appointment_date=day, status='scheduled'
+        ).count()
+        ok = cancelled == 200 and code == 409 and rows == 0
+        passed = passed and ok
+        print(
+            f"[{'OK' if ok else 'FALHOU'}] {label}: {code} (esperado 409)"
+        )
+    return passed
+
+
+async def run(count: int) -> bool:
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not await init_database():
+            raise RuntimeError('Falha ao inicializar o banco')
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url='http://localhost', timeout=120
+    ) as client:
+        with contextlib.redirect_stdout(io.StringIO()):
+            headers, service_id = await setup(client)
+        results = []
+
+        # 1) Mesmo horário, serviço sem recursos
+        day = next_open_day(date.today())
+        codes, elapsed = await storm(
+            client, service_id, day, '14:00', count, 'a'
+        )
+        rows = await Appointment.filter(
+            appointment_date=day, status='scheduled'
+        ).count()
+        results.append(
+            check(
+                f'mesmo horário x{count} ({elapsed:.1f}s)',
+                codes,
+                1,
+                count,
+                rows,
+            )
+        )
+
+        # 2) 09:00 e 10:00 num serviço de 90 min: só um cabe
+        day = next_open_day(day)
+        codes, elapsed = await storm(
+            client, service_id, day, ['09:00', '10:00'], count, 'b'
+        )
+        rows = await Appointment.filter(
+            appointment_date=day, status='scheduled'
+        ).count()
+        results.append(
+            check(
+                f'sobreposição 09:00/10:00 x{count} ({elapsed:.1f}s)',
+                codes,
+                1,
+                count,
+                rows,
+            )
+        )
+
+        # 3) Reativar um cancelado por cima de outra reserva
+        day = next_open_day(day)
+        results.append(
+            await check_reactivation(client, headers, service_id, day)
+        )
+
+        # 4) Três recursos: três reservas paralelas, uma por recurso
+        for name in ('Carlos', 'Beto', 'Dani'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = await client.post(
+                    '/agendame/resources',
+                    headers=headers,
+                    json={'name': name, 'service_ids': [service_id]},
+                )
+            response.raise_for_status()
+        day = next_open_day(day)
+        codes, elapsed = await storm(
+            client, service_id, day, '14:00', count, 'c'
+        )
+        resources = await Appointment.filter(
+            appointment_date=day, status='scheduled'
+        ).values_list('resource_id', flat=True)
+        distinct = len(set(resources)) == len(resources)
+        results.append(
+            check(
+                f'3 recursos, mesmo horário x{count} ({elapsed:.1f}s)',
+                codes,
+                3,
+                count,
+                len(resources) if distinct else -1,
+            )
+        )
+
+        # 5) Fora do que /available-times ofereceria
+        results.append(await check_rejected(client, service_id, day))
+
+    await Tortoise.close_connections()
+    return all(results)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--count', type=int, default=300, help='reservas por rodada'
+    )
+    args = parser.parse_args()
+    if args.count < 3:
+        parser.error('--count deve ser pelo menos 3')
+
+    print(f'Banco temporário: {DB_PATH}')
+    passed = asyncio.run(run(args.count))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main_cli()